@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""Precomputed daily answers, with an index from each word to the dates it's an answer.
+
+Usage:
+
+    ./answer_calendar.py              # (re)build words/calendar.bin
+    ./answer_calendar.py --years 100
+
+Generating a day's answers with twister means seeding and twisting a fresh Mersenne
+Twister, so stepping through dates one at a time to find a word is slow. The calendar
+generates every day in a range at once (twister.generate_words_batch) and keeps the answers as wordbank indices. Loading
+it sorts those by word, so the days on which a word is an answer are one contiguous,
+sorted slice, and "when is X next an answer" is a binary search.
+
+The file is a fixed-size header followed by the answers as num_days * 4 uint16 wordbank
+indices, row-major.
+"""
+
+import argparse
+import datetime
+import os
+import struct
+import time
+from typing import List, Optional, Set
+
+import numpy as np
+
+import lookup_table
+import twister
+
+CALENDAR_PATH = 'words/calendar.bin'
+FIRST_DATE = datetime.date(2022, 1, 24)
+"""Day zero for twister.get_seed."""
+DEFAULT_YEARS = 30
+NUM_BOARDS = 4
+
+MAGIC = b'QRDC'
+VERSION = 1
+HEADER_FORMAT = '<4sI32sqQ'
+"""magic, version, wordbank + blacklist digest, first day (ordinal), num_days"""
+HEADER_SIZE = 4096
+
+
+class AnswerCalendar:
+    def __init__(self, wordbank: List[str], first_date: datetime.date, answers: np.ndarray):
+        self.wordbank = wordbank
+        self.word_to_idx = {w: i for i, w in enumerate(wordbank)}
+        self.first_date = first_date
+        self.answers = answers
+        """(num_days, 4) wordbank indices of each day's answers."""
+        flat = answers.ravel()
+        self.days = (np.argsort(flat, kind='stable') // NUM_BOARDS).astype(np.int32)
+        """Days on which each word is an answer, grouped by word and sorted within each group."""
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(flat, minlength=len(wordbank)))])
+        """word i's days are days[offsets[i]:offsets[i + 1]]."""
+
+    @property
+    def num_days(self) -> int:
+        return len(self.answers)
+
+    @property
+    def last_date(self) -> datetime.date:
+        return self.first_date + datetime.timedelta(days=self.num_days - 1)
+
+    def day(self, d: datetime.date) -> int:
+        return (d - self.first_date).days
+
+    def date(self, day: int) -> datetime.date:
+        return self.first_date + datetime.timedelta(days=int(day))
+
+    def __contains__(self, d: datetime.date) -> bool:
+        return 0 <= self.day(d) < self.num_days
+
+    def words_for_date(self, d: datetime.date) -> List[str]:
+        """The answers for a date, falling back to twister for dates outside the calendar."""
+        if d not in self:
+            return twister.words_for_date(d)
+        return [self.wordbank[i] for i in self.answers[self.day(d)].tolist()]
+
+    def words_between(self, start: datetime.date, end: datetime.date) -> List[List[str]]:
+        """The answers for every date from start to end (inclusive)."""
+        if start not in self or end not in self:
+            raise ValueError(f'{start}–{end} is not within {self.first_date}–{self.last_date}')
+        rows = self.answers[self.day(start):self.day(end) + 1].tolist()
+        return [[self.wordbank[i] for i in row] for row in rows]
+
+    def _word_days(self, word: str) -> np.ndarray:
+        i = self.word_to_idx[word]
+        return self.days[self.offsets[i]:self.offsets[i + 1]]
+
+    def dates_for_word(
+        self, word: str, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None
+    ) -> List[datetime.date]:
+        """Dates from start to end (inclusive) on which word is an answer."""
+        days = self._word_days(word)
+        lo = 0 if start is None else np.searchsorted(days, self.day(start), side='left')
+        hi = len(days) if end is None else np.searchsorted(days, self.day(end), side='right')
+        return [self.date(day) for day in days[lo:hi].tolist()]
+
+    def next_date(self, word: str, after: datetime.date) -> Optional[datetime.date]:
+        """The first date on or after `after` on which word is an answer, or None if it's
+        not an answer again before the end of the calendar."""
+        days = self._word_days(word)
+        i = np.searchsorted(days, self.day(after), side='left')
+        return self.date(days[i]) if i < len(days) else None
+
+
+def calendar_digest(wordbank: List[str], blacklist: Set[str]) -> bytes:
+    return lookup_table.words_digest(wordbank, sorted(blacklist))
+
+
+def build_answers(num_days: int, first_date=FIRST_DATE) -> np.ndarray:
+    """(num_days, 4) wordbank indices of the answers for each day, from first_date on."""
+    seed = twister.get_seed(first_date)
+    return twister.generate_words_batch(range(seed, seed + num_days), *twister.read_words()).astype(np.uint16)
+
+
+def write_calendar(path: str, digest: bytes, first_date: datetime.date, answers: np.ndarray):
+    """Write a calendar, atomically replacing any existing file at path."""
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, digest, first_date.toordinal(), len(answers))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(header.ljust(HEADER_SIZE, b'\0'))
+        out.write(np.ascontiguousarray(answers, dtype=np.uint16).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_calendar(path: str):
+    """Returns the digest, first date and answers from a calendar file."""
+    with open(path, 'rb') as f:
+        buf = f.read()
+    magic, version, digest, first_day, num_days = struct.unpack_from(HEADER_FORMAT, buf)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not an answer calendar')
+    if version != VERSION:
+        raise ValueError(f'{path} has version {version}, expected {VERSION}')
+    answers = np.frombuffer(buf, dtype=np.uint16, count=num_days * NUM_BOARDS, offset=HEADER_SIZE)
+    return digest, datetime.date.fromordinal(first_day), answers.reshape((num_days, NUM_BOARDS))
+
+
+def load(path=CALENDAR_PATH, *, until: Optional[datetime.date] = None, rebuild=True) -> AnswerCalendar:
+    """Load the calendar, (re)building it if it's missing, out of date or doesn't reach `until`.
+
+    A rebuilt calendar covers at least DEFAULT_YEARS from FIRST_DATE.
+    """
+    wordbank, blacklist = twister.read_words()
+    expected = calendar_digest(wordbank, blacklist)
+    default_until = FIRST_DATE + datetime.timedelta(days=round(365.25 * DEFAULT_YEARS) - 1)
+    until = until or default_until
+    try:
+        digest, first_date, answers = read_calendar(path)
+        calendar = AnswerCalendar(wordbank, first_date, answers)
+        if digest != expected:
+            reason = 'word lists have changed'
+        elif first_date != FIRST_DATE or until not in calendar:
+            reason = f'it ends on {calendar.last_date}'
+        else:
+            return calendar
+    except (FileNotFoundError, ValueError, struct.error) as e:
+        reason = str(e)
+    if not rebuild:
+        raise ValueError(f'Answer calendar {path} is unusable: {reason}')
+
+    print(f'Rebuilding {path} ({reason})')
+    write_calendar(path, expected, FIRST_DATE, build_answers((max(until, default_until) - FIRST_DATE).days + 1))
+    return AnswerCalendar(wordbank, *read_calendar(path)[1:])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute the daily Quordle answers.')
+    parser.add_argument('--years', type=int, default=DEFAULT_YEARS, help='Number of years of answers to generate.')
+    parser.add_argument('--path', default=CALENDAR_PATH, help='Where to write the calendar.')
+    args = parser.parse_args()
+
+    start = time.time()
+    wordbank, blacklist = twister.read_words()
+    answers = build_answers(round(365.25 * args.years))
+    write_calendar(args.path, calendar_digest(wordbank, blacklist), FIRST_DATE, answers)
+    calendar = AnswerCalendar(wordbank, FIRST_DATE, answers)
+    print(f'Wrote {args.path} ({calendar.first_date}–{calendar.last_date}) in {time.time() - start:.1f}s')
@@ -0,0 +1,30 @@
+import datetime
+
+import answer_calendar
+from answer_calendar import FIRST_DATE, AnswerCalendar, build_answers, read_calendar, write_calendar
+import twister
+
+
+def test_answer_calendar(tmp_path):
+    answers = build_answers(200)
+    wordbank, blacklist = twister.read_words()
+    calendar = AnswerCalendar(wordbank, FIRST_DATE, answers)
+    dates = [FIRST_DATE + datetime.timedelta(days=i) for i in range(200)]
+    # Same as generating each date by itself, in any order.
+    for d in dates[::-7]:
+        assert calendar.words_for_date(d) == twister.words_for_date(d)
+    assert calendar.words_for_date(datetime.date(2022, 5, 1)) == ['GLADE', 'CRANK', 'ROCKY', 'KNEEL']
+    assert calendar.words_between(dates[10], dates[12]) == [calendar.words_for_date(d) for d in dates[10:13]]
+
+    for word in {w for d in dates[:20] for w in calendar.words_for_date(d)} | {'TRAIN'}:
+        expected = [d for d in dates if word in calendar.words_for_date(d)]
+        assert calendar.dates_for_word(word) == expected
+        assert calendar.dates_for_word(word, dates[50], dates[150]) == [d for d in expected if dates[50] <= d <= dates[150]]
+        assert calendar.next_date(word, dates[100]) == next((d for d in expected if d >= dates[100]), None)
+
+    path = str(tmp_path / 'calendar.bin')
+    digest = answer_calendar.calendar_digest(wordbank, blacklist)
+    write_calendar(path, digest, FIRST_DATE, answers)
+    digest2, first_date, answers2 = read_calendar(path)
+    assert (digest2, first_date) == (digest, FIRST_DATE)
+    assert (answers2 == answers).all()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+"""Benchmarks for the solver's hot paths, with a history and regression checks.
+
+Usage:
+
+    ./bench.py                   # run everything, append to the history, compare to the baseline
+    ./bench.py --quick           # skip the slow searches
+    ./bench.py dumpy ascot_feign # run just these
+    ./bench.py --save-baseline   # make this run the baseline for future comparisons
+    ./bench.py chaff_lowly_jobs --jobs 4  # speedup of a search with 4 worker processes
+
+Each benchmark runs in its own forked process, so its peak RSS isn't mixed up with the
+others'. Wall time is the best of a few runs. Searches also report how many nodes
+they visited (transposition table lookups), which doesn't depend on the machine, so any
+change in it is flagged. The parallel search reports its speedup over a serial search,
+and the cold cache search its speed relative to no cache; these are flagged if they drop.
+"""
+
+import argparse
+import contextlib
+from dataclasses import dataclass
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import answer_calendar
+import lookup_table
+import priors
+import quordlebot
+from quordlebot import ArrayWordle, Guess, quads_to_indices
+import solver_cache
+import twister
+
+BENCH_DIR = 'benchmarks'
+HISTORY_PATH = os.path.join(BENCH_DIR, 'history.json')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+TOLERANCE = 0.2
+"""Flag times or peak RSS more than this fraction above the baseline."""
+MIN_SECONDS = 0.05
+"""Don't flag time regressions for anything this fast; it's mostly noise."""
+RATIOS = {'speedup'}
+"""Counters that are measured, not counted: flag them if they drop by more than the tolerance."""
+JOBS = os.cpu_count() or 1
+"""Number of worker processes for the parallel search benchmark (--jobs)."""
+
+Counters = Dict[str, float]
+
+
+@dataclass
+class Benchmark:
+    name: str
+    fn: Callable[[ArrayWordle], Optional[Counters]]
+    """Runs the benchmark once. May return counters, e.g. search nodes."""
+    slow: bool = False
+    repeat: int = 3
+
+
+# Positions from the tests, README and play-tree.md.
+SEARCH_FIXTURES = {
+    'dumpy': [['BERET', 'BERTH', 'EGRET', 'ETHER', 'EXERT'], ['CATTY'], ['PUFFY'], ['SPUNK']],
+    'ascot_feign': [
+        ['DEIGN', 'FEIGN', 'GIVEN', 'VIXEN', 'WIDEN'],
+        ['DEBAR', 'EAGER', 'GAMER', 'GAYER', 'GAZER', 'PAPER', 'PARER', 'PAYER', 'RARER', 'REBAR', 'REPAY', 'WAFER', 'WAGER', 'WAVER', 'ZEBRA'],
+    ],
+    # ./quordlebot.py CHAFF,LOWLY,SWORE,PAPER TRAIN CLOSE
+    'chaff_lowly': [
+        ['CHAFF', 'CHAMP'],
+        ['DOLLY', 'FOLLY', 'GODLY', 'GOLLY', 'HOLLY', 'JOLLY', 'LOBBY', 'LOWLY', 'MOGUL', 'MOLDY', 'ODDLY', 'POLYP', 'WOULD'],
+        ['SHORE', 'SPORE', 'SWORE'],
+        ['AMBER', 'BAKER', 'DEBAR', 'EAGER', 'GAMER', 'GAYER', 'GAZER', 'HAREM', 'MAKER', 'PAPER', 'PARER', 'PAYER', 'RARER', 'REBAR', 'REHAB', 'REPAY', 'WAFER', 'WAGER', 'WAVER', 'ZEBRA'],
+    ],
+}
+
+
+def bench_load(lookup: ArrayWordle) -> Optional[Counters]:
+    lookup_table.load()
+    return None
+
+
+def bench_information_gains(lookup: ArrayWordle) -> Optional[Counters]:
+    gains = lookup.information_gains([lookup.all_wordbank_words()])
+    np.argsort(-gains)
+    return None
+
+
+def bench_filter_by_guess(lookup: ArrayWordle) -> Optional[Counters]:
+    everything = lookup.all_wordbank_words()
+    for guess in range(0, len(lookup.guessable), 50):
+        lookup.filter_by_guess(everything, guess, guess % len(lookup.wordbank))
+    guess = Guess('ROAST', '.y...')
+    quordlebot.filter_by_guess(lookup.wordbank, guess)
+    return None
+
+
+def bench_search(quads: List[List[str]]) -> Callable[[ArrayWordle], Counters]:
+    def run(lookup: ArrayWordle) -> Counters:
+        quordlebot.TRANSPOSITIONS.clear()
+        quordlebot.max_depth = 0
+        quordlebot._find_best_play(lookup, quads_to_indices(lookup, quads))
+        t = quordlebot.TRANSPOSITIONS
+        return {'nodes': t.hits + t.misses, 'max_depth': quordlebot.max_depth}
+    return run
+
+
+def bench_parallel_search(quads: List[List[str]]) -> Callable[[ArrayWordle], Counters]:
+    """Search serially and with JOBS worker processes, and report the speedup."""
+    def run(lookup: ArrayWordle) -> Counters:
+        seconds = {}
+        for jobs in sorted({1, JOBS}):
+            quordlebot.TRANSPOSITIONS.clear()
+            start = time.perf_counter()
+            quordlebot._find_best_play(lookup, quads_to_indices(lookup, quads), jobs=jobs)
+            seconds[jobs] = time.perf_counter() - start
+        return {'jobs': JOBS, 'speedup': round(seconds[1] / seconds[JOBS], 2)}
+    return run
+
+
+def bench_cold_cache_search(quads: List[List[str]]) -> Callable[[ArrayWordle], Counters]:
+    """Search without the solver cache and then with an empty one, and report the ratio of
+    their times (below 1 if the cache slows the search down)."""
+    def run(lookup: ArrayWordle) -> Counters:
+        seconds = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for cache in None, solver_cache.SolverCache(os.path.join(tmp, 'solver.sqlite')):
+                quordlebot.TRANSPOSITIONS.clear()
+                quordlebot.BOARD_STATS.clear()
+                quordlebot.SOLVER_CACHE = cache
+                start = time.perf_counter()
+                quordlebot._find_best_play(lookup, quads_to_indices(lookup, quads))
+                seconds.append(time.perf_counter() - start)
+        quordlebot.SOLVER_CACHE = None
+        return {'speedup': round(seconds[0] / seconds[1], 2)}
+    return run
+
+
+def bench_words_for_date(lookup: ArrayWordle) -> Optional[Counters]:
+    start = datetime.date(2022, 1, 24)
+    for i in range(365):
+        twister.words_for_date(start + datetime.timedelta(days=i))
+    return None
+
+
+def bench_answer_calendar(lookup: ArrayWordle) -> Optional[Counters]:
+    answer_calendar.build_answers(round(365.25 * answer_calendar.DEFAULT_YEARS))
+    return None
+
+
+def bench_pair_scan(lookup: ArrayWordle) -> Optional[Counters]:
+    guesses = lookup.wordbank_to_guessable[:500]
+    priors.search_pairs(lookup, guesses, top=20)
+    return None
+
+
+BENCHMARKS = [
+    Benchmark('load', bench_load, repeat=5),
+    Benchmark('information_gains', bench_information_gains),
+    Benchmark('filter_by_guess', bench_filter_by_guess),
+    Benchmark('dumpy', bench_search(SEARCH_FIXTURES['dumpy'])),
+    Benchmark('ascot_feign', bench_search(SEARCH_FIXTURES['ascot_feign'])),
+    Benchmark('chaff_lowly', bench_search(SEARCH_FIXTURES['chaff_lowly']), slow=True, repeat=1),
+    Benchmark('ascot_feign_cold_cache', bench_cold_cache_search(SEARCH_FIXTURES['ascot_feign']), repeat=1),
+    Benchmark('chaff_lowly_jobs', bench_parallel_search(SEARCH_FIXTURES['chaff_lowly']), slow=True, repeat=1),
+    Benchmark('words_for_date', bench_words_for_date),
+    Benchmark('answer_calendar', bench_answer_calendar),
+    Benchmark('pair_scan', bench_pair_scan, repeat=1),
+]
+
+
+def _run_in_child(bench: Benchmark, conn):
+    try:
+        lookup = lookup_table.load()
+        times = []
+        counters: Optional[Counters] = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(bench.repeat):
+                start = time.perf_counter()
+                counters = bench.fn(lookup)
+                times.append(time.perf_counter() - start)
+        # ru_maxrss is in kilobytes on Linux (bytes on macOS).
+        scale = 1 if sys.platform == 'darwin' else 1024
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        conn.send({'seconds': min(times), 'peak_rss_mb': rss / 2**20, **(counters or {})})
+    except BaseException as e:
+        conn.send({'error': repr(e)})
+    finally:
+        conn.close()
+
+
+def run_benchmark(bench: Benchmark) -> Counters:
+    ctx = multiprocessing.get_context('fork')
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_in_child, args=(bench, child))
+    process.start()
+    child.close()
+    result = parent.recv()
+    process.join()
+    if 'error' in result:
+        raise RuntimeError(f'{bench.name} failed: {result["error"]}')
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Counters], baseline: Dict[str, Counters], tolerance=TOLERANCE) -> List[str]:
+    """Descriptions of everything in results that's worse than (or, for counters, different from) the baseline."""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ('seconds', 'peak_rss_mb'):
+            if key not in base or key not in result:
+                continue
+            if key == 'seconds' and max(result[key], base[key]) < MIN_SECONDS:
+                continue
+            if result[key] > base[key] * (1 + tolerance):
+                problems.append(f'{name}: {key} {base[key]:.3f} -> {result[key]:.3f} (+{100 * (result[key] / base[key] - 1):.0f}%)')
+        for key in result.keys() & RATIOS:
+            if key in base and result[key] < base[key] * (1 - tolerance):
+                problems.append(f'{name}: {key} {base[key]} -> {result[key]}')
+        for key in result.keys() - {'seconds', 'peak_rss_mb'} - RATIOS:
+            if key in base and result[key] != base[key]:
+                problems.append(f'{name}: {key} {base[key]} -> {result[key]}')
+    return problems
+
+
+def read_json(path: str, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: str, value):
+    """Write JSON, atomically replacing any existing file at path."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as out:
+        json.dump(value, out, indent=2)
+    os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the solver and check for regressions.')
+    parser.add_argument('names', nargs='*', help=f'Benchmarks to run (default: all). Choices: {", ".join(b.name for b in BENCHMARKS)}')
+    parser.add_argument('--quick', action='store_true', help='Skip the slow benchmarks.')
+    parser.add_argument('--save-baseline', action='store_true', help='Use this run as the baseline.')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Fractional slowdown that counts as a regression.')
+    parser.add_argument('--no-history', action='store_true', help=f"Don't append this run to {HISTORY_PATH}.")
+    parser.add_argument('-j', '--jobs', type=int, default=JOBS, help='Worker processes for the parallel search benchmark.')
+    args = parser.parse_args()
+    JOBS = args.jobs
+
+    unknown = set(args.names) - {b.name for b in BENCHMARKS}
+    if unknown:
+        parser.error(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+    if args.names:
+        benchmarks = [b for b in BENCHMARKS if b.name in args.names]
+    else:
+        benchmarks = [b for b in BENCHMARKS if not (args.quick and b.slow)]
+
+    lookup_table.load()  # build the table first if need be, so that isn't timed.
+    results: Dict[str, Counters] = {}
+    for bench in benchmarks:
+        result = run_benchmark(bench)
+        results[bench.name] = result
+        extra = ''.join(f', {k}={v}' for k, v in result.items() if k not in ('seconds', 'peak_rss_mb'))
+        print(f'{bench.name:20s} {result["seconds"]:9.4f}s {result["peak_rss_mb"]:8.1f} MB{extra}')
+
+    run = {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'results': results,
+    }
+    if not args.no_history:
+        history = read_json(HISTORY_PATH, [])
+        history.append(run)
+        write_json(HISTORY_PATH, history)
+
+    baseline = read_json(BASELINE_PATH, None)
+    if args.save_baseline or baseline is None:
+        baseline = {'commit': run['commit'], 'results': {**(baseline or {}).get('results', {}), **results}}
+        write_json(BASELINE_PATH, baseline)
+        print(f'Saved baseline to {BASELINE_PATH}')
+    else:
+        problems = compare(results, baseline['results'], args.tolerance)
+        for problem in problems:
+            print(f'REGRESSION {problem}')
+        if problems:
+            sys.exit(1)
+        print(f'No regressions vs. baseline ({baseline["commit"]})')
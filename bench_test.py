@@ -0,0 +1,24 @@
+from bench import compare
+
+
+def test_compare():
+    baseline = {
+        'search': {'seconds': 1.0, 'peak_rss_mb': 100.0, 'nodes': 1000},
+        'fast': {'seconds': 0.001, 'peak_rss_mb': 50.0},
+    }
+    assert compare({'search': {'seconds': 1.1, 'peak_rss_mb': 110.0, 'nodes': 1000}}, baseline) == []
+    assert compare({'search': {'seconds': 1.5, 'peak_rss_mb': 100.0, 'nodes': 900}}, baseline) == [
+        'search: seconds 1.000 -> 1.500 (+50%)',
+        'search: nodes 1000 -> 900',
+    ]
+    # Too fast to time reliably, and new benchmarks have nothing to compare to.
+    assert compare({'fast': {'seconds': 0.004, 'peak_rss_mb': 50.0}, 'new': {'seconds': 9.0}}, baseline) == []
+    assert compare({'fast': {'seconds': 0.004, 'peak_rss_mb': 80.0}}, baseline) == [
+        'fast: peak_rss_mb 50.000 -> 80.000 (+60%)',
+    ]
+
+
+def test_compare_ratios():
+    baseline = {'jobs': {'seconds': 10.0, 'jobs': 4, 'speedup': 3.0}}
+    assert compare({'jobs': {'seconds': 10.0, 'jobs': 4, 'speedup': 3.3}}, baseline) == []
+    assert compare({'jobs': {'seconds': 10.0, 'jobs': 4, 'speedup': 2.0}}, baseline) == ['jobs: speedup 3.0 -> 2.0']
@@ -0,0 +1,150 @@
+"""Candidate sets as bitsets over wordbank indices.
+
+A set of candidate solutions is a Python int with bit i set if wordbank word i is still
+possible. For each (guess, result) pair there's a mask of the words that would produce
+that result, so narrowing a board down after a guess is a single &, and counting what's
+left is int.bit_count(). Bitsets are also cheap to hash and compare.
+
+The masks come from an index of wordbank words sorted by result for each guess. This can
+be saved next to the result table (words/masks.bin, about 66 MB) or built in memory in a
+second or two. It stores the sort orders, not the masks: a guess's masks are built from
+its slice of the order the first time they're needed, and the most recently used
+MAX_CACHED_GUESSES guesses' masks are kept.
+
+QuordleState and humid.py use these. The game tree search doesn't: it works on lists of
+indices, and its transposition keys are sorted tuples (see quordlebot.state_key).
+"""
+
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from quordlebot import ArrayWordle, NUM_RESULTS
+import lookup_table
+
+MASKS_PATH = 'words/masks.bin'
+MAX_CACHED_GUESSES = 512
+"""Each guess's masks take tens of KB, so only keep this many guesses' worth."""
+
+MAGIC = b'QRDM'
+VERSION = 1
+HEADER_FORMAT = '<4sIII32sQQ'
+"""magic, version, num_wordbank, num_guessable, word list digest, order offset, offsets offset"""
+HEADER_SIZE = 4096
+
+
+def to_bitset(indices: Iterable[int], size: int) -> int:
+    flags = np.zeros(size, dtype=bool)
+    flags[np.fromiter(indices, dtype=np.intp)] = True
+    return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+
+def to_indices(bits: int) -> List[int]:
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    return np.flatnonzero(np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')).tolist()
+
+
+class BitsetIndex:
+    """Masks of the wordbank words that produce each result for each guess."""
+
+    def __init__(self, order: np.ndarray, offsets: np.ndarray, *, max_cached=MAX_CACHED_GUESSES):
+        self.order = order
+        """(num_guessable, num_wordbank) wordbank indices, sorted by result for each guess."""
+        self.offsets = offsets
+        """(num_guessable, NUM_RESULTS + 1) start of each result's run in order."""
+        self.num_wordbank = order.shape[1]
+        self.all_words = (1 << self.num_wordbank) - 1
+        self.max_cached = max_cached
+        self._masks: OrderedDict[int, List[int]] = OrderedDict()
+        """guess -> masks, least recently used first."""
+
+    def masks(self, guess: int) -> List[int]:
+        """The mask for each possible result of guess (0 if no word produces it)."""
+        masks = self._masks.get(guess)
+        if masks is not None:
+            self._masks.move_to_end(guess)
+        else:
+            order = self.order[guess]
+            offsets = self.offsets[guess].tolist()
+            masks = [
+                to_bitset(order[start:end], self.num_wordbank) if end > start else 0
+                for start, end in zip(offsets, offsets[1:])
+            ]
+            self._masks[guess] = masks
+            if len(self._masks) > self.max_cached:
+                self._masks.popitem(last=False)
+        return masks
+
+    def mask(self, guess: int, result: int) -> int:
+        return self.masks(guess)[result]
+
+    def filter(self, candidates: int, guess: int, result: int) -> int:
+        return candidates & self.masks(guess)[result]
+
+    def split(self, candidates: int, guess: int) -> List[int]:
+        """Split a set of candidates by the result that guess would produce for each."""
+        return [group for group in (candidates & mask for mask in self.masks(guess)) if group]
+
+
+def build_index(lookup: ArrayWordle) -> BitsetIndex:
+    order = np.argsort(lookup.results, axis=0, kind='stable').T.astype(np.uint16)
+    histograms = lookup.result_histograms(lookup.all_wordbank_words())
+    offsets = np.zeros((len(lookup.guessable), NUM_RESULTS + 1), dtype=np.uint16)
+    np.cumsum(histograms, axis=1, out=offsets[:, 1:])
+    return BitsetIndex(np.ascontiguousarray(order), offsets)
+
+
+def write_index(path: str, lookup: ArrayWordle, index: BitsetIndex):
+    order_offset = HEADER_SIZE
+    offsets_offset = order_offset + index.order.nbytes
+    header = struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        VERSION,
+        len(lookup.wordbank),
+        len(lookup.guessable),
+        lookup_table.words_digest(lookup.wordbank, lookup.guessable),
+        order_offset,
+        offsets_offset,
+    )
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(header.ljust(HEADER_SIZE, b'\0'))
+        out.write(index.order.tobytes())
+        out.write(index.offsets.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_index(path=MASKS_PATH) -> Tuple[BitsetIndex, bytes]:
+    """Memory-map an index. Returns it and the digest of its word lists."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, num_wordbank, num_guessable, digest, order_offset, offsets_offset = (
+        struct.unpack_from(HEADER_FORMAT, mm)
+    )
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a mask index')
+    if version != VERSION:
+        raise ValueError(f'{path} has version {version}, expected {VERSION}')
+    order = np.frombuffer(
+        mm, dtype=np.uint16, count=num_guessable * num_wordbank, offset=order_offset
+    ).reshape((num_guessable, num_wordbank))
+    offsets = np.frombuffer(
+        mm, dtype=np.uint16, count=num_guessable * (NUM_RESULTS + 1), offset=offsets_offset
+    ).reshape((num_guessable, NUM_RESULTS + 1))
+    return BitsetIndex(order, offsets), digest
+
+
+def load(lookup: ArrayWordle, path=MASKS_PATH) -> BitsetIndex:
+    """Use the on-disk index if there's one for this table, otherwise build it in memory."""
+    try:
+        index, digest = read_index(path)
+        if digest == lookup_table.words_digest(lookup.wordbank, lookup.guessable):
+            return index
+    except (FileNotFoundError, ValueError, struct.error):
+        pass
+    return build_index(lookup)
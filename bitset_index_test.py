@@ -0,0 +1,33 @@
+from bitset_index import build_index, read_index, to_bitset, to_indices, write_index
+from quordlebot import ArrayWordle, encode_result
+
+
+def test_bitsets():
+    assert to_indices(to_bitset([0, 3, 9], 10)) == [0, 3, 9]
+    assert to_indices(0) == []
+
+
+def test_index(tmp_path):
+    words = ['TREAD', 'STEAD', 'TRADE', 'DEALT']
+    lookup = ArrayWordle.from_words(words, words)
+    index = build_index(lookup)
+    dealt = lookup.guessable_to_idx['DEALT']
+    assert to_indices(index.mask(dealt, encode_result('yyy.y'))) == [0, 1]
+    assert to_indices(index.filter(0b0101, dealt, encode_result('yyy.y'))) == [0]
+    assert sorted(to_indices(g) for g in index.split(index.all_words, dealt)) == [[0, 1], [2], [3]]
+
+    path = str(tmp_path / 'masks.bin')
+    write_index(path, lookup, index)
+    index2, _ = read_index(path)
+    assert index2.mask(dealt, encode_result('yyy.y')) == index.mask(dealt, encode_result('yyy.y'))
+
+
+def test_mask_cache_is_bounded():
+    words = ['TREAD', 'STEAD', 'TRADE', 'DEALT']
+    lookup = ArrayWordle.from_words(words, words)
+    index = build_index(lookup)
+    index.max_cached = 2
+    for guess in [0, 1, 0, 2]:
+        index.masks(guess)
+    # 1 was the least recently used.
+    assert list(index._masks) == [0, 2]
@@ -1,32 +1,36 @@
 #!/usr/bin/env python
-"""Generate a word pair -> green/yellow mapping."""
+"""Generate the wordbank x guessable result table (words/results.bin).
 
-from typing import Dict, List
-from quordlebot import result_for_guess
-import json
-import pickle
+This takes a few seconds; use --jobs to split the work across cores.
+"""
 
+import argparse
+import multiprocessing
+import time
 
-if __name__ == "__main__":
-    wordbank = [word.strip() for word in open("words/wordbank.txt")]
-    allowed = [word.strip() for word in open("words/allowed.txt")]
-    combined = [*sorted([*wordbank, *allowed])]
-    print('wordbank: ', len(wordbank))
-    print('guessable:', len(combined))
+import bitset_index
+import lookup_table
 
-    out = {}
-    for i, word in enumerate(wordbank):
-        out[word] = {}
-        for guess in combined:
-            out[word][guess] = result_for_guess(word, guess)
 
-        if i % 100 == 0:
-            print(word)
-            with open('words/map.json', 'w') as out_file:
-                json.dump(out, out_file)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help=f'Number of processes to use (this machine has {multiprocessing.cpu_count()})')
+    parser.add_argument('--masks', action='store_true',
+                        help=f'Also write the (guess, result) bitset index to {bitset_index.MASKS_PATH}')
+    args = parser.parse_args()
+
+    wordbank, guessable = lookup_table.read_word_lists()
+    print('wordbank: ', len(wordbank))
+    print('guessable:', len(guessable))
 
-    with open('words/map.json', 'w') as out_file:
-        json.dump(out, out_file)
+    start = time.time()
+    results = lookup_table.build_results(wordbank, guessable, jobs=args.jobs)
+    lookup_table.write_table(lookup_table.TABLE_PATH, wordbank, guessable, results)
+    print(f'Wrote {lookup_table.TABLE_PATH} in {time.time() - start:.1f}s')
 
-    with open('words/map.pickle', 'wb') as out_file:
-        pickle.dump(out, out_file)
+    if args.masks:
+        start = time.time()
+        lookup = lookup_table.load()
+        bitset_index.write_index(bitset_index.MASKS_PATH, lookup, bitset_index.build_index(lookup))
+        print(f'Wrote {bitset_index.MASKS_PATH} in {time.time() - start:.1f}s')
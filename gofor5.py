@@ -2,103 +2,119 @@
 """Given an opening guess, what are the odds that you fully determine a word?
 
 This is important for getting a five.
+
+Usage:
+
+    ./gofor5.py                 # rank every guess as an opener
+    ./gofor5.py ROAST CLINE     # details for these openers
+    ./gofor5.py --pairs         # best second word for each of the top openers
+    ./gofor5.py --pairs FILET   # best second words for FILET
+
+Everything is computed from one (guess, result) histogram of the wordbank, which is
+built once, so ranking all 12,972 openers takes about a second.
 """
 
-from collections import Counter
-import pickle
-import sys
-import time
-from typing import Dict
-
-from quordlebot import ResultDict
-
-
-def groupby(xs, fn):
-    out = {}
-    for x in xs:
-        v = fn(x)
-        out.setdefault(v, []).append(x)
-    return out
-
-
-def examine_guess(guess: str, lookup: Dict[str, Dict[str, str]]):
-    results = groupby(
-        (
-            (pattern, solution)
-            for solution, guesses in lookup.items()
-            for g, pattern in guesses.items()
-            if g == guess
-        ),
-        lambda pair: pair[0]
-    )
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from quordlebot import ALL_GREEN, ArrayWordle, decode_result
+import lookup_table
+
+_histograms: Optional[Tuple[ArrayWordle, np.ndarray]] = None
+
+
+def opener_histograms(lookup: ArrayWordle) -> np.ndarray:
+    """(num_guessable, NUM_RESULTS) number of wordbank words giving each result for each guess."""
+    global _histograms
+    if _histograms is None or _histograms[0] is not lookup:
+        _histograms = lookup, lookup.result_histograms(lookup.all_wordbank_words())
+    return _histograms[1]
+
+
+def opener_scores(histograms: np.ndarray) -> np.ndarray:
+    """Score for each guess: one point for each fully-determined word (or 50/50 pair of
+    words), and five if it might be right."""
+    small = (histograms == 1) | (histograms == 2)
+    small[:, ALL_GREEN] = False
+    return 5 * (histograms[:, ALL_GREEN] > 0) + np.count_nonzero(small, axis=1)
+
+
+def score_for_opener(lookup: ArrayWordle, guess: str) -> int:
+    histograms = opener_histograms(lookup)
+    return int(opener_scores(histograms[[lookup.guessable_to_idx[guess]]])[0])
+
+
+def examine_guess(guess: str, lookup: ArrayWordle):
+    column = lookup.results[:, lookup.guessable_to_idx[guess]]
+    histogram = opener_histograms(lookup)[lookup.guessable_to_idx[guess]]
+    # Patterns in the order they first come up in the wordbank.
+    results, first = np.unique(column, return_index=True)
+    results = results[np.argsort(first)]
     for count in 1, 2:
-        for pattern, possibilities in results.items():
-            if len(possibilities) != count:
-                continue
-            words = [word for _pat, word in possibilities]
-            print(f'  {pattern}: {words}')
-
-    by_count = Counter()
-    for pattern, possibilities in results.items():
-        n = len(possibilities)
-        by_count[n] += n
-    for count in sorted([*by_count.keys()]):
-        if count > 10:
-            break
-        print(f'  {count}: {by_count[count]}')
-
-
-def score_for_opener(lookup: Dict[str, Dict[str, str]], guess: str):
-    results = groupby(
-        (
-            (pattern, solution)
-            for solution, guesses in lookup.items()
-            for g, pattern in guesses.items()
-            if g == guess
-        ),
-        lambda pair: pair[0]
-    )
-    score = 0
-    for pattern, possibilities in results.items():
-        n = len(possibilities)
-        if pattern == 'ggggg':
-            score += 5
-        elif n == 1 or n == 2:
-            # one point for a fully-determined word,
-            # 0.5 points for each of the two words in a 50/50
-            score += 1
-    return score
-
-
-def find_best_opener(lookup: Dict[str, Dict[str, str]]):
-    wordbank = [*lookup.keys()]
-    allowed = [*lookup[wordbank[0]].keys()]
-
-    scores = []
-    for i, guess in enumerate(allowed):
-        scores.append((score_for_opener(lookup, guess), guess))
-        if i % 100 == 0:
-            print(i, guess, time.ctime())
-            scores.sort(reverse=True)
-            for i, (score, guess) in enumerate(scores[:100]):
-                print(f'  {i+1}: {score} {guess}')
-
-    scores.sort(reverse=True)
-    for i, (score, guess) in enumerate(scores[:1000]):
+        for result in results[histogram[results] == count].tolist():
+            words = [lookup.wordbank[i] for i in np.flatnonzero(column == result).tolist()]
+            print(f'  {decode_result(result)}: {words}')
+
+    for count in range(1, 11):
+        n = int(histogram[histogram == count].sum())
+        if n:
+            print(f'  {count}: {n}')
+
+
+def determined_counts(histograms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Number of words that each guess fully determines, and that it leaves as a 50/50."""
+    return (histograms * (histograms == 1)).sum(axis=1), (histograms * (histograms == 2)).sum(axis=1)
+
+
+def second_word_gains(lookup: ArrayWordle, guess1: int, block_size=1024) -> np.ndarray:
+    """Information gain of guess1 followed by each guessable word."""
+    guesses = np.arange(len(lookup.guessable))
+    return np.concatenate([
+        lookup.pair_information_gains(guess1, guesses[start:start + block_size])
+        for start in range(0, len(guesses), block_size)
+    ])
+
+
+def print_pairs(lookup: ArrayWordle, guess1: int, top: int):
+    """The best second words to play after guess1, like the "go for five" variants in the README."""
+    determined, fifty = determined_counts(opener_histograms(lookup)[[guess1]])
+    gains = second_word_gains(lookup, guess1)
+    for guess2 in np.argsort(-gains, kind='stable')[:top].tolist():
+        print(f'  {lookup.guessable[guess1]} / {lookup.guessable[guess2]}: {determined[0]} / {fifty[0]}, {gains[guess2]:.3f} IG')
+
+
+def find_best_opener(lookup: ArrayWordle, top=1000) -> List[Tuple[int, str]]:
+    """Every guessable word as an opener, best first."""
+    scores = opener_scores(opener_histograms(lookup))
+    ranked = sorted(zip(scores.tolist(), lookup.guessable), reverse=True)
+    for i, (score, guess) in enumerate(ranked[:top]):
         print(f'  {i+1}: {score} {guess}')
+    return ranked
 
 
 if __name__ == "__main__":
-    lookup = pickle.load(open("words/map.pickle", "rb"))
-    wordbank = [*lookup.keys()]
-    allowed = [*lookup[wordbank[0]].keys()]
-
-    if len(sys.argv) >= 2:
-        for guess in sys.argv[1:]:
+    parser = argparse.ArgumentParser(description='Find openers that are likely to fully determine words.')
+    parser.add_argument('guesses', nargs='*', help='Openers to examine (default: rank them all).')
+    parser.add_argument('--pairs', action='store_true', help='Rank second words to play after the openers.')
+    parser.add_argument('--top', type=int, default=20, help='Number of openers or pairs to show with --pairs.')
+    args = parser.parse_args()
+
+    lookup = lookup_table.load()
+
+    if args.pairs:
+        if args.guesses:
+            for guess in args.guesses:
+                print_pairs(lookup, lookup.guessable_to_idx[guess.upper()], args.top)
+        else:
+            scores = opener_scores(opener_histograms(lookup))
+            for guess in np.argsort(-scores, kind='stable')[:args.top].tolist():
+                print_pairs(lookup, guess, 1)
+    elif args.guesses:
+        for guess in args.guesses:
             print(guess + ':')
-            examine_guess(guess, lookup)
+            examine_guess(guess.upper(), lookup)
             print('')
-
     else:
-        # Try them all
         find_best_opener(lookup)
@@ -0,0 +1,23 @@
+from collections import Counter
+
+import numpy as np
+
+from gofor5 import determined_counts, opener_histograms, opener_scores, second_word_gains
+from quordlebot import ALL_GREEN, ArrayWordle
+
+
+def test_opener_scores():
+    words = [word.strip() for word in open('words/wordbank.txt')][:200]
+    lookup = ArrayWordle.from_words(words, words)
+    histograms = opener_histograms(lookup)
+    scores = opener_scores(histograms)
+    determined, fifty = determined_counts(histograms)
+    for guess in range(0, len(words), 17):
+        groups = Counter(lookup.results[:, guess].tolist())
+        expected = sum(5 if result == ALL_GREEN else 1 for result, n in groups.items() if n <= 2 or result == ALL_GREEN)
+        assert scores[guess] == expected
+        assert determined[guess] == sum(n for n in groups.values() if n == 1)
+        assert fifty[guess] == sum(n for n in groups.values() if n == 2)
+
+    gains = second_word_gains(lookup, 0, block_size=64)
+    assert np.allclose(gains, [lookup.information_gain2(0, guess) for guess in range(len(words))])
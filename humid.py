@@ -5,40 +5,37 @@ My sense is that most of the time it's HUMID.
 And if you guess ROAST / PRIOR / HUMID, how often can you get a guaranteed seven?
 """
 
-import math
-import pickle
 import random
 from collections import Counter
-from quordlebot import ResultDict, ArrayWordle
+from quordlebot import ArrayWordle
+from quordle_state import QuordleState
+import bitset_index
+from bitset_index import to_indices
+import lookup_table
 from typing import List
 
-def roast_cline(wordler, four: List[int]) -> List[List[int]]:
+def roast_cline(wordler, index: bitset_index.BitsetIndex, four: List[int]) -> List[List[int]]:
     """Possibilities after playing ROAST / CLINE"""
-    wordbank = wordler.all_wordbank_words()
     roast = wordler.guessable_to_idx['ROAST']
     cline = wordler.guessable_to_idx['CLINE']
-    candidates1 = [
-        wordler.filter_by_guess(wordbank, roast, word)
+    return [
+        to_indices(
+            index.mask(roast, wordler.results[word, roast]) &
+            index.mask(cline, wordler.results[word, cline])
+        )
         for word in four
     ]
-    # print([len(quad) for quad in candidates1])
-
-    candidates2 = [
-        wordler.filter_by_guess(possibilities, cline, word)
-        for word, possibilities in zip(four, candidates1)
-    ]
-    # print([len(quad) for quad in candidates2])
-    return candidates2
 
 
 def fraction_with_determined_word(wordler):
     """If you open ROAST/CLINE, how often is there a fully-determined word?"""
     wordbank = wordler.all_wordbank_words()
+    index = bitset_index.load(wordler)
 
     num = 0
     for i in range(1000):
         four = random.choices(wordbank, k=4)
-        possibilities = roast_cline(wordler, four)
+        possibilities = roast_cline(wordler, index, four)
         has_soln = any(len(x) == 1 for x in possibilities)
         print([wordler.wordbank[i] for i in four], has_soln)
         if has_soln:
@@ -52,19 +49,15 @@ def next_after_roast(wordler: ArrayWordle):
     """If you open ROAST, what's the best next word to play?"""
     wordbank = wordler.all_wordbank_words()
     roast = wordler.guessable_to_idx['ROAST']
+    state = QuordleState(wordler, bitset_index.load(wordler))
 
     num = 100
     next_best = Counter()
     for i in range(num):
         four = random.choices(wordbank, k=4)
-        candidates = [
-            wordler.filter_by_guess(wordbank, roast, word)
-            for word in four
-        ]
-        gains = []
-        for guess, guess_str in enumerate(wordler.guessable):
-            gain = sum(wordler.information_gain_for_play(words, guess) for words in candidates)
-            gains.append((gain, guess_str))
+        state.play_against(roast, four)
+        gains = [*zip(state.information_gains().tolist(), wordler.guessable)]
+        state.undo()
 
         gains.sort(reverse=True)
         gain, guess_str = max(gains)
@@ -79,8 +72,7 @@ def next_after_roast(wordler: ArrayWordle):
 
 
 if __name__ == '__main__':
-    result_dict = pickle.load(open('words/array.pickle', 'rb'))
-    wordler = ArrayWordle(result_dict)
+    wordler = lookup_table.load()
 
     # fraction_with_determined_word(wordler)
     next_after_roast(wordler)
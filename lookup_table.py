@@ -0,0 +1,145 @@
+"""On-disk format for the wordbank x guessable result matrix.
+
+The file is a fixed-size header, the raw uint8 result matrix and then the word lists:
+
+    header (HEADER_SIZE bytes, see HEADER_FORMAT)
+    results: num_wordbank * num_guessable uint8, row-major (page-aligned)
+    wordbank: num_wordbank * 5 ASCII bytes
+    guessable: num_guessable * 5 ASCII bytes
+
+The matrix is memory-mapped rather than read, so loading it costs only page faults
+and every process using the table shares one copy in the page cache.
+"""
+
+import hashlib
+import mmap
+import multiprocessing
+import os
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+from quordlebot import WORD_LEN, ArrayWordle, ResultDict, letter_codes, results_for_block
+
+TABLE_PATH = 'words/results.bin'
+WORDBANK_PATH = 'words/wordbank.txt'
+ALLOWED_PATH = 'words/allowed.txt'
+
+MAGIC = b'QRDL'
+VERSION = 1
+HEADER_FORMAT = '<4sIII32sQQ'
+"""magic, version, num_wordbank, num_guessable, word list digest, results offset, words offset"""
+HEADER_SIZE = 4096
+
+
+def read_word_lists(
+    wordbank_path=WORDBANK_PATH, allowed_path=ALLOWED_PATH
+) -> Tuple[List[str], List[str]]:
+    """Read the wordbank and the (sorted) full list of guessable words."""
+    wordbank = [word.strip() for word in open(wordbank_path) if word.strip()]
+    allowed = [word.strip() for word in open(allowed_path) if word.strip()]
+    guessable = [*sorted({*wordbank, *allowed})]
+    return wordbank, guessable
+
+
+def words_digest(wordbank: List[str], guessable: List[str]) -> bytes:
+    h = hashlib.sha256()
+    h.update('\n'.join(wordbank).encode('ascii'))
+    h.update(b'\0')
+    h.update('\n'.join(guessable).encode('ascii'))
+    return h.digest()
+
+
+def _build_rows(args: Tuple[np.ndarray, np.ndarray, int]) -> np.ndarray:
+    words, guesses, block_size = args
+    out = np.empty((len(words), len(guesses)), dtype=np.uint8)
+    for start in range(0, len(words), block_size):
+        out[start:start + block_size] = results_for_block(words[start:start + block_size], guesses)
+    return out
+
+
+def build_results(
+    wordbank: List[str], guessable: List[str], *, jobs=1, block_size=256
+) -> np.ndarray:
+    """Compute the full result matrix, optionally splitting the rows across processes."""
+    words = letter_codes(wordbank)
+    guesses = letter_codes(guessable)
+    if jobs <= 1:
+        return _build_rows((words, guesses, block_size))
+
+    chunks = [
+        (rows, guesses, block_size) for rows in np.array_split(words, jobs * 4) if len(rows)
+    ]
+    with multiprocessing.Pool(jobs) as pool:
+        return np.concatenate(pool.map(_build_rows, chunks))
+
+
+def write_table(path: str, wordbank: List[str], guessable: List[str], results: np.ndarray):
+    """Write a table, atomically replacing any existing file at path."""
+    assert results.shape == (len(wordbank), len(guessable))
+    assert results.dtype == np.uint8
+    results_offset = HEADER_SIZE
+    words_offset = results_offset + results.size
+    header = struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        VERSION,
+        len(wordbank),
+        len(guessable),
+        words_digest(wordbank, guessable),
+        results_offset,
+        words_offset,
+    )
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(header.ljust(HEADER_SIZE, b'\0'))
+        out.write(np.ascontiguousarray(results).tobytes())
+        out.write(''.join(wordbank).encode('ascii'))
+        out.write(''.join(guessable).encode('ascii'))
+    os.replace(tmp_path, path)
+
+
+def split_words(buf: bytes) -> List[str]:
+    text = buf.decode('ascii')
+    return [text[i:i + WORD_LEN] for i in range(0, len(text), WORD_LEN)]
+
+
+def read_table(path=TABLE_PATH) -> Tuple[ResultDict, bytes]:
+    """Memory-map a table. Returns the results and the digest of its word lists."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, num_wordbank, num_guessable, digest, results_offset, words_offset = (
+        struct.unpack_from(HEADER_FORMAT, mm)
+    )
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a result table')
+    if version != VERSION:
+        raise ValueError(f'{path} has version {version}, expected {VERSION}')
+    results = np.frombuffer(
+        mm, dtype=np.uint8, count=num_wordbank * num_guessable, offset=results_offset
+    ).reshape((num_wordbank, num_guessable))
+    guessable_offset = words_offset + WORD_LEN * num_wordbank
+    wordbank = split_words(mm[words_offset:guessable_offset])
+    guessable = split_words(mm[guessable_offset:guessable_offset + WORD_LEN * num_guessable])
+    return ResultDict(wordbank=wordbank, guessable=guessable, results=results), digest
+
+
+def load(path=TABLE_PATH, *, rebuild=True) -> ArrayWordle:
+    """Load the result table, (re)building it if it's missing or out of date."""
+    wordbank, guessable = read_word_lists()
+    expected = words_digest(wordbank, guessable)
+    try:
+        result_dict, digest = read_table(path)
+        if digest == expected:
+            return ArrayWordle(result_dict)
+        reason = 'word lists have changed'
+    except (FileNotFoundError, ValueError, struct.error) as e:
+        reason = str(e)
+    if not rebuild:
+        raise ValueError(f'Result table {path} is unusable: {reason}')
+
+    print(f'Rebuilding {path} ({reason})')
+    write_table(path, wordbank, guessable, build_results(wordbank, guessable))
+    result_dict, _ = read_table(path)
+    return ArrayWordle(result_dict)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from lookup_table import build_results, read_table, words_digest, write_table
+from quordlebot import ArrayWordle, encode_result, result_for_guess
+
+
+def test_write_read_table(tmp_path):
+    wordbank = ['APPLE', 'ROPES']
+    guessable = ['APPLE', 'POPES', 'ROPES']
+    results = ArrayWordle.from_words(wordbank, guessable).results
+    path = str(tmp_path / 'results.bin')
+    write_table(path, wordbank, guessable, results)
+
+    result_dict, digest = read_table(path)
+    assert result_dict.wordbank == wordbank
+    assert result_dict.guessable == guessable
+    assert (result_dict.results == results).all()
+    assert digest == words_digest(wordbank, guessable)
+    assert ArrayWordle(result_dict).result('APPLE', 'POPES') == 'y.gy.'
+
+
+def test_build_results_matches_result_for_guess():
+    words = ['APPLE', 'POPES', 'ROPES', 'PLUMP', 'DEALT', 'TREAD', 'STEAD', 'MAVEN', 'EERIE', 'LEVEE']
+    expected = np.array([[encode_result(result_for_guess(w, g)) for g in words] for w in words], dtype=np.uint8)
+    assert (build_results(words, words) == expected).all()
+    assert (build_results(words, words, block_size=3) == expected).all()
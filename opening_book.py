@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""Precomputed information gains for the positions after common openers.
+
+Usage:
+
+    ./opening_book.py ROAST CLINE   # writes books for ROAST and for ROAST, CLINE
+
+After a fixed sequence of openers, each board's candidates depend only on the results
+that board showed for them (its pattern). There are only a few hundred patterns with
+more than one candidate (467 for ROAST, CLINE), but far too many combinations of four
+of them to store a best play for every game state. Information gain adds up across
+boards, though, so the book stores the gain of every guess for each pattern, and the
+gains for a game state are the sum of its boards' rows.
+
+The file is a fixed-size header followed by:
+
+    patterns: num_patterns int64 pattern keys (sorted)
+    rows: num_patterns int32 row for each pattern (-1 if it has only one candidate)
+    gains: num_rows * num_guessable float32 (page-aligned)
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from quordlebot import ALL_GREEN, ArrayWordle, NUM_RESULTS
+import lookup_table
+
+BOOKS_DIR = 'books'
+
+MAGIC = b'QRDB'
+VERSION = 1
+MAX_OPENERS = 4
+HEADER_FORMAT = '<4sIIII32s4iQQQ'
+"""magic, version, num_openers, num_patterns, num_rows, word list digest, openers (guessable
+indices, padded with -1), patterns offset, rows offset, gains offset"""
+HEADER_SIZE = 4096
+
+
+def pattern_key(results: Sequence[int]) -> int:
+    """A board's results for each of the openers, as one number."""
+    key = 0
+    for result in results:
+        key = key * NUM_RESULTS + int(result)
+    return key
+
+
+class OpeningBook:
+    def __init__(self, openers: Sequence[int], patterns: np.ndarray, rows: np.ndarray, gains: np.ndarray):
+        self.openers = [*openers]
+        self.patterns = patterns
+        self.rows = rows
+        self.gains = gains
+        """(num_rows, num_guessable) information gain of each guess for each pattern."""
+        self.pattern_to_row: Dict[int, int] = dict(zip(patterns.tolist(), rows.tolist()))
+
+    def information_gains(self, boards: Sequence[Sequence[int]]) -> Optional[np.ndarray]:
+        """Information gain of each guess, summed over boards, or None if the position isn't in the book.
+
+        Each board is given by its (encoded) results for each of the openers. Boards that
+        have been solved, or whose word is fully determined, contribute nothing.
+        """
+        total = np.zeros(self.gains.shape[1])
+        for results in boards:
+            if len(results) != len(self.openers):
+                return None
+            if ALL_GREEN in results:
+                continue
+            row = self.pattern_to_row.get(pattern_key(results))
+            if row is None:
+                return None  # not a possible pattern
+            if row >= 0:
+                total += self.gains[row]
+        return total
+
+
+def build_book(lookup: ArrayWordle, openers: Sequence[int]) -> OpeningBook:
+    keys = np.zeros(len(lookup.wordbank), dtype=np.int64)
+    for guess in openers:
+        keys = keys * NUM_RESULTS + lookup.results[:, guess]
+    patterns, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+
+    rows = np.full(len(patterns), -1, dtype=np.int32)
+    gains: List[np.ndarray] = []
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if end - start > 1:
+            rows[i] = len(gains)
+            gains.append(lookup.information_gains([order[start:end].tolist()]).astype(np.float32))
+    gains_array = np.array(gains, dtype=np.float32).reshape((len(gains), len(lookup.guessable)))
+    return OpeningBook(openers, patterns, rows, gains_array)
+
+
+def book_path(lookup: ArrayWordle, openers: Sequence[int], books_dir=BOOKS_DIR) -> str:
+    return os.path.join(books_dir, '-'.join(lookup.guessable[g] for g in openers) + '.book')
+
+
+def write_book(path: str, lookup: ArrayWordle, book: OpeningBook):
+    """Write a book, atomically replacing any existing file at path."""
+    assert len(book.openers) <= MAX_OPENERS
+    patterns_offset = HEADER_SIZE
+    rows_offset = patterns_offset + book.patterns.nbytes
+    gains_offset = -(-(rows_offset + book.rows.nbytes) // mmap.PAGESIZE) * mmap.PAGESIZE
+    header = struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        VERSION,
+        len(book.openers),
+        len(book.patterns),
+        len(book.gains),
+        lookup_table.words_digest(lookup.wordbank, lookup.guessable),
+        *(book.openers + [-1] * (MAX_OPENERS - len(book.openers))),
+        patterns_offset,
+        rows_offset,
+        gains_offset,
+    )
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(header.ljust(HEADER_SIZE, b'\0'))
+        out.write(book.patterns.astype(np.int64).tobytes())
+        out.write(book.rows.astype(np.int32).tobytes())
+        out.write(b'\0' * (gains_offset - rows_offset - book.rows.nbytes))
+        out.write(np.ascontiguousarray(book.gains, dtype=np.float32).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_book(path: str, num_guessable: int) -> Tuple[OpeningBook, bytes]:
+    """Memory-map a book. Returns it and the digest of its word lists."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, num_openers, num_patterns, num_rows, digest, *rest = struct.unpack_from(HEADER_FORMAT, mm)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not an opening book')
+    if version != VERSION:
+        raise ValueError(f'{path} has version {version}, expected {VERSION}')
+    openers, (patterns_offset, rows_offset, gains_offset) = rest[:num_openers], rest[MAX_OPENERS:]
+    patterns = np.frombuffer(mm, dtype=np.int64, count=num_patterns, offset=patterns_offset)
+    rows = np.frombuffer(mm, dtype=np.int32, count=num_patterns, offset=rows_offset)
+    gains = np.frombuffer(
+        mm, dtype=np.float32, count=num_rows * num_guessable, offset=gains_offset
+    ).reshape((num_rows, num_guessable))
+    return OpeningBook(openers, patterns, rows, gains), digest
+
+
+def load_books(lookup: ArrayWordle, books_dir=BOOKS_DIR) -> Dict[Tuple[str, ...], OpeningBook]:
+    """All the books in books_dir for this result table, keyed by their openers."""
+    books = {}
+    if not os.path.isdir(books_dir):
+        return books
+    expected = lookup_table.words_digest(lookup.wordbank, lookup.guessable)
+    for filename in sorted(os.listdir(books_dir)):
+        if not filename.endswith('.book'):
+            continue
+        try:
+            book, digest = read_book(os.path.join(books_dir, filename), len(lookup.guessable))
+        except (ValueError, struct.error):
+            continue
+        if digest == expected:
+            books[tuple(lookup.guessable[g] for g in book.openers)] = book
+    return books
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build opening books for a sequence of openers and each of its prefixes.')
+    parser.add_argument('openers', nargs='+', help='Opening guesses, e.g. ROAST CLINE')
+    parser.add_argument('--dir', default=BOOKS_DIR, help='Where to write the books.')
+    args = parser.parse_args()
+
+    lookup = lookup_table.load()
+    openers = [lookup.guessable_to_idx[word.upper()] for word in args.openers]
+    if len(openers) > MAX_OPENERS:
+        parser.error(f'At most {MAX_OPENERS} openers are supported')
+    for n in range(1, len(openers) + 1):
+        start = time.time()
+        book = build_book(lookup, openers[:n])
+        path = book_path(lookup, openers[:n], args.dir)
+        write_book(path, lookup, book)
+        print(f'Wrote {path} ({len(book.patterns)} patterns, {len(book.gains)} rows) in {time.time() - start:.1f}s')
@@ -0,0 +1,34 @@
+import numpy as np
+
+from opening_book import build_book, load_books, read_book, write_book, book_path
+from quordlebot import ArrayWordle, encode_result
+
+
+def test_opening_book(tmp_path):
+    words = [word.strip() for word in open('words/wordbank.txt')][:200]
+    lookup = ArrayWordle.from_words(words, words)
+    openers = [lookup.guessable_to_idx['ABOUT'], lookup.guessable_to_idx['ACRID']]
+    book = build_book(lookup, openers)
+
+    answers = [5, 50, 150, 199]
+    boards = [[int(lookup.results[a, g]) for g in openers] for a in answers]
+    quads = []
+    for a in answers:
+        candidates = lookup.all_wordbank_words()
+        for g in openers:
+            candidates = lookup.filter_by_guess(candidates, g, a)
+        quads.append(candidates)
+    expected = lookup.information_gains(quads)
+    assert np.allclose(book.information_gains(boards), expected, atol=1e-5)
+
+    # Off-book: wrong number of openers, or a pattern that can't happen.
+    assert book.information_gains([boards[0][:1]]) is None
+    assert book.information_gains([[encode_result('yyyyy'), encode_result('yyyyy')]]) is None
+
+    path = book_path(lookup, openers, str(tmp_path))
+    assert path.endswith('ABOUT-ACRID.book')
+    write_book(path, lookup, book)
+    book2, _ = read_book(path, len(lookup.guessable))
+    assert book2.openers == openers
+    assert np.array_equal(book2.information_gains(boards), book.information_gains(boards))
+    assert [*load_books(lookup, str(tmp_path))] == [('ABOUT', 'ACRID')]
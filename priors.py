@@ -1,30 +1,280 @@
 #!/usr/bin/env python
-"""Find best first Quordle guesses."""
+"""Find the best pairs of first guesses.
 
-import pickle
-import multiprocessing
-from pathos.multiprocessing import ProcessingPool as Pool
+Usage:
+
+    ./priors.py [--all] [--top 100] [--jobs 4] [--checkpoint PATH] [words.txt]
+    ./priors.py [--all] --per-guess 20 [--output PATH] [words.txt]
+
+Pairs are scored by their information gain on a single board (information_gain2).
+The candidate words are the wordbank, all guessable words (--all) or the words listed
+in a file. The score is symmetric, so each unordered pair is scored at most once.
+
+Most pairs are never scored. The gain of a pair is at most the sum of the gains of its
+two words, so with words sorted by their individual gain, each first word only needs
+to be paired with words down to (K-th best pair so far) - (its own gain), and once the
+two best remaining words can't beat the K-th best pair, we're done.
+
+Progress is periodically saved to the checkpoint file; rerunning the same command
+picks up where an interrupted run left off.
+
+With --per-guess N, it instead finds the N best second guesses for every word. This is
+a sweep (see sweep.py): it's sharded across processes, written to a single file as it
+goes and resumable.
+"""
+
+import argparse
+import heapq
 import json
-import time
+import math
+import multiprocessing
+import os
 import sys
-from typing import List, Tuple
-from quordlebot import ResultDict, ArrayWordle
-
-
-def top_second_guesses(wordler: ArrayWordle, guess1: int, guessables: List[int]) -> List[Tuple[float, int, int]]:
-    gains = [
-        (wordler.information_gain2(guess1, guess2), guess1, guess2)
-        for guess2 in guessables
-    ]
-    gains.sort(reverse=True)
-    guess1_str = wordler.guessable[guess1]
-    best = gains[:20]
-    with open(f'priors/for5/{guess1_str}.txt', 'w') as out:
+import time
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from quordlebot import ArrayWordle
+import lookup_table
+from sweep import Sweep, run_sweep
+
+CHECKPOINT_PATH = 'priors/pairs.json'
+
+Pair = Tuple[float, int, int]
+"""gain, guess1, guess2 (guessable indices)"""
+
+EPSILON = 1e-9
+"""Slack for the pruning bound, so that float rounding can't drop a tied pair."""
+
+
+class TopPairs:
+    """The K best pairs seen so far, as a min-heap."""
+
+    def __init__(self, k: int, pairs: Sequence[Pair] = ()):
+        self.k = k
+        self.heap: List[Pair] = []
+        self.merge(pairs)
+
+    @property
+    def threshold(self) -> float:
+        """A pair has to score at least this to make the list."""
+        return self.heap[0][0] if len(self.heap) >= self.k else -math.inf
+
+    def push(self, pair: Pair):
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, pair)
+        elif pair > self.heap[0]:
+            heapq.heapreplace(self.heap, pair)
+
+    def merge(self, pairs: Sequence[Pair]):
+        for pair in pairs:
+            self.push(tuple(pair))
+
+    def best(self) -> List[Pair]:
+        return sorted(self.heap, reverse=True)
+
+
+def rank_singles(wordler: ArrayWordle, guesses: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Guesses sorted by their individual information gain (descending), and those gains."""
+    guesses = np.asarray(guesses, dtype=np.intp)
+    gains = wordler.information_gains([wordler.all_wordbank_words()], guesses)
+    order = np.argsort(-gains, kind='stable')
+    return guesses[order], gains[order]
+
+
+def top_pairs_for_guess(
+    wordler: ArrayWordle,
+    guesses: np.ndarray,
+    gains: np.ndarray,
+    position: int,
+    top: int,
+    threshold_fn,
+    block_size=256,
+) -> List[Pair]:
+    """Score guesses[position] against the guesses after it that could still make the list.
+
+    threshold_fn returns the current K-th best gain; it's re-read after every block.
+    Returns the pairs that beat it (at most top of them).
+    """
+    local = TopPairs(top)
+    guess1 = int(guesses[position])
+    start = position + 1
+    while start < len(guesses):
+        threshold = max(threshold_fn(), local.threshold) - EPSILON
+        # gains is descending, so this is the number of guesses with gain1 + gain2 >= threshold.
+        limit = np.searchsorted(-gains, gains[position] - threshold, side='right')
+        block = guesses[start:min(start + block_size, limit)]
+        if not len(block):
+            break
+        for gain, guess2 in zip(wordler.pair_information_gains(guess1, block).tolist(), block.tolist()):
+            local.push((gain, guess1, guess2))
+        start += len(block)
+    threshold = threshold_fn()
+    return [pair for pair in local.best() if pair[0] >= threshold - EPSILON]
+
+
+_pool_wordler: Optional[ArrayWordle] = None
+_pool_guesses: Optional[np.ndarray] = None
+_pool_gains: Optional[np.ndarray] = None
+_pool_top = 0
+_pool_threshold: Any = None
+"""Shared value with the K-th best gain seen by the parent process."""
+
+
+def _pool_top_pairs(position: int) -> Tuple[int, List[Pair]]:
+    pairs = top_pairs_for_guess(
+        _pool_wordler, _pool_guesses, _pool_gains, position, _pool_top, lambda: _pool_threshold.value
+    )
+    return position, pairs
+
+
+def is_exhausted(gains: np.ndarray, position: int, threshold: float) -> bool:
+    """Can no pair starting at position (or later) beat threshold?"""
+    return position + 1 >= len(gains) or gains[position] + gains[position + 1] < threshold - EPSILON
+
+
+def search_pairs(
+    wordler: ArrayWordle,
+    guesses: Sequence[int],
+    *,
+    top=100,
+    jobs=1,
+    checkpoint: Optional[str] = None,
+    checkpoint_every=60.0,
+) -> List[Pair]:
+    """The top pairs of guesses by information gain, best first."""
+    guesses, gains = rank_singles(wordler, guesses)
+    words = [wordler.guessable[i] for i in guesses]
+    state = load_checkpoint(checkpoint, wordler, words, top) if checkpoint else None
+    position = state['position'] if state else 0
+    top_pairs = TopPairs(top, [
+        (gain, wordler.guessable_to_idx[w1], wordler.guessable_to_idx[w2])
+        for gain, w1, w2 in state['pairs']
+    ] if state else ())
+    if position:
+        print(f'Resuming from {checkpoint} at {position} / {len(guesses)}')
+
+    def save():
+        if checkpoint:
+            save_checkpoint(checkpoint, wordler, words, top, position, top_pairs.best())
+
+    def positions() -> Iterator[int]:
+        for p in range(position, len(guesses)):
+            if is_exhausted(gains, p, top_pairs.threshold):
+                break
+            yield p
+
+    global _pool_wordler, _pool_guesses, _pool_gains, _pool_top, _pool_threshold
+    ctx = multiprocessing.get_context('fork')
+    _pool_wordler, _pool_guesses, _pool_gains, _pool_top = wordler, guesses, gains, top
+    _pool_threshold = ctx.Value('d', top_pairs.threshold, lock=False)
+    pool = ctx.Pool(jobs) if jobs > 1 else None
+    try:
+        results = pool.imap(_pool_top_pairs, positions()) if pool else map(_pool_top_pairs, positions())
+        last_save = time.time()
+        for p, pairs in results:
+            top_pairs.merge(pairs)
+            _pool_threshold.value = top_pairs.threshold
+            position = p + 1
+            if time.time() - last_save > checkpoint_every:
+                save()
+                last_save = time.time()
+                print(f'Completed {position} / {len(guesses)} @ {time.ctime()}; threshold {top_pairs.threshold:.4f}')
+                sys.stdout.flush()
+            if is_exhausted(gains, position, top_pairs.threshold):
+                break
+    finally:
+        if pool:
+            pool.terminate()
+    position = len(guesses)
+    save()
+    return top_pairs.best()
+
+
+def best_second_guesses(
+    wordler: ArrayWordle, guess1: int, guesses: np.ndarray, gains: np.ndarray, n: int, block_size=256
+) -> List[Pair]:
+    """The n best guesses to pair with guess1, from guesses (sorted by descending gain)."""
+    best = TopPairs(n)
+    gain1 = wordler.information_gain(guess1)
+    start = 0
+    while start < len(guesses):
+        limit = np.searchsorted(-gains, gain1 - (best.threshold - EPSILON), side='right')
+        block = guesses[start:min(start + block_size, limit)]
+        if not len(block):
+            break
+        for gain, guess2 in zip(wordler.pair_information_gains(guess1, block).tolist(), block.tolist()):
+            if guess2 != guess1:
+                best.push((gain, guess1, guess2))
+        start += len(block)
+    return best.best()
+
+
+SECOND_GUESSES_PATH = 'sweeps/second_guesses.sweep'
+
+
+def sweep_second_guesses(
+    wordler: ArrayWordle, guesses: Sequence[int], *, per_guess=20, jobs=1, path=SECOND_GUESSES_PATH
+) -> List[List[Pair]]:
+    """The best per_guess second guesses for each of guesses, as a resumable sweep."""
+    guesses = np.asarray(guesses, dtype=np.intp)
+    ranked, gains = rank_singles(wordler, guesses)
+
+    def shard(start: int, stop: int):
+        pairs = flatten(best_second_guesses(wordler, int(g1), ranked, gains, per_guess) for g1 in guesses[start:stop])
+        return {
+            'guess1': [g1 for _, g1, _ in pairs],
+            'guess2': [g2 for _, _, g2 in pairs],
+            'gain': [gain for gain, _, _ in pairs],
+        }
+
+    second_sweep = Sweep(
+        name='second_guesses',
+        num_items=len(guesses),
+        columns=[('guess1', 'uint16'), ('guess2', 'uint16'), ('gain', 'float64')],
+        params={
+            'words': lookup_table.words_digest(wordler.wordbank, wordler.guessable).hex(),
+            'guesses': [wordler.guessable[i] for i in guesses],
+            'per_guess': per_guess,
+        },
+    )
+    columns = run_sweep(path, second_sweep, shard, jobs=jobs)
+    by_guess1: dict = {}
+    for g1, g2, gain in zip(columns['guess1'].tolist(), columns['guess2'].tolist(), columns['gain'].tolist()):
+        by_guess1.setdefault(g1, []).append((gain, g1, g2))
+    return [by_guess1.get(g1, []) for g1 in guesses.tolist()]
+
+
+def save_checkpoint(
+    path: str, wordler: ArrayWordle, words: List[str], top: int, position: int, pairs: List[Pair]
+):
+    """Write a checkpoint, atomically replacing any existing file at path."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as out:
         json.dump({
-            wordler.guessable[g2]: gain
-            for gain, g1, g2 in best
+            'digest': lookup_table.words_digest(wordler.wordbank, wordler.guessable).hex(),
+            'words': words,
+            'top': top,
+            'position': position,
+            'pairs': [(gain, wordler.guessable[g1], wordler.guessable[g2]) for gain, g1, g2 in pairs],
         }, out)
-    return best
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str, wordler: ArrayWordle, words: List[str], top: int) -> Optional[dict]:
+    """Read a checkpoint, if there is one for this search."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    digest = lookup_table.words_digest(wordler.wordbank, wordler.guessable).hex()
+    if state.get('digest') != digest or state.get('words') != words or state.get('top') != top:
+        print(f'Ignoring {path}, which is for a different search')
+        return None
+    return state
 
 
 def chunks(lst, n):
@@ -38,59 +288,31 @@ def flatten(xss):
 
 
 if __name__ == "__main__":
-    # lookup = pickle.load(open('words/map.pickle', 'rb'))
-    result_dict = pickle.load(open('words/array.pickle', 'rb'))
-    wordler = ArrayWordle(result_dict)
-
-    guessable = [
-        wordler.to_guessable_idx(wordbank_idx)
-        for wordbank_idx in wordler.all_wordbank_words()
-    ]
-
-    if len(sys.argv) == 1:
-        gains = [
-            (
-                wordler.information_gain(i),
-                i
-            )
-            for i in guessable
-        ]
+    parser = argparse.ArgumentParser(description='Find the best pairs of first guesses.')
+    parser.add_argument('words', nargs='?', help='File with the words to consider (default: the wordbank).')
+    parser.add_argument('--all', action='store_true', help='Consider all guessable words.')
+    parser.add_argument('--top', type=int, default=100, help='Number of pairs to find.')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='Number of processes to use.')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='Where to save progress.')
+    parser.add_argument('--per-guess', type=int, help='Instead, find the best N second guesses for every word (resumable; see sweep.py).')
+    parser.add_argument('--output', default=SECOND_GUESSES_PATH, help='Sweep file for --per-guess.')
+    args = parser.parse_args()
+
+    wordler = lookup_table.load()
+    if args.words:
+        guessable = [wordler.guessable_to_idx[line.strip()] for line in open(args.words) if line.strip()]
+    elif args.all:
+        guessable = [*range(len(wordler.guessable))]
+    else:
+        guessable = wordler.wordbank_to_guessable.tolist()
+
+    start = time.time()
+    if args.per_guess:
+        seconds = sweep_second_guesses(wordler, guessable, per_guess=args.per_guess, jobs=args.jobs, path=args.output)
+        tops = sorted((pairs[0] for pairs in seconds if pairs), reverse=True)[:args.top]
+        print(f'Best second guess for the top {len(tops)} first guesses:')
     else:
-        gains = []
-        for line in open(sys.argv[1]):
-            word = line.strip()
-            i = wordler.guessable_to_idx[word]
-            gains.append((wordler.information_gain(i), i))
-
-    gains.sort(reverse=True)
-    print([(wordler.guessable[i], gain) for gain, i in gains[:10]])
-    print([(wordler.guessable[i], gain) for gain, i in gains[-10:]])
-    maxgain = gains[0][0]
-    # goodpair = 9.5
-    print(f'Max gain for one word: {maxgain}')
-
-    candidates = [(gain, i) for gain, i in gains]
-
-    cpus = multiprocessing.cpu_count()
-    tops = []
-    num_processed = 0
-    with Pool(cpus) as pool:
-        for chunk in chunks(candidates, cpus):
-            chunk_tops = pool.map(
-                lambda gi: top_second_guesses(wordler, gi[1], guessable),
-                chunk
-            )
-            flat_tops = flatten(chunk_tops)
-            tops += flat_tops
-            tops.sort(reverse=True)
-            tops = tops[:100]
-            num_processed += len(chunk)
-            # for gain, guess1 in chunk:
-            #     del guessables[guessables.index(guess1)]
-
-            print(f'Completed {num_processed} / {len(candidates)}: {chunk} @ {time.ctime()}')
-            for gain, i, j in tops[:40]:
-                g1 = wordler.guessable[i]
-                g2 = wordler.guessable[j]
-                print(f'  {g1} {g2} -> +{gain:.2f} bits')
-            sys.stdout.flush()
+        tops = search_pairs(wordler, guessable, top=args.top, jobs=args.jobs, checkpoint=args.checkpoint)
+    print(f'Searched {len(guessable)} words in {time.time() - start:.1f}s')
+    for gain, i, j in tops:
+        print(f'  {wordler.guessable[i]} {wordler.guessable[j]} -> +{gain:.2f} bits')
@@ -0,0 +1,42 @@
+import itertools
+import json
+
+from priors import TopPairs, load_checkpoint, search_pairs
+from quordlebot import ArrayWordle
+
+
+def small_wordler() -> ArrayWordle:
+    words = [word.strip() for word in open('words/wordbank.txt')][:150]
+    return ArrayWordle.from_words(words, words)
+
+
+def test_top_pairs():
+    top = TopPairs(2, [(1.0, 0, 1), (3.0, 0, 2)])
+    assert top.threshold == 1.0
+    top.push((2.0, 1, 2))
+    top.push((0.5, 1, 3))
+    assert top.best() == [(3.0, 0, 2), (2.0, 1, 2)]
+
+
+def test_search_pairs_matches_brute_force(tmp_path):
+    wordler = small_wordler()
+    guesses = [*range(len(wordler.guessable))]
+    expected = sorted(
+        (wordler.information_gain2(g1, g2) for g1, g2 in itertools.combinations(guesses, 2)),
+        reverse=True,
+    )[:10]
+
+    tops = search_pairs(wordler, guesses, top=10)
+    assert len(tops) == 10
+    for (gain, _, _), best in zip(tops, expected):
+        assert abs(gain - best) < 1e-9
+    for gain, g1, g2 in tops:
+        assert abs(gain - wordler.information_gain2(g1, g2)) < 1e-9
+
+    path = str(tmp_path / 'pairs.json')
+    assert search_pairs(wordler, guesses, top=10, jobs=2, checkpoint=path) == tops
+    words = json.load(open(path))['words']
+    assert load_checkpoint(path, wordler, words, 10)['position'] == len(words)
+    assert load_checkpoint(path, wordler, words, 20) is None  # a different search
+    # A finished checkpoint is reused without searching again.
+    assert search_pairs(wordler, guesses, top=10, checkpoint=path) == tops
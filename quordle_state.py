@@ -0,0 +1,132 @@
+"""The state of a Quordle game: the remaining candidates for each board.
+
+Each board's candidates are a bitset over wordbank indices (see bitset_index), so
+applying a guess narrows only what's left with a single &, and undoing it is just
+restoring the previous bitsets. Per-board entropies, histograms and information gains
+are cached by bitset, so they're only computed when a board actually changes (and are
+still there after an undo).
+"""
+
+import math
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from bitset_index import BitsetIndex, to_bitset, to_indices
+from quordlebot import ALL_GREEN, ArrayWordle, NUM_RESULTS, Quads, TranspositionTable
+
+NUM_BOARDS = 4
+
+Board = Optional[int]
+"""Bitset of the remaining candidates for a board, or None once it's been solved."""
+
+
+class QuordleState:
+    def __init__(self, lookup: ArrayWordle, index: Optional[BitsetIndex] = None, *, cache_size=256):
+        self.lookup = lookup
+        self.index = index
+        all_words = (1 << len(lookup.wordbank)) - 1
+        self.boards: List[Board] = [all_words] * NUM_BOARDS
+        self.guesses: List[int] = []
+        self.history: List[List[Board]] = []
+        """Boards before each guess, for undo."""
+        self._gains = TranspositionTable(maxsize=cache_size)
+        self._histograms = TranspositionTable(maxsize=cache_size * 16)
+        self._indices = TranspositionTable(maxsize=cache_size * 16)
+
+    def mask(self, guess: int, result: int) -> int:
+        """Wordbank words for which guess would produce result."""
+        if self.index is not None:
+            return self.index.mask(guess, result)
+        return to_bitset(np.flatnonzero(self.lookup.results[:, guess] == result), len(self.lookup.wordbank))
+
+    def play(self, guess: int, results: Sequence[Optional[int]]):
+        """Apply a guess (guessable index) and its encoded result on each board.
+
+        Results for boards that are already solved are ignored.
+        """
+        self.history.append(self.boards)
+        self.guesses.append(guess)
+        self.boards = [
+            None if board is None or result == ALL_GREEN else board & self.mask(guess, result)
+            for board, result in zip(self.boards, results)
+        ]
+
+    def play_against(self, guess: int, answers: Sequence[int]):
+        """Play a guess in a game whose answers (wordbank indices) are known."""
+        self.play(guess, [int(self.lookup.results[answer, guess]) for answer in answers])
+
+    def undo(self):
+        self.boards = self.history.pop()
+        self.guesses.pop()
+
+    @property
+    def depth(self) -> int:
+        return len(self.guesses)
+
+    def is_solved(self, board: int) -> bool:
+        return self.boards[board] is None
+
+    def is_won(self) -> bool:
+        return all(board is None for board in self.boards)
+
+    def candidates(self, board: int) -> Optional[List[int]]:
+        """The remaining candidates for a board (wordbank indices), or None if it's solved."""
+        bits = self.boards[board]
+        if bits is None:
+            return None
+        indices = self._indices.get(bits)
+        if indices is None:
+            indices = to_indices(bits)
+            self._indices.put(bits, indices)
+        return indices
+
+    def words(self) -> List[Optional[List[int]]]:
+        """Candidates for every board, in the format apply_guess uses."""
+        return [self.candidates(i) for i in range(NUM_BOARDS)]
+
+    def quads(self) -> Quads:
+        """Candidates for the unsolved boards, for find_best_play and friends."""
+        return [self.candidates(i) for i in range(NUM_BOARDS) if self.boards[i] is not None]
+
+    def counts(self) -> List[int]:
+        return [0 if board is None else board.bit_count() for board in self.boards]
+
+    def num_possibilities(self) -> int:
+        return math.prod(board.bit_count() for board in self.boards if board is not None)
+
+    def entropy(self, board: int) -> float:
+        """log2 of the number of candidates for a board."""
+        bits = self.boards[board]
+        return 0.0 if bits is None else math.log2(bits.bit_count())
+
+    def histogram(self, board: int, guess: int) -> np.ndarray:
+        """How many of a board's candidates would produce each result for guess."""
+        bits = self.boards[board]
+        if bits is None:
+            return np.zeros(NUM_RESULTS, dtype=np.int64)
+        key = (bits, guess)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = np.bincount(self.lookup.results[self.candidates(board), guess], minlength=NUM_RESULTS)
+            self._histograms.put(key, histogram)
+        return histogram
+
+    def board_information_gains(self, board: int) -> np.ndarray:
+        """Information gain of every guessable word on one board."""
+        bits = self.boards[board]
+        if bits is None:
+            return np.zeros(len(self.lookup.guessable))
+        gains = self._gains.get(bits)
+        if gains is None:
+            gains = self.lookup.information_gains([self.candidates(board)])
+            self._gains.put(bits, gains)
+        return gains
+
+    def information_gains(self) -> np.ndarray:
+        """Information gain of every guessable word, summed over the unsolved boards."""
+        total = np.zeros(len(self.lookup.guessable))
+        for board in range(NUM_BOARDS):
+            if self.boards[board] is not None:
+                total += self.board_information_gains(board)
+        return total
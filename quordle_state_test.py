@@ -0,0 +1,51 @@
+import numpy as np
+
+from bitset_index import build_index
+from quordle_state import QuordleState
+from quordlebot import ArrayWordle, apply_guess, encode_result
+
+
+def small_lookup() -> ArrayWordle:
+    words = [word.strip() for word in open('words/wordbank.txt')][:200]
+    return ArrayWordle.from_words(words, words)
+
+
+def test_play_and_undo():
+    lookup = small_lookup()
+    answers = [3, 30, 90, 150]
+    for state in (QuordleState(lookup), QuordleState(lookup, build_index(lookup))):
+        words = [lookup.all_wordbank_words()] * 4
+        for guess_word in ('ABOUT', 'BEGIN'):
+            guess = lookup.guessable_to_idx[guess_word]
+            state.play_against(guess, answers)
+            words = apply_guess(lookup, words, guess_word, [lookup.result(lookup.wordbank[a], guess_word) for a in answers])
+            assert state.words() == words
+
+        assert state.depth == 2
+        after_two = state.words()
+        gains = state.information_gains()
+        assert np.allclose(gains, lookup.information_gains(state.quads()))
+
+        # Playing an answer solves its board.
+        state.play_against(int(lookup.wordbank_to_guessable[answers[1]]), answers)
+        assert state.is_solved(1)
+        assert state.counts()[1] == 0
+        state.undo()
+        assert state.words() == after_two
+        assert np.array_equal(state.information_gains(), gains)
+
+        state.undo()
+        state.undo()
+        assert state.counts() == [200] * 4
+        assert state.num_possibilities() == 200 ** 4
+
+
+def test_histogram_and_entropy():
+    lookup = small_lookup()
+    state = QuordleState(lookup)
+    about = lookup.guessable_to_idx['ABOUT']
+    assert state.entropy(0) == np.log2(200)
+    histogram = state.histogram(0, about)
+    assert histogram.sum() == 200
+    state.play(about, [encode_result('.....')] * 4)
+    assert state.histogram(0, about).tolist() == [state.counts()[0]] + [0] * 242
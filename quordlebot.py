@@ -9,14 +9,18 @@ Finds the plays that maximize information gain.
 """
 
 import argparse
-from collections import Counter
-from dataclasses import dataclass
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
 import datetime
 import math
-import pickle
 import itertools
-from typing import List, Dict, Iterable, Set, Tuple
+import json
+import multiprocessing
+from typing import Any, Callable, List, Dict, Iterable, Iterator, Optional, Sequence, Tuple
 import sys
+import time
+
+import numpy as np
 
 import twister
 from progress import ProgressBar, FakeProgressBar
@@ -30,27 +34,60 @@ class Guess:
     """Five letters, /(g|y|\.){5}/"""
 
 
-def result_for_guess(word_str: str, guess_str: str) -> str:
-    result = [".", ".", ".", ".", "."]
-    word = [*word_str]
-    guess = [*guess_str]
-    # pass 1: greens
-    for i, (w, g) in enumerate(zip(word, guess)):
+WORD_LEN = 5
+
+
+def result_for_guess(word: str, guess: str) -> str:
+    if word == guess:
+        return "ggggg"
+    # Letters of the word that aren't green. Each one can make a single yellow, left to right.
+    unmatched = ""
+    for w, g in zip(word, guess):
+        if w != g:
+            unmatched += w
+    result = ""
+    for w, g in zip(word, guess):
         if w == g:
-            result[i] = "g"
-            guess[i] = None
-            word[i] = None
-    # pass 2: yellows
-    for i, g in enumerate(guess):
-        if g is None:
-            continue
-        try:
-            j = word.index(g)
-            result[i] = "y"
-            word[j] = None
-        except ValueError:
-            pass
-    return "".join(result)
+            result += "g"
+        elif g in unmatched:
+            unmatched = unmatched.replace(g, "", 1)
+            result += "y"
+        else:
+            result += "."
+    return result
+
+
+def letter_codes(words: List[str]) -> np.ndarray:
+    """(len(words), 5) uint8 array of letters."""
+    return np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8).reshape((len(words), WORD_LEN))
+
+
+def results_for_block(words: np.ndarray, guesses: np.ndarray) -> np.ndarray:
+    """Encoded results for each (word, guess) pair, given letter_codes arrays.
+
+    This matches result_for_guess exactly, including repeated letters. A non-green guess
+    letter is yellow if the number of non-green copies of it in the word ("avail")
+    exceeds the number of non-green copies of it earlier in the guess ("prior"), which
+    is what you get by handing out yellows left to right.
+    """
+    # green[k][w, g]: word w and guess g share letter k.
+    green = [words[:, k, None] == guesses[None, :, k] for k in range(WORD_LEN)]
+    out = np.zeros((len(words), len(guesses)), dtype=np.uint8)
+    for i in range(WORD_LEN):
+        letter = guesses[None, :, i]
+        avail = np.zeros(out.shape, dtype=np.uint8)
+        for k in range(WORD_LEN):
+            if k != i:
+                avail += (words[:, k, None] == letter) & ~green[k]
+        prior = np.zeros(out.shape, dtype=np.uint8)
+        for j in range(i):
+            prior += (guesses[None, :, j] == letter) & ~green[j]
+        yellow = ~green[i] & (prior < avail)
+        out *= 3
+        out += green[i]
+        out += green[i]
+        out += yellow
+    return out
 
 
 def is_valid_for_guess(word: str, guess: Guess) -> bool:
@@ -62,42 +99,65 @@ def is_valid_for_guesses(word: str, guesses: List[Guess]) -> bool:
 
 
 def get_valid_solutions(words: List[str], guesses: List[Guess]) -> List[str]:
-    return [word for word in words if is_valid_for_guesses(word, guesses)]
+    if not words:
+        return []
+    codes = letter_codes(words)
+    valid = np.ones(len(words), dtype=bool)
+    for guess in guesses:
+        valid &= results_for_block(codes, letter_codes([guess.word]))[:, 0] == encode_result(guess.result)
+    return [word for word, ok in zip(words, valid.tolist()) if ok]
 
 
 def filter_by_guess(words: List[str], guess: Guess) -> List[str]:
-    return [word for word in words if is_valid_for_guess(word, guess)]
+    return get_valid_solutions(words, [guess])
 
 
 def filter_by_guess_lookup(
-    lookup: Dict[str, Dict[str, str]], words: List[str], guess: Guess
+    lookup: "ArrayWordle", words: List[str], guess: Guess
 ) -> List[str]:
-    return [word for word in words if lookup[word][guess.word] == guess.result]
+    rows = lookup.wordbank_indices(words)
+    keep = lookup.results[rows, lookup.guessable_to_idx[guess.word]] == encode_result(guess.result)
+    return [word for word, k in zip(words, keep) if k]
 
 
-def build_lookup(wordbank: List[str], allowed: List[str]) -> Dict[str, Dict[str, str]]:
-    out = {}
-    combined = [*sorted([*wordbank, *allowed])]
-    for word in enumerate(wordbank):
-        out[word] = {}
-        for guess in combined:
-            out[word][guess] = result_for_guess(word, guess)
+def apply_guess(
+    lookup: "ArrayWordle", words: List[Optional[List[int]]], guess: str, results: List[str]
+) -> List[Optional[List[int]]]:
+    """Narrow down each board's candidates (wordbank indices) given the results of a guess.
+
+    Boards that have been solved are None.
+    """
+    guess_idx = lookup.guessable_to_idx[guess]
+    out: List[Optional[List[int]]] = []
+    for candidates, result in zip(words, results):
+        if candidates is None or result == "ggggg":
+            out.append(None)  # we got it!
+        elif candidates:
+            out.append(lookup.filter_by_result(candidates, guess_idx, encode_result(result)))
+        else:
+            out.append(candidates)
     return out
 
 
-def information_gain(
-    lookup: Dict[str, Dict[str, str]], words: List[str], guess: str
-) -> float:
-    base_entropy = math.log2(len(words))
-    nexts = Counter(lookup[word][guess] for word in words)
-    entropy = sum(n * math.log2(n) for n in nexts.values()) / sum(nexts.values())
-    return base_entropy - entropy
+def build_lookup(wordbank: List[str], allowed: List[str]) -> "ArrayWordle":
+    combined = [*sorted({*wordbank, *allowed})]
+    return ArrayWordle.from_words(wordbank, combined)
+
+
+def information_gain(lookup: "ArrayWordle", words: List[str], guess: str) -> float:
+    return lookup.information_gain_for_play(
+        lookup.wordbank_indices(words), lookup.guessable_to_idx[guess]
+    )
 
 
 def encode_result(result: str) -> int:
+    """Encode a result as a base-3 number (. = 0, y = 1, g = 2).
+
+    There are 3**5 = 243 possible results, so these fit in a uint8.
+    """
     out = 0
     for char in result:
-        out *= 4
+        out *= 3
         if char == "y":
             out += 1
         elif char == "g":
@@ -110,34 +170,37 @@ def encode_result(result: str) -> int:
 
 
 def decode_result(result: int) -> str:
+    if not 0 <= result < 3 ** 5:
+        raise ValueError(f"Invalid encoded result: {result}")
     out = [".", ".", ".", ".", "."]
-    i = 4
-    while result:
-        x = result % 4
-        if x == 1:
-            out[i] = "y"
-        elif x == 2:
-            out[i] = "g"
-        elif x == 0:
-            pass
-        else:
-            raise ValueError(f"Invalid encoded result: {result}")
-        i -= 1
-        result //= 4
+    for i in (4, 3, 2, 1, 0):
+        out[i] = ".yg"[result % 3]
+        result //= 3
     return "".join(out)
 
 
+NUM_RESULTS = 3 ** 5
+ALL_GREEN = encode_result("ggggg")
+SMALL_CANDIDATE_SET = 64
+"""Below this many candidates, information_gains sorts results rather than histogramming them."""
+
+
 @dataclass
 class ResultDict:
     wordbank: List[str]
     guessable: List[str]
-    results: List[List[int]]
+    results: np.ndarray
+    """uint8 matrix of encoded results, shape (len(wordbank), len(guessable))."""
 
 
 class ArrayWordle:
+    """Dense wordbank x guessable matrix of encoded results.
+
+    Words are referred to by their index in wordbank (solutions) or guessable (guesses).
+    """
     wordbank: List[str]
     guessable: List[str]
-    results: List[List[int]]
+    results: np.ndarray
 
     def __init__(self, result_dict: ResultDict):
         self.wordbank = result_dict.wordbank
@@ -145,39 +208,157 @@ class ArrayWordle:
         self.results = result_dict.results
         self.wordbank_to_idx = {word: i for i, word in enumerate(self.wordbank)}
         self.guessable_to_idx = {word: i for i, word in enumerate(self.guessable)}
+        # guessable index for each wordbank word, and vice versa (-1 if not in the wordbank).
+        self.wordbank_to_guessable = np.array(
+            [self.guessable_to_idx[word] for word in self.wordbank], dtype=np.int32
+        )
+        self.guessable_to_wordbank = np.full(len(self.guessable), -1, dtype=np.int32)
+        self.guessable_to_wordbank[self.wordbank_to_guessable] = np.arange(len(self.wordbank))
+        # n * log2(n) for every possible bucket size, to turn histograms into entropies.
+        sizes = np.arange(len(self.wordbank) + 1)
+        self.nlogn = sizes * np.log2(np.maximum(sizes, 1))
+        # Bitmask of the letters in each guessable word (bit 0 = A).
+        letters = np.frombuffer(''.join(self.guessable).encode('ascii'), dtype=np.uint8).reshape((-1, 5))
+        self.guessable_letters = np.bitwise_or.reduce(
+            np.left_shift(1, letters.astype(np.int32) - ord('A')), axis=1
+        ) if len(self.guessable) else np.zeros(0, dtype=np.int32)
+        self.wordbank_letters = self.guessable_letters[self.wordbank_to_guessable]
+
+    @staticmethod
+    def from_words(wordbank: List[str], guessable: List[str]) -> "ArrayWordle":
+        """Build a table for an ad-hoc set of words (e.g. in tests)."""
+        results = results_for_block(letter_codes(wordbank), letter_codes(guessable))
+        return ArrayWordle(ResultDict(wordbank=wordbank, guessable=guessable, results=results))
 
     def all_wordbank_words(self):
         return [*range(len(self.wordbank))]
 
-    def information_gain(self, guess: int) -> List[int]:
+    def wordbank_indices(self, words: Iterable[str]) -> np.ndarray:
+        return np.array([self.wordbank_to_idx[word] for word in words], dtype=np.intp)
+
+    def result(self, word: str, guess: str) -> str:
+        return decode_result(int(self.results[self.wordbank_to_idx[word], self.guessable_to_idx[guess]]))
+
+    def expected_entropy(self, histograms: np.ndarray) -> np.ndarray:
+        """Expected remaining entropy, sum(n log2 n) / N, for histogram(s) of results."""
+        return self.nlogn[histograms].sum(axis=-1) / histograms.sum(axis=-1)
+
+    def candidate_results(self, candidates: Sequence[int], guesses: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Results for each candidate (rows) and guess (columns; default: all guessable words)."""
+        rows = self.results[np.asarray(candidates, dtype=np.intp)]
+        if guesses is not None:
+            rows = rows[:, np.asarray(guesses, dtype=np.intp)]
+        return rows
+
+    def result_histograms(self, candidates: Sequence[int], guesses: Optional[Sequence[int]] = None, *, chunk_size=128) -> np.ndarray:
+        """Count how often each result occurs among candidates, for each guess.
+
+        Returns an array of shape (number of guesses, NUM_RESULTS). This is one bincount per
+        chunk of guesses rather than a loop over guesses. The bins are laid out result-major
+        within a chunk, which keeps the bincount's writes mostly sequential.
+        """
+        rows = self.candidate_results(candidates, guesses)
+        num_guesses = rows.shape[1]
+        out = np.empty((num_guesses, NUM_RESULTS), dtype=np.int64)
+        offsets = np.arange(chunk_size, dtype=np.int32)
+        for start in range(0, num_guesses, chunk_size):
+            block = rows[:, start:start + chunk_size].astype(np.int32)
+            n = block.shape[1]
+            block *= n
+            block += offsets[:n]
+            out[start:start + n] = np.bincount(block.ravel(), minlength=n * NUM_RESULTS).reshape((NUM_RESULTS, n)).T
+        return out
+
+    def information_gains(self, candidate_sets: Iterable[Sequence[int]], guesses: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Information gain of each guess (default: all guessable words), summed over several boards."""
+        total = np.zeros(len(self.guessable) if guesses is None else len(guesses))
+        # Boards with the same candidates (e.g. at the start of a game) have the same gains.
+        for candidates, count in Counter(tuple(c) for c in candidate_sets).items():
+            gains, _ = self.partition_stats(candidates, guesses)
+            total += count * gains
+        return total
+
+    def partition_stats(self, candidates: Sequence[int], guesses: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Information gain of each guess on one set of candidates, and how many groups it splits them into."""
+        if guesses is not None and not len(guesses):
+            return np.zeros(0), np.zeros(0, dtype=np.intp)
+        if len(candidates) < SMALL_CANDIDATE_SET:
+            # Most of the 243 bins would be empty; sorting each guess's results is cheaper.
+            rows = self.candidate_results(candidates, guesses).T.copy()
+            rows.sort(axis=1)
+            sizes, row_starts = self.run_lengths(rows)
+            entropy = np.add.reduceat(self.nlogn[sizes], row_starts) / len(candidates)
+            num_groups = np.diff(np.append(row_starts, len(sizes)))
+        else:
+            histograms = self.result_histograms(candidates, guesses)
+            entropy = self.expected_entropy(histograms)
+            num_groups = np.count_nonzero(histograms, axis=1)
+        return math.log2(len(candidates)) - entropy, num_groups
+
+    def information_gain(self, guess: int) -> float:
         base_entropy = math.log2(len(self.wordbank))
-        nexts = Counter(result[guess] for result in self.results)
-        entropy = sum(n * math.log2(n) for n in nexts.values()) / sum(nexts.values())
-        return base_entropy - entropy
-
-    def information_gain2(self, guess1: int, guess2: int) -> List[int]:
-        num = len(self.wordbank)
-        base_entropy = math.log2(num)
-        nexts = Counter(
-            result[guess1] * 65536 + result[guess2] for result in self.results
-        )
-        entropy = sum(n * math.log2(n) for n in nexts.values()) / num
-        return base_entropy - entropy
+        counts = np.bincount(self.results[:, guess], minlength=NUM_RESULTS)
+        return base_entropy - self.expected_entropy(counts)
+
+    def information_gain2(self, guess1: int, guess2: int) -> float:
+        base_entropy = math.log2(len(self.wordbank))
+        pairs = self.results[:, guess1].astype(np.int32) * NUM_RESULTS + self.results[:, guess2]
+        counts = np.bincount(pairs, minlength=NUM_RESULTS * NUM_RESULTS)
+        return base_entropy - self.expected_entropy(counts)
+
+    def run_lengths(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Lengths of the runs of equal values in each row of a row-sorted 2D array.
+
+        Returns all the run lengths (row by row) and the index of each row's first run.
+        """
+        num_rows, row_len = keys.shape
+        flat = keys.ravel()
+        starts = np.empty(flat.size + 1, dtype=bool)
+        starts[0] = starts[-1] = True
+        np.not_equal(flat[1:], flat[:-1], out=starts[1:-1])
+        starts[:-1:row_len] = True
+        bounds = np.flatnonzero(starts)
+        # Every row starts a new run, so the runs for row i begin at the i-th multiple of row_len.
+        row_starts = np.searchsorted(bounds, np.arange(num_rows) * row_len)
+        return np.diff(bounds), row_starts
+
+    def run_nlogn(self, keys: np.ndarray) -> np.ndarray:
+        """sum(n log2 n) over the runs of equal values in each row of a row-sorted 2D array.
+
+        This is what expected_entropy sums over a histogram, without building the histogram.
+        """
+        sizes, row_starts = self.run_lengths(keys)
+        return np.add.reduceat(self.nlogn[sizes], row_starts)
+
+    def pair_information_gains(self, guess1: int, guesses2: Sequence[int]) -> np.ndarray:
+        """information_gain2(guess1, guess2) for each of guesses2, computed as one block.
+
+        There are too many (result1, result2) bins to histogram, so instead each row of
+        joint results is sorted and the runs of equal values are the non-empty bins.
+        """
+        num_words = len(self.wordbank)
+        guesses2 = np.asarray(guesses2, dtype=np.intp)
+        if not len(guesses2):
+            return np.zeros(0)
+        keys = self.results[:, guesses2].T.astype(np.uint16, order='C')
+        keys += self.results[:, guess1].astype(np.uint16) * NUM_RESULTS
+        keys.sort(axis=1)
+        entropy = self.run_nlogn(keys)
+        return math.log2(num_words) - entropy / num_words
 
     def filter_by_guess(self, candidates: Iterable[int], guess: int, solution: int) -> List[int]:
         """Filter a set of candidate words based on a guess and the solution."""
-        result = self.results[solution][guess]
-        return [
-            i
-            for i in candidates
-            if self.results[i][guess] == result
-        ]
+        return self.filter_by_result(candidates, guess, self.results[solution, guess])
+
+    def filter_by_result(self, candidates: Iterable[int], guess: int, result: int) -> List[int]:
+        """Filter a set of candidate words based on a guess and its (encoded) result."""
+        candidates = np.asarray(candidates, dtype=np.intp)
+        return candidates[self.results[candidates, guess] == result].tolist()
 
-    def information_gain_for_play(self, candidates: List[int], guess: int) -> float:
+    def information_gain_for_play(self, candidates: Sequence[int], guess: int) -> float:
         base_entropy = math.log2(len(candidates))
-        nexts = Counter(self.results[word][guess] for word in candidates)
-        entropy = sum(n * math.log2(n) for n in nexts.values()) / sum(nexts.values())
-        return base_entropy - entropy
+        counts = np.bincount(self.results[candidates, guess], minlength=NUM_RESULTS)
+        return base_entropy - self.expected_entropy(counts)
 
     def to_guessable_idx(self, wordbank_idx):
         return self.guessable_to_idx[self.wordbank[wordbank_idx]]
@@ -195,63 +376,369 @@ def groupby(xs, fn):
 DEBUG = False
 max_depth = 0
 
+MAX_SEARCH_DEPTH = 12
+"""expected_plays_after_guess gives up (and returns 100) below this depth."""
+
+
+@dataclass
+class SearchProfile:
+    """What find_best_play spent its time on, by depth. Set PROFILE to collect one.
+
+    Depths are as in find_best_play, so they go up by two for each play. Guesses are
+    counted at the depth of the position they're played from.
+    """
+    nodes: Counter = field(default_factory=Counter)
+    """Positions searched (i.e. not found in the transposition table)."""
+    cache_hits: Counter = field(default_factory=Counter)
+    seconds: Counter = field(default_factory=Counter)
+    """Time spent searching positions at each depth, including everything below them."""
+    guesses: Counter = field(default_factory=Counter)
+    """Guesses evaluated by expected_plays_after_guess."""
+    outcomes: Counter = field(default_factory=Counter)
+    """Outcomes of those guesses that were searched."""
+    bailouts: Counter = field(default_factory=Counter)
+    """Guesses that were abandoned because they couldn't beat the cutoff."""
+    depth_limit_hits: int = 0
+    root_guesses: List[Tuple[str, float, float]] = field(default_factory=list)
+    """(guess, expected plays, seconds) for each play considered at the root."""
+
+    def to_json(self) -> Dict[str, Any]:
+        depths = sorted({*self.nodes, *self.cache_hits, *self.guesses})
+        return {
+            'depths': [
+                {
+                    'depth': d,
+                    'nodes': self.nodes[d],
+                    'cache_hits': self.cache_hits[d],
+                    'seconds': self.seconds[d],
+                    'guesses': self.guesses[d],
+                    'outcomes': self.outcomes[d],
+                    'bailouts': self.bailouts[d],
+                }
+                for d in depths
+            ],
+            'depth_limit_hits': self.depth_limit_hits,
+            'root_guesses': [
+                {'guess': guess, 'expected_plays': plays, 'seconds': seconds}
+                for guess, plays, seconds in self.root_guesses
+            ],
+        }
+
+    def print(self, top=10):
+        print(f'{"depth":>5} {"nodes":>9} {"hits":>9} {"seconds":>9} {"guesses":>9} {"outcomes":>10} {"bailouts":>9}')
+        for row in self.to_json()['depths']:
+            print(f'{row["depth"]:5} {row["nodes"]:9} {row["cache_hits"]:9} {row["seconds"]:9.2f} {row["guesses"]:9} {row["outcomes"]:10} {row["bailouts"]:9}')
+        print(f'Depth limit (> {MAX_SEARCH_DEPTH}) hit {self.depth_limit_hits} times')
+        if self.root_guesses:
+            total = sum(seconds for _, _, seconds in self.root_guesses)
+            print(f'{len(self.root_guesses)} root plays in {total:.2f}s; slowest:')
+            for guess, plays, seconds in sorted(self.root_guesses, key=lambda g: -g[2])[:top]:
+                print(f'  {guess} {seconds:8.2f}s -> {plays:.3f} plays')
+
+
+PROFILE: Optional[SearchProfile] = None
+"""If set, the search records what it does here. This costs next to nothing when it's None."""
+
+
+class SearchTimeout(Exception):
+    """Raised from inside the search when SearchLimits.deadline has passed."""
+
+
+@dataclass
+class SearchLimits:
+    """How far find_best_play searches. See find_best_play_anytime."""
+    depth: int = MAX_SEARCH_DEPTH
+    """Below this depth, a guess is scored by the lower bounds of its outcomes rather than
+    searched. At MAX_SEARCH_DEPTH, it's scored as 100 plays instead, as it always has been."""
+    deadline: Optional[float] = None
+    """time.monotonic() at which to give up by raising SearchTimeout."""
+    table: Optional["TranspositionTable"] = None
+    """Where to memoize results (default: TRANSPOSITIONS). Results depend on the depth limit."""
+    horizon_hits: int = 0
+    """Number of guesses that were scored at the depth limit rather than searched."""
+
+
+LIMITS = SearchLimits()
+
+ENDGAMES: Any = None
+"""If set (to a tablebase.Tablebase), results for small states are looked up there rather
+than searched. Like SOLVER_CACHE, it's only used for full-depth searches."""
+
+SOLVER_CACHE: Any = None
+"""If set (to a solver_cache.SolverCache), search results below the root are also looked
+up in and saved to it, so they're shared across runs and processes. Only full-depth
+searches use it."""
+
+Quads = List[List[int]]
+"""Candidate solutions for each unsolved board, as wordbank indices."""
+
+
+def quads_to_indices(lookup: ArrayWordle, quads: List[List[str]]) -> Quads:
+    return [[lookup.wordbank_to_idx[word] for word in quad] for quad in quads]
+
+
+def quads_to_words(lookup: ArrayWordle, quads: Quads) -> List[List[str]]:
+    return [[lookup.wordbank[i] for i in quad] for quad in quads]
+
+
+StateKey = Tuple[Tuple[Tuple[int, ...], ...], int, bool]
+
+
+def state_key(quads: Quads, depth: int, is_restricted: bool) -> StateKey:
+    """Canonical key for a search state.
+
+    The order of the boards doesn't matter (nor does the order in which the guesses that
+    got us here were played). Depth is included since the search is cut off at a fixed depth.
+    """
+    return tuple(sorted(tuple(sorted(q)) for q in quads)), depth, is_restricted
+
+
+class TranspositionTable:
+    """Bounded LRU cache of search results, keyed by state_key."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[Any, Any] = OrderedDict()
+        self.lookup: Optional[ArrayWordle] = None
+        self.hits = 0
+        self.misses = 0
+
+    def use(self, lookup: ArrayWordle):
+        """Results are only valid for one result table; reset if it changes."""
+        if lookup is not self.lookup:
+            self.lookup = lookup
+            self.clear()
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0.0
+        return f'{self.hits} hits / {self.misses} misses ({rate:.1f}%), {len(self)} / {self.maxsize} entries'
+
+
+TRANSPOSITIONS = TranspositionTable(maxsize=500_000)
+LIMITS.table = TRANSPOSITIONS
+
+
+def group_by_result(lookup: ArrayWordle, quad: List[int], guess: int) -> List[List[int]]:
+    """Split a set of candidates by the result that guess would produce for each."""
+    out: Dict[int, List[int]] = {}
+    for word, code in zip(quad, lookup.results[quad, guess].tolist()):
+        out.setdefault(code, []).append(word)
+    return [*out.values()]
+
 
 def expected_plays_after_guess(
-    lookup: Dict[str, Dict[str, str]],
+    lookup: ArrayWordle,
     quads: List[List[str]],
     guess: str,
+    **kwargs,
+) -> float:
+    """After guessing guess, how many additional plays do we expect to need?"""
+    return _expected_plays_after_guess(
+        lookup, quads_to_indices(lookup, quads), lookup.guessable_to_idx[guess], **kwargs
+    )
+
+
+def _expected_plays_after_guess(
+    lookup: ArrayWordle,
+    quads: Quads,
+    guess: int,
     *,
     depth=0,
     is_restricted=False,
     track_progress=False,
+    cutoff: Optional[float] = None,
 ) -> float:
     """After guessing guess, how many additional plays do we expect to need?
 
     Precondition: len(quads) > 0, none of the quads should be fully-determined.
+
+    If cutoff is set and the expected plays can be shown to be >= cutoff, this bails out
+    early and returns a lower bound (which is also >= cutoff) rather than the exact value.
     """
-    if depth > 12:
-        # This isn't exactly right but is quite effective!
-        # TODO: adjust the depth check based on the number of previous plays
-        return 100
+    if depth == 0:
+        TRANSPOSITIONS.use(lookup)
+        if SOLVER_CACHE is not None:
+            SOLVER_CACHE.use(lookup)
+    if depth > LIMITS.depth:
+        if PROFILE is not None:
+            PROFILE.depth_limit_hits += 1
+        if LIMITS.depth >= MAX_SEARCH_DEPTH:
+            # This isn't exactly right but is quite effective!
+            # TODO: adjust the depth check based on the number of previous plays
+            return 100
+        LIMITS.horizon_hits += 1
+        outcomes = merged_outcomes(lookup, quads, guess)
+        return sum(den * lower_bound(q) for den, q in outcomes) / sum(den for den, _ in outcomes)
 
     if DEBUG:
         sp = ' ' * depth
-        print(f'{sp}expected_plays_after_guess {guess}')
+        print(f'{sp}expected_plays_after_guess {lookup.guessable[guess]}')
 
-    # TODO: special case the situation where this was definitely a correct guess?
-    #       In this case we can eliminate the itertools.product.
+    answer = lookup.guessable_to_wordbank[guess]
     for quad in quads:
-        if len(quad) == 1 and quad[0] == guess:
+        if len(quad) == 1 and quad[0] == answer:
             other_quads = [q for q in quads if q != quad]
             if track_progress:
-                print(f'Preserving track_progress w/ {guess} at depth={depth}')
-            return expected_plays_after_guess(lookup, other_quads, guess, depth=depth, is_restricted=is_restricted, track_progress=track_progress)
-
-    # group the remaining quads by what this guess would produce
-    groups: List[List[List[str]]] = []
-    for quad in quads:
-        g: Dict[str, List[str]] = groupby(quad, lambda word: lookup[word][guess])
-        groups.append([*g.values()])
-
-    nums: List[float] = []
-    dens: List[int] = []
-    new_quads: List[List[str]]
-    for new_quads in itertools.product(*groups):
-        # This is one possible set of quads after playing guess.
-        if any(quad == [guess] for quad in new_quads):
-            # As a special case, if we guessed right, then remove this quad from the recursion.
-            new_quads = [q for q in new_quads if q != [guess]]
-
-        additional_plays, _ = find_best_play(lookup, new_quads, depth=1+depth, is_restricted=is_restricted, track_progress=False)
-        num = additional_plays
-        den = math.prod(len(q) for q in new_quads)
-        nums.append(num)
-        dens.append(den)
+                print(f'Preserving track_progress w/ {lookup.guessable[guess]} at depth={depth}')
+            return _expected_plays_after_guess(lookup, other_quads, guess, depth=depth, is_restricted=is_restricted, track_progress=track_progress, cutoff=cutoff)
+
+    outcomes = merged_outcomes(lookup, quads, guess)
+    profile = PROFILE
+    if profile is not None:
+        profile.guesses[depth - 1] += 1
+
+    # Visit the most likely outcomes first. They contribute the most to the expected value,
+    # so they give the best chance of proving that this guess can't beat the cutoff.
+    outcomes.sort(key=lambda outcome: -outcome[0])
+    total_weight = sum(den for den, _ in outcomes)
+    bound = sum(den * lower_bound(q) for den, q in outcomes)
+    for den, new_quads in outcomes:
+        additional_plays, _ = _find_best_play(lookup, new_quads, depth=1+depth, is_restricted=is_restricted, track_progress=False)
+        bound += den * (additional_plays - lower_bound(new_quads))
+        if profile is not None:
+            profile.outcomes[depth - 1] += 1
         if DEBUG:
-            print(f'{sp}+ {num} / {den} {new_quads}')
+            print(f'{sp}+ {additional_plays} / {den} {quads_to_words(lookup, new_quads)}')
+        if cutoff is not None and bound >= cutoff * total_weight:
+            if DEBUG:
+                print(f'{sp}-> bailing; {bound / total_weight} >= {cutoff}')
+            if profile is not None:
+                profile.bailouts[depth - 1] += 1
+            return bound / total_weight
 
     # weighted average
-    return sum(num * den for num, den in zip(nums, dens)) / sum(dens)
+    return bound / total_weight
+
+
+def merged_outcomes(lookup: ArrayWordle, quads: Quads, guess: int) -> List[Tuple[int, Quads]]:
+    """All the possible states after playing guess, with their relative weights.
+
+    Each board is split by result independently; an outcome is one group from each board.
+    Boards that this guess solves are dropped, and outcomes that leave the same set of
+    boards (in any order) are merged, so that each distinct sub-state is only searched once.
+    """
+    answer = lookup.guessable_to_wordbank[guess]
+    solved = (answer,)
+    groups = [[tuple(g) for g in group_by_result(lookup, quad, guess)] for quad in quads]
+
+    # Boards that this guess doesn't split are the same in every outcome.
+    fixed = [g[0] for g in groups if len(g) == 1 and g[0] != solved]
+    split = [g for g in groups if len(g) > 1]
+    fixed_weight = math.prod(len(q) for q in fixed)
+
+    weights: Dict[Tuple[Tuple[int, ...], ...], int] = {}
+    for combo in itertools.product(*split):
+        key = tuple(sorted([*fixed, *(q for q in combo if q != solved)]))
+        weights[key] = weights.get(key, 0) + fixed_weight * math.prod(len(q) for q in combo)
+    return [(weight, [list(q) for q in key]) for key, weight in weights.items()]
+
+
+STEP3_ENTROPY_GAP = 1.0
+"""Step 3 of find_best_play searches the guesses whose information gain is within this
+many bits of the best (after pruning). This is a heuristic, not a bound: a guess further
+behind could in principle do better. In the bench fixtures and the TOUGH,DYING,PLUME,DOUGH
+ROAST CLINE search, every step-3 guess that improved on the best play so far was within
+0.8 bits of the best gain (and ranked no lower than 39th), so this leaves some margin."""
+ROOT_ENTROPY_GAP = 2.0
+"""The gap at the root, which is wider since the top RANKED_MOVES are reported, not just the best."""
+STEP3_MAX_GUESSES = 100
+"""However flat the gains are, step 3 searches at most this many guesses (the number it
+used to search regardless of their gains)."""
+ROOT_MAX_GUESSES = 500
+"""The cap at the root. In the bench fixtures, 100 drops some of the top RANKED_MOVES."""
+
+BOARD_STATS = TranspositionTable(maxsize=4096)
+"""Results of board_stats, keyed by the board's candidates."""
+
+
+def board_stats(lookup: ArrayWordle, quad: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Information gain and number of result groups for each wordbank word as a guess on one board.
+
+    A guess that shares no letters with any of the candidates gets "....." for all of
+    them, so those are skipped (zero gain, one group). Boards are often unchanged from a
+    parent state to its children, so the stats are cached.
+    """
+    key = tuple(quad)
+    stats = BOARD_STATS.get(key)
+    if stats is None:
+        letters = np.bitwise_or.reduce(lookup.wordbank_letters[list(quad)])
+        guesses = np.flatnonzero(lookup.wordbank_letters & letters)
+        gains = np.zeros(len(lookup.wordbank))
+        num_groups = np.ones(len(lookup.wordbank), dtype=np.intp)
+        gains[guesses], num_groups[guesses] = lookup.partition_stats(quad, lookup.wordbank_to_guessable[guesses])
+        stats = gains, num_groups
+        BOARD_STATS.put(key, stats)
+    return stats
+
+
+def step3_guesses(
+    lookup: ArrayWordle, quads: Quads, possible_words: Iterable[int], cutoff: Optional[float],
+    gap=STEP3_ENTROPY_GAP, max_guesses=STEP3_MAX_GUESSES,
+) -> List[Tuple[float, int, float]]:
+    """(information gain, guess, lower bound on plays) for the guesses worth searching in step 3.
+
+    These are wordbank words that aren't possible answers, so a guess can't solve a board
+    and every board is still there afterwards. If it splits board b (n_b candidates) into
+    k_b groups, then by the union bound the (m-1)/m term of lower_bound is at least
+    1 - sum(k_b / n_b) on average, so it takes at least 1 + len(quads) + that many plays.
+    Guesses whose bound can't beat the cutoff (on additional plays after this one, as in
+    evaluate_guesses) are dropped, as are guesses with no information gain. Of the rest,
+    the ones within gap bits of the best information gain are returned, best first, up to
+    max_guesses of them.
+    """
+    BOARD_STATS.use(lookup)
+    total = np.zeros(len(lookup.wordbank))
+    coverage = np.zeros(len(lookup.wordbank))
+    for quad, count in Counter(tuple(q) for q in quads).items():
+        gains, num_groups = board_stats(lookup, quad)
+        total += count * gains
+        coverage += count * num_groups / len(quad)
+    bounds = 1 + len(quads) + np.maximum(0, 1 - coverage)
+
+    keep = total > 0
+    keep[list(possible_words)] = False  # already covered these in step 2.
+    if cutoff is not None:
+        keep &= bounds - 1 < cutoff
+    words = np.flatnonzero(keep)
+    guesses = lookup.wordbank_to_guessable[words].tolist()
+    by_gain = sorted(zip(total[words].tolist(), guesses, bounds[words].tolist()), reverse=True)
+    return [c for c in by_gain[:max_guesses] if c[0] >= by_gain[0][0] - gap]
+
+
+def lower_bound(quads: Quads) -> float:
+    """A cheap lower bound on the number of plays needed to solve these quads.
+
+    You need at least one play per quad, and you need an extra play unless your first
+    guess is right, which happens with probability at most 1/M for the smallest quad.
+    """
+    if not quads:
+        return 0
+    m = min(len(q) for q in quads)
+    return len(quads) + (m - 1) / m
 
 
 @dataclass
@@ -260,25 +747,270 @@ class PossibleMove:
     is_solution: bool
     expected_plays: float
     information_gain: float
+    is_exact: bool = True
+    """If False, expected_plays is only a lower bound (the move was pruned)."""
+    depth: Optional[int] = None
+    """If set, the search stopped at this depth (see find_best_play_anytime), so
+    expected_plays is an estimate."""
 
 
 ALL_MOVES: List[PossibleMove] = []
 
+SEARCH_THRESHOLD = 2000
+"""Search the game tree when there are fewer than this many possibilities, else rank by information gain."""
+
+RANKED_MOVES = 25
+"""Number of moves at the root whose expected plays are always computed exactly."""
+
+
+def root_cutoff() -> Optional[float]:
+    """Prune root moves that can't make it into the top RANKED_MOVES."""
+    ranked = sorted(move.expected_plays for move in ALL_MOVES if move.is_exact)
+    if len(ranked) < RANKED_MOVES:
+        return None
+    return ranked[RANKED_MOVES - 1] - 1
+
+
+def evaluate_guesses(
+    lookup: ArrayWordle,
+    quads: Quads,
+    guesses: List[int],
+    *,
+    depth: int,
+    is_restricted: bool,
+    cutoff_fn: Callable[[], Optional[float]],
+    pool: Optional["RootPool"] = None,
+) -> Iterator[Tuple[int, float, Optional[float]]]:
+    """Yield (guess, expected plays, cutoff used) for each guess, in order.
+
+    This is lazy, so cutoff_fn sees the results of the earlier guesses and the caller can
+    stop early. A pool is only supported at the root.
+    """
+    if pool is not None:
+        assert depth == 0
+        yield from pool.evaluate(quads, guesses, is_restricted=is_restricted)
+        return
+    for guess in guesses:
+        cutoff = cutoff_fn()
+        start = time.perf_counter()
+        plays = 1 + _expected_plays_after_guess(lookup, quads, guess, depth=1+depth, is_restricted=is_restricted, track_progress=False, cutoff=cutoff)
+        if PROFILE is not None and depth == 0:
+            PROFILE.root_guesses.append((lookup.guessable[guess], plays, time.perf_counter() - start))
+        yield guess, plays, cutoff
+
+
+# State for worker processes. These are set before the pool is forked, so the workers
+# share the (read-only, memory-mapped) result table with the parent rather than copying it.
+_pool_lookup: Optional[ArrayWordle] = None
+_pool_ranked: Any = None
+"""Shared array with the best RANKED_MOVES exact expected plays seen by any worker."""
+
+
+def _pool_cutoff() -> Optional[float]:
+    with _pool_ranked.get_lock():
+        worst = max(_pool_ranked)
+    return None if worst == math.inf else worst - 1
+
+
+def _pool_evaluate(args: Tuple[Quads, int, bool]) -> Tuple[int, float, Optional[float]]:
+    quads, guess, is_restricted = args
+    cutoff = _pool_cutoff()
+    plays = 1 + _expected_plays_after_guess(_pool_lookup, quads, guess, depth=1, is_restricted=is_restricted, track_progress=False, cutoff=cutoff)
+    if cutoff is None or plays - 1 < cutoff:
+        with _pool_ranked.get_lock():
+            worst = max(range(RANKED_MOVES), key=lambda i: _pool_ranked[i])
+            if plays < _pool_ranked[worst]:
+                _pool_ranked[worst] = plays
+    if SOLVER_CACHE is not None:
+        SOLVER_CACHE.flush()
+    return guess, plays, cutoff
+
+
+class RootPool:
+    """Worker processes that evaluate the candidate plays at the root of a search.
+
+    One pool serves both steps of a root search; it's forked the first time it's needed,
+    so searches that never get that far don't pay for it. Workers share the root_cutoff
+    bound, so moves that can't make the top RANKED_MOVES are still pruned. The bound can
+    include results for candidates that come later in the order, so some moves outside
+    the top RANKED_MOVES may be pruned that a serial search would have evaluated exactly,
+    but the ranked moves are the same.
+    """
+
+    def __init__(self, lookup: ArrayWordle, jobs: int):
+        self.lookup = lookup
+        self.jobs = jobs
+        self._pool: Any = None
+
+    def evaluate(
+        self, quads: Quads, guesses: Iterable[int], *, is_restricted: bool
+    ) -> Iterator[Tuple[int, float, Optional[float]]]:
+        """Parallel version of evaluate_guesses."""
+        global _pool_lookup, _pool_ranked
+        ranked = sorted(move.expected_plays for move in ALL_MOVES if move.is_exact)[:RANKED_MOVES]
+        ranked += [math.inf] * (RANKED_MOVES - len(ranked))
+        if self._pool is None:
+            ctx = multiprocessing.get_context('fork')
+            _pool_lookup = self.lookup
+            _pool_ranked = ctx.Array('d', ranked)
+            self._pool = ctx.Pool(self.jobs)
+        else:
+            with _pool_ranked.get_lock():
+                _pool_ranked[:] = ranked
+        yield from self._pool.imap(_pool_evaluate, [(quads, guess, is_restricted) for guess in guesses])
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
 
 def find_best_play(
-    lookup: Dict[str, Dict[str, str]], quads: List[List[str]], *, depth=0, is_restricted=False, track_progress=False
+    lookup: ArrayWordle, quads: List[List[str]], **kwargs
 ) -> Tuple[float, str]:
     """Find the single best play based on expected number of plays.
 
     Returns (expected plays, best next play)
     """
+    plays, guess = _find_best_play(lookup, quads_to_indices(lookup, quads), **kwargs)
+    return plays, lookup.guessable[guess] if guess is not None else ''
+
+
+def _find_best_play(
+    lookup: ArrayWordle, quads: Quads, *, depth=0, is_restricted=False, track_progress=False, jobs=1
+) -> Tuple[float, Optional[int]]:
+    """Find the single best play based on expected number of plays.
+
+    Returns (expected plays, guessable index of best next play)
+
+    Results below the root are memoized in TRANSPOSITIONS (or LIMITS.table), and in
+    SOLVER_CACHE if it's set. Small states are looked up in ENDGAMES if it's set. With
+    jobs > 1, the candidate plays at the root are evaluated in a RootPool.
+    """
+    table = LIMITS.table
+    cache = SOLVER_CACHE if LIMITS.depth >= MAX_SEARCH_DEPTH else None
+    endgames = ENDGAMES if LIMITS.depth >= MAX_SEARCH_DEPTH else None
+    if depth == 0:
+        table.use(lookup)
+        if cache is not None:
+            cache.use(lookup)
+        start = time.perf_counter()
+        pool = RootPool(lookup, jobs) if jobs > 1 else None
+        try:
+            result = _search_best_play(lookup, quads, depth=depth, is_restricted=is_restricted, track_progress=track_progress, pool=pool)
+        finally:
+            if pool is not None:
+                pool.close()
+            if cache is not None:
+                cache.flush()
+        if PROFILE is not None:
+            PROFILE.nodes[depth] += 1
+            PROFILE.seconds[depth] += time.perf_counter() - start
+        return result
+
+    key = state_key(quads, depth, is_restricted)
+    result = table.get(key)
+    if result is None and endgames is not None:
+        result = endgames.get(key)
+    if result is None and cache is not None:
+        result = cache.get(key)
+        if result is not None:
+            table.put(key, result)
+    if result is None:
+        if PROFILE is None and cache is None:
+            result = _search_best_play(lookup, quads, depth=depth, is_restricted=is_restricted, track_progress=track_progress)
+        else:
+            start = time.perf_counter()
+            result = _search_best_play(lookup, quads, depth=depth, is_restricted=is_restricted, track_progress=track_progress)
+            seconds = time.perf_counter() - start
+            if PROFILE is not None:
+                PROFILE.nodes[depth] += 1
+                PROFILE.seconds[depth] += seconds
+            if cache is not None:
+                cache.put(key, result, seconds)
+        table.put(key, result)
+    elif PROFILE is not None:
+        PROFILE.cache_hits[depth] += 1
+    return result
+
+
+@dataclass
+class AnytimeResult:
+    moves: List[PossibleMove]
+    """Root moves from the deepest search that finished, best first."""
+    depth: int
+    """Depth limit of that search."""
+    is_exact: bool
+    """Did that search finish without hitting its depth limit? If so, the moves are the
+    same as find_best_play's."""
+    partial_depth: Optional[int] = None
+    """Depth limit of the search that ran out of time, if any."""
+    partial_moves: List[PossibleMove] = field(default_factory=list)
+    """Root moves it had evaluated by then."""
+
+
+def find_best_play_anytime(
+    lookup: ArrayWordle, quads: Quads, *, time_budget: float, jobs=1, verbose=False
+) -> AnytimeResult:
+    """Iterative deepening version of find_best_play that stops after time_budget seconds.
+
+    This searches with depth limits of 2, 4, ... up to MAX_SEARCH_DEPTH. Below the limit,
+    a guess is scored by the lower bounds of the positions it leads to, so shallow searches
+    are optimistic. Each search refines the ranking of the root moves from the one before.
+    When time runs out, the ranking from the deepest search that finished is returned.
+    The first search always runs to completion, so there's always an answer.
+    """
+    global LIMITS
+    start = time.monotonic()
+    deadline = start + time_budget
+    result: Optional[AnytimeResult] = None
+    saved = LIMITS
+    try:
+        for limit in range(2, MAX_SEARCH_DEPTH + 1, 2):
+            # Results depend on the depth limit, so the shallow searches get their own table.
+            table = TRANSPOSITIONS if limit >= MAX_SEARCH_DEPTH else TranspositionTable(maxsize=TRANSPOSITIONS.maxsize)
+            table.use(lookup)
+            LIMITS = SearchLimits(depth=limit, deadline=deadline if result else None, table=table)
+            try:
+                _find_best_play(lookup, quads, jobs=jobs)
+            except SearchTimeout:
+                assert result
+                for move in ALL_MOVES:
+                    move.depth = None if limit >= MAX_SEARCH_DEPTH else limit
+                result.partial_depth = limit
+                result.partial_moves = sorted(ALL_MOVES, key=lambda move: move.expected_plays)
+                break
+            # Worker processes count horizon hits in their own copies of LIMITS.
+            is_exact = limit >= MAX_SEARCH_DEPTH or (jobs == 1 and LIMITS.horizon_hits == 0)
+            for move in ALL_MOVES:
+                move.depth = None if is_exact else limit
+            moves = sorted(ALL_MOVES, key=lambda move: move.expected_plays)
+            result = AnytimeResult(moves=moves, depth=limit, is_exact=is_exact)
+            if verbose:
+                best = moves[0]
+                print(f'Depth {limit}: {best.guess} {best.expected_plays:.3f} ({"exact" if is_exact else "approximate"}) after {time.monotonic() - start:.2f}s')
+            if is_exact:
+                break
+    finally:
+        LIMITS = saved
+    assert result
+    return result
+
+
+def _search_best_play(
+    lookup: ArrayWordle, quads: Quads, *, depth=0, is_restricted=False, track_progress=False, pool: Optional[RootPool] = None
+) -> Tuple[float, Optional[int]]:
     global ALL_MOVES
     if depth == 0:
         ALL_MOVES = []
 
     # 0. Base case -- no words left to guess means we win.
     if not quads:
-        return 0, ''
+        return 0, None
+
+    if LIMITS.deadline is not None and time.monotonic() > LIMITS.deadline:
+        raise SearchTimeout()
 
     global max_depth
     if depth > max_depth:
@@ -288,45 +1020,42 @@ def find_best_play(
 
     # 0.5. If all words are fully determined, we're done.
     if all(len(q) == 1 for q in quads):
-        guess = quads[0][0]
+        guess = int(lookup.wordbank_to_guessable[quads[0][0]])
         if DEBUG:
-            print(f'{sp}find_best_play({len(lookup)}, {quads}) -> {len(quads)}, {guess} (all determined)')
+            print(f'{sp}find_best_play({len(lookup.wordbank)}, {quads_to_words(lookup, quads)}) -> {len(quads)}, {lookup.guessable[guess]} (all determined)')
         if depth == 0:
-            ALL_MOVES.append(PossibleMove(guess=guess, is_solution=True, expected_plays=len(quads), information_gain=0.0))
-        return len(quads), quads[0][0]
+            ALL_MOVES.append(PossibleMove(guess=lookup.guessable[guess], is_solution=True, expected_plays=len(quads), information_gain=0.0))
+        return len(quads), guess
 
     # 1. Always play a fully-determined word.
     for i, quad in enumerate(quads):
         if len(quad) == 1:
-            guess = quad[0]
+            guess = int(lookup.wordbank_to_guessable[quad[0]])
             other_quads = [q for j, q in enumerate(quads) if i != j]
             # Continue tracking progress if there was a forced play at depth=0
             if track_progress:
-                print(f'Preserving track_progress after forced play of {guess} @ depth={depth}')
-            remaining_plays = expected_plays_after_guess(lookup, other_quads, guess, depth=1 + depth, is_restricted=is_restricted, track_progress=track_progress)
+                print(f'Preserving track_progress after forced play of {lookup.guessable[guess]} @ depth={depth}')
+            remaining_plays = _expected_plays_after_guess(lookup, other_quads, guess, depth=1 + depth, is_restricted=is_restricted, track_progress=track_progress)
             if depth == 0:
-                ALL_MOVES.append(PossibleMove(guess=guess, is_solution=True, expected_plays=1 + remaining_plays, information_gain=0.0))
+                ALL_MOVES.append(PossibleMove(guess=lookup.guessable[guess], is_solution=True, expected_plays=1 + remaining_plays, information_gain=0.0))
             return 1 + remaining_plays, guess
 
     # 1.5. With exactly two words left, the expected number of plays is 1.5.
     if len(quads) == 1 and len(quads[0]) == 2:
-        guess = quads[0][0]
+        guess = int(lookup.wordbank_to_guessable[quads[0][0]])
         if DEBUG:
-            print(f'{sp}find_best_play({len(lookup)}, {quads}) -> 1.5, {guess} (two case)')
+            print(f'{sp}find_best_play({len(lookup.wordbank)}, {quads_to_words(lookup, quads)}) -> 1.5, {lookup.guessable[guess]} (two case)')
         if depth == 0:
-            ALL_MOVES.append(PossibleMove(guess=guess, is_solution=True, expected_plays=1.5, information_gain=0.0))
+            ALL_MOVES.append(PossibleMove(guess=lookup.guessable[guess], is_solution=True, expected_plays=1.5, information_gain=0.0))
         return 1.5, guess
 
     if DEBUG:
-        print(f'{sp}find_best_play({len(lookup)}, {quads})')
+        print(f'{sp}find_best_play({len(lookup.wordbank)}, {quads_to_words(lookup, quads)})')
 
     # 2. Try playing each of the possible words.
     #    If the best expected plays < 1 + len(quads), then we're done.
     possible_words = {word for quad in sorted(quads, key=lambda q: len(q)) for word in quad}
-    m = min(len(q) for q in quads)
-    best_possible = len(quads) + (m - 1) / m
-    # XXX constructing this explicitly may not be necessary
-    # restricted_lookup = filter_lookup(lookup, possible_words)
+    best_possible = lower_bound(quads)
     restricted_plays, restricted_guess = 1000, None
     n = len(possible_words)
     # TODO: sort possible_words by something like information gain and truncate
@@ -335,13 +1064,18 @@ def find_best_play(
 
     with meter(width=50) as progress:
         num = len(possible_words)
-        for i, guess in enumerate(possible_words):
-            plays = 1 + expected_plays_after_guess(lookup, quads, guess, depth=1+depth, is_restricted=True, track_progress=False)
+        evaluations = evaluate_guesses(
+            lookup, quads, [int(lookup.wordbank_to_guessable[word]) for word in possible_words],
+            depth=depth, is_restricted=True, pool=pool,
+            cutoff_fn=root_cutoff if depth == 0 else lambda: restricted_plays - 1,
+        )
+        for i, (guess, plays, cutoff) in enumerate(evaluations):
             if DEBUG:
-                print(f'{sp}- {i} / {n}: {guess} -> {plays} plays to win')
+                print(f'{sp}- {i} / {n}: {lookup.guessable[guess]} -> {plays} plays to win')
             if depth == 0:
-                gain = sum(information_gain(lookup, words, guess) for words in quads)
-                ALL_MOVES.append(PossibleMove(guess=guess, is_solution=True, expected_plays=plays, information_gain=gain))
+                gain = sum(lookup.information_gain_for_play(words, guess) for words in quads)
+                is_exact = cutoff is None or plays - 1 < cutoff
+                ALL_MOVES.append(PossibleMove(guess=lookup.guessable[guess], is_solution=True, expected_plays=plays, information_gain=gain, is_exact=is_exact))
             if plays < restricted_plays:
                 restricted_plays = plays
                 restricted_guess = guess
@@ -349,67 +1083,94 @@ def find_best_play(
                     # print(f'{sp}-> bailing after {1 + i} / {len(possible_words)} on restricted search')
                     break
             if depth == 0:
-                progress.print(i + 1, num, f'{guess} -> {plays:.2f} plays to win; best is {restricted_guess}/{restricted_plays:.2f}')
+                progress.print(i + 1, num, f'{lookup.guessable[guess]} -> {plays:.2f} plays to win; best is {lookup.guessable[restricted_guess]}/{restricted_plays:.2f}')
 
     if restricted_plays <= 1 + len(quads):
         if DEBUG or depth == 0:
-            print(f'{sp}-> Restricted search yields {restricted_plays}, {restricted_guess}')
+            print(f'{sp}-> Restricted search yields {restricted_plays}, {lookup.guessable[restricted_guess]}')
         return restricted_plays, restricted_guess
     if DEBUG:
-        print(f'{sp}- Restricted check failed; best was {restricted_plays:.2f}, {restricted_guess} for {quads}')
+        print(f'{sp}- Restricted check failed; best was {restricted_plays:.2f}, {lookup.guessable[restricted_guess]} for {quads_to_words(lookup, quads)}')
 
-    # 3. Try all possible plays ordered by IG; only consider the top 100.
+    # 3. Try other plays, ordered by IG. Only consider those that could still beat the
+    #    best play so far and are within STEP3_ENTROPY_GAP bits of the best IG, up to
+    #    STEP3_MAX_GUESSES of them (wider at the root; see step3_guesses).
+    #    As before, only wordbank words are considered here.
     best_plays, best_word = restricted_plays, restricted_guess
     if not is_restricted:
-        by_gain: List[Tuple[float, str]] = []
-        for guess in lookup.keys():
-            if guess in possible_words:
-                continue  # already covered this in step 2.
-            gain = sum(information_gain(lookup, words, guess) for words in quads)
-            if gain > 0:
-                by_gain.append((gain, guess))
-        by_gain.sort(reverse=True)
+        cutoff_fn = root_cutoff if depth == 0 else lambda: best_plays - 1
+        if depth == 0:
+            gap, max_guesses = ROOT_ENTROPY_GAP, ROOT_MAX_GUESSES
+        else:
+            gap, max_guesses = STEP3_ENTROPY_GAP, STEP3_MAX_GUESSES
+        candidates = step3_guesses(lookup, quads, possible_words, cutoff_fn(), gap, max_guesses)
+        n = len(candidates)
 
-        n = min(len(by_gain), 100)
+        def unpruned() -> Iterator[int]:
+            # The cutoff only gets tighter as we go, so some guesses can be skipped later.
+            for gain, guess, bound in candidates:
+                cutoff = cutoff_fn()
+                if cutoff is None or bound - 1 < cutoff:
+                    yield guess
 
         with meter(width=50) as progress:
-            for i, (gain, guess) in enumerate(by_gain[:100]):
-                plays = 1 + expected_plays_after_guess(lookup, quads, guess, depth=1+depth, is_restricted=is_restricted, track_progress=False)
+            evaluations = evaluate_guesses(
+                lookup, quads, unpruned(),
+                depth=depth, is_restricted=is_restricted, pool=pool, cutoff_fn=cutoff_fn,
+            )
+            gains = {guess: gain for gain, guess, _ in candidates}
+            for i, (guess, plays, cutoff) in enumerate(evaluations):
                 if DEBUG:
-                    print(f'{sp}- {i} / {n}: {guess} -> {plays} plays to win')
+                    print(f'{sp}- {i} / {n}: {lookup.guessable[guess]} -> {plays} plays to win')
                 if plays < best_plays:
                     best_plays = plays
                     best_word = guess
                 if depth == 0:
-                    ALL_MOVES.append(PossibleMove(guess=guess, is_solution=False, expected_plays=plays, information_gain=gain))
-                    progress.print(i + 1, n, f'{guess} -> {plays:.2f} plays to win; best is {best_word}/{best_plays:.2f}')
+                    is_exact = cutoff is None or plays - 1 < cutoff
+                    ALL_MOVES.append(PossibleMove(guess=lookup.guessable[guess], is_solution=False, expected_plays=plays, information_gain=gains[guess], is_exact=is_exact))
+                    progress.print(i + 1, n, f'{lookup.guessable[guess]} -> {plays:.2f} plays to win; best is {lookup.guessable[best_word]}/{best_plays:.2f}')
 
     if DEBUG:
-        print(f'{sp}-> {best_plays}, {best_word}')
+        print(f'{sp}-> {best_plays}, {lookup.guessable[best_word]}')
     return best_plays, best_word
 
 
-def filter_lookup(lookup: Dict[str, Dict[str, str]], dictionary: Set[str]) -> Dict[str, Dict[str, str]]:
-    """Shrink a lookup table to a fixed dictionary of guesses."""
-    return {
-        solution: {
-            guess: lookup[solution][guess]
-            for guess in dictionary
-        }
-        for solution in dictionary
-    }
-
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('-q', '--no-spoilers', action='store_true', help='Avoid printing possible answers')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='Number of processes to use when searching the game tree (default: 1, or the number of CPUs for "serve")')
+    parser.add_argument('--port', type=int, default=8000, help='Port for "serve" mode')
+    parser.add_argument('--profile', nargs='?', const='table', choices=['table', 'json'],
+                        help='Report where the game tree search spent its time (with -j 1)')
+    parser.add_argument('--time-budget', type=float, metavar='SECONDS',
+                        help='Search iteratively deeper and stop with the best answer so far after this long')
+    parser.add_argument('--cache', default='cache/solver.sqlite', metavar='PATH',
+                        help='Persistent cache of search results, shared across runs (see solver_cache.py)')
+    parser.add_argument('--no-cache', action='store_true', help="Don't use the persistent cache")
+    parser.add_argument('--tablebase', default='words/endgames.bin', metavar='PATH',
+                        help='Precomputed endgame results, if the file exists (see tablebase.py)')
+    parser.add_argument('--no-tablebase', action='store_true', help="Don't use the endgame tablebase")
     parser.add_argument('guesses', metavar='guesses', type=str, nargs='+',
-                    help='Guesses for today\'s Quordle. First may be A,B,C,D to set solution or YYYY/MM/DD to set date.')
+                    help='Guesses for today\'s Quordle. First may be A,B,C,D to set solution or YYYY/MM/DD to set date. '
+                         'Or "serve" to run a solver server.')
     args = parser.parse_args()
-    # lookup = json.load(open('words/map.json'))
-    lookup = pickle.load(open("words/map.pickle", "rb"))
-    wordbank = [*lookup.keys()]
-    allowed = [*lookup[wordbank[0]].keys()]
+    import lookup_table
+    lookup = lookup_table.load()
+    if not args.no_cache:
+        import solver_cache
+        SOLVER_CACHE = solver_cache.SolverCache(args.cache)
+    if not args.no_tablebase:
+        import tablebase
+        ENDGAMES = tablebase.load(lookup, args.tablebase)
+
+    if args.guesses == ['serve']:
+        import server
+        server.serve(lookup, port=args.port, jobs=args.jobs or multiprocessing.cpu_count(), cache=SOLVER_CACHE, endgames=ENDGAMES)
+        sys.exit(0)
+    args.jobs = args.jobs or 1
+    wordbank = lookup.wordbank
+    allowed = lookup.guessable
 
     guesses = args.guesses
     if ',' in guesses[0]:
@@ -424,25 +1185,18 @@ if __name__ == "__main__":
     else:
         correct = twister.words_for_date(datetime.date.today())
 
-    words = [wordbank, wordbank, wordbank, wordbank]
+    from quordle_state import QuordleState
+    state = QuordleState(lookup)
+    history: List[List[str]] = []
     pposs = len(wordbank) ** 4
     for guess in guesses:
         results = [
-            lookup[w][guess] if words[i] is not None else "-----"
+            lookup.result(w, guess) if not state.is_solved(i) else "-----"
             for i, w in enumerate(correct)
         ]
-        for i in (0, 1, 2, 3):
-            if words[i] is None:
-                continue  # already got this one
-            result = results[i]
-            if result == "ggggg":
-                # we got it!
-                words[i] = None
-            elif words[i]:
-                words[i] = filter_by_guess_lookup(
-                    lookup, words[i], Guess(guess, results[i])
-                )
-        counts = [len(w) if w else 1 for w in words]
+        history.append(results)
+        state.play_against(lookup.guessable_to_idx[guess], lookup.wordbank_indices(correct))
+        counts = [count or 1 for count in state.counts()]
         poss = math.prod(counts)
         gain = math.log2(pposs) - math.log2(poss)
         print(f'{guess} {"  ".join(results)} -> {counts} = {poss} +{gain:.2f} bits')
@@ -451,33 +1205,64 @@ if __name__ == "__main__":
     if args.no_spoilers:
         sys.exit(0)
 
+    words = state.words()
+
     # Report fully- or nearly-determined words.
     for i, quad in enumerate(words):
         if not quad:
             continue
         if len(quad) == 1:
-            print(f"Quad {i} must be {quad[0]}")
+            print(f"Quad {i} must be {wordbank[quad[0]]}")
         elif len(quad) <= 10:
-            print(f"Quad {i} is one of {quad}")
+            print(f"Quad {i} is one of {[wordbank[w] for w in quad]}")
 
-    quads = [w for w in words if w is not None]
-    if poss < 2000:
+    quads = state.quads()
+    if poss < SEARCH_THRESHOLD:
         # with few possibilities, game out remaining guesses
-        print('All possibilities: ', quads)
-        plays, guess = find_best_play(lookup, quads, track_progress=True)
+        print('All possibilities: ', quads_to_words(lookup, quads))
+        if args.profile:
+            PROFILE = SearchProfile()
+        if args.time_budget is not None:
+            anytime = find_best_play_anytime(lookup, quads, time_budget=args.time_budget, jobs=args.jobs, verbose=True)
+            if anytime.partial_depth is not None:
+                print(f'Out of time at depth {anytime.partial_depth} after evaluating {len(anytime.partial_moves)} plays')
+            print(f'Searched to depth {anytime.depth} ({"exact" if anytime.is_exact else "approximate"})')
+            moves = anytime.moves
+        else:
+            plays, guess = _find_best_play(lookup, quads, track_progress=True, jobs=args.jobs)
+            moves = sorted(ALL_MOVES, key=lambda move: move.expected_plays)
+            if args.jobs == 1:
+                # (each worker process has its own table)
+                print(f'Transposition table: {TRANSPOSITIONS.stats()}')
+            if SOLVER_CACHE is not None:
+                summary = SOLVER_CACHE.summary()
+                print(f'Solver cache: {summary["hits"]} hits / {summary["misses"]} misses ({summary["skipped"]} too small to look up), {summary["writes"]} new entries')
+            if ENDGAMES is not None and args.jobs == 1:
+                print(f'Endgame tablebase: {ENDGAMES.stats()}')
+        if args.profile == 'json':
+            print(json.dumps(PROFILE.to_json(), indent=2))
+        elif args.profile:
+            PROFILE.print()
         print('Best play by expected number of steps to complete:')
-        ALL_MOVES.sort(key=lambda move: move.expected_plays)
-        for i, m in enumerate(ALL_MOVES[:25]):
+        for i, m in enumerate(moves[:RANKED_MOVES]):
             plays = m.expected_plays + len(guesses)
             soln = 'is solution, ' if m.is_solution else ''
-            print(f' {1+i:2}. {plays:.3f} {m.guess} ({soln}+{m.expected_plays:.3f} plays, +{m.information_gain:.2f} bits)')
+            approx = f', to depth {m.depth}' if m.depth is not None else ''
+            print(f' {1+i:2}. {plays:.3f} {m.guess} ({soln}+{m.expected_plays:.3f} plays, +{m.information_gain:.2f} bits{approx})')
     else:
         # with lots of possibilities, try to maximize information gain
         # ignore words that we've already gotten correct
-        gains = []
-        for guess in allowed:
-            gain = sum(information_gain(lookup, words, guess) for words in quads)
-            gains.append((gain, guess))
+        import opening_book
+        book = opening_book.load_books(lookup).get(tuple(guesses))
+        book_gains = book and book.information_gains([
+            [encode_result(results[i]) for results in history]
+            for i in range(len(correct)) if words[i] is not None
+        ])
+        if book_gains is None:
+            book_gains = state.information_gains()
+        else:
+            print(f'(from the opening book for {", ".join(guesses)})')
+        gains = [*zip(book_gains.tolist(), allowed)]
 
         print("Best next plays based on expected information gain:")
         gains.sort(reverse=True)
@@ -1,6 +1,9 @@
-from typing import Dict, List
+import math
+from typing import List
 from priors import flatten
-from quordlebot import Guess, expected_plays_after_guess, expected_plays_for_guess, find_best_play, find_best_plays, result_for_guess, is_valid_for_guess, is_valid_for_guesses, get_valid_solutions, encode_result, decode_result
+from quordlebot import Guess, expected_plays_after_guess, find_best_play, result_for_guess, is_valid_for_guess, is_valid_for_guesses, get_valid_solutions, encode_result, decode_result, ArrayWordle, state_key, TranspositionTable, TRANSPOSITIONS, merged_outcomes, quads_to_indices
+from quordlebot import apply_guess
+import quordlebot
 
 
 def test_result_for_guess_simple():
@@ -43,37 +46,39 @@ def test_encode_decode():
     assert decode_result(encode_result('gy...')) == 'gy...'
     assert decode_result(encode_result('yy.g.')) == 'yy.g.'
     assert decode_result(encode_result('...gy')) == '...gy'
+    assert encode_result('ggggg') == 242
 
 
-def build_lookup(words: List[str]) -> Dict[str, Dict[str, str]]:
-    out = {}
-    for word in words:
-        out[word] = {}
-        for guess in words:
-            out[word][guess] = result_for_guess(word, guess)
-    return out
+def test_array_wordle():
+    lookup = ArrayWordle.from_words(['APPLE', 'ROPES'], ['APPLE', 'POPES', 'ROPES'])
+    assert lookup.results.shape == (2, 3)
+    assert lookup.result('APPLE', 'POPES') == 'y.gy.'
+    assert lookup.result('ROPES', 'POPES') == '.gggg'
+    assert lookup.filter_by_guess([0, 1], 1, 0) == [0]
+    assert lookup.information_gain_for_play([0, 1], 1) == 1.0
+
+
+def build_lookup(words: List[str]) -> ArrayWordle:
+    return ArrayWordle.from_words(words, words)
 
 
 def test_expected_plays_for_guess():
     lookup = build_lookup(['DOING', 'GOING', 'AAHED'])
-    assert find_best_plays(lookup, []) == [(0, '')]
     assert find_best_play(lookup, []) == (0, '')
 
     # Guaranteed to win with this play, so 0.0 expected plays after to win.
-    assert find_best_plays(lookup, [['DOING']]) == [(1.0, 'DOING')]
     assert find_best_play(lookup, [['DOING']]) == (1.0, 'DOING')
 
     # Play DOING:
     # 50% chance you win this play (0)
     # 50% chance you win next play (1)
     # -> 0.5
-    assert expected_plays_for_guess(lookup, [['DOING', 'GOING']], 'DOING', False) == 0.5
     assert expected_plays_after_guess(lookup, [['DOING', 'GOING']], 'DOING') == 0.5
 
-    assert find_best_plays(lookup, [['DOING', 'GOING']]) == [
-        (1.5, 'DOING'),
-        (1.5, 'GOING'),
-        (2.0, 'AAHED'),  # the "D" at the end differentiates
+    assert [1 + expected_plays_after_guess(lookup, [['DOING', 'GOING']], guess) for guess in ['DOING', 'GOING', 'AAHED']] == [
+        1.5,
+        1.5,
+        2.0,  # the "D" at the end differentiates
     ]
     assert find_best_play(lookup, [['DOING', 'GOING']]) == (1.5, 'DOING')
 
@@ -86,7 +91,7 @@ def test_find_best_plays2():
     quads = [['FRANK'], ['FORGE', 'GORGE']]
     lookup = build_lookup(flatten(quads))
 
-    assert find_best_plays(lookup, quads) == [(2, 'FRANK')]
+    assert find_best_play(lookup, quads) == (2, 'FRANK')
 
 
 def test_find_best_plays10():
@@ -97,8 +102,7 @@ def test_find_best_plays10():
         ['FORGE', 'GORGE', 'HORDE']
     ]
     lookup = build_lookup(flatten(quads) + ['GAPED'])
-    assert find_best_play(lookup, quads) == (5.2, 'GAPED')
-    assert False
+    assert find_best_play(lookup, quads) == (5.08, 'GAPED')
 
 
 def test_dumpy():
@@ -113,8 +117,199 @@ def test_dumpy():
 
     assert find_best_play(lookup, [['BERET', 'EGRET', 'ETHER', 'EXERT']]) == (1.75, 'BERET')
 
-    assert find_best_play(lookup, quads) == (4.8, 'CATTY')
+    assert find_best_play(lookup, quads) == (4.6, 'CATTY')
 
     # The forced plays are not informative.
     # With any, you have a 20% chance of guessing correctly: 20% / 4
     # If you're wrong, the answer is fully determined:       80% / 5
+
+
+def test_transposition_table():
+    assert state_key([[3, 1], [2]], 2, False) == state_key([[2], [1, 3]], 2, False)
+    assert state_key([[3, 1], [2]], 2, False) != state_key([[3, 1], [2]], 3, False)
+
+    table = TranspositionTable(maxsize=2)
+    table.put('a', (1.0, 0))
+    table.put('b', (2.0, 1))
+    assert table.get('a') == (1.0, 0)
+    table.put('c', (3.0, 2))  # evicts 'b', the least recently used
+    assert table.get('b') is None
+    assert (table.hits, table.misses, len(table)) == (1, 1, 2)
+
+
+def test_cutoff():
+    quads = [
+        ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK'],
+        ['BRAND', 'DRANK', 'FRANK', 'GRAND', 'PRANK'],
+    ]
+    lookup = build_lookup(flatten(quads) + ['GAPED'])
+    exact = expected_plays_after_guess(lookup, quads, 'GAPED')
+    assert expected_plays_after_guess(lookup, quads, 'GAPED', cutoff=exact + 1) == exact
+    # With a cutoff we can't beat, we get back a lower bound that's at least the cutoff.
+    pruned = expected_plays_after_guess(lookup, quads, 'GAPED', cutoff=2.0)
+    assert 2.0 <= pruned <= exact
+
+
+def test_merged_outcomes():
+    words = ['DOING', 'GOING', 'AAHED']
+    lookup = build_lookup(words)
+    quads = quads_to_indices(lookup, [['DOING', 'GOING'], ['DOING', 'GOING']])
+    # AAHED splits both boards, and (DOING, GOING) is the same state as (GOING, DOING).
+    outcomes = sorted(merged_outcomes(lookup, quads, lookup.guessable_to_idx['AAHED']))
+    assert outcomes == [(1, [[0], [0]]), (1, [[1], [1]]), (2, [[0], [1]])]
+    # Guessing DOING solves a board in half the outcomes.
+    outcomes = sorted(merged_outcomes(lookup, quads, lookup.guessable_to_idx['DOING']))
+    assert outcomes == [(1, []), (1, [[1], [1]]), (2, [[1]])]
+
+
+def test_parallel_matches_serial():
+    # More than RANKED_MOVES candidates at the root, so that the workers' shared bound
+    # fills up and prunes some of them.
+    quads = [
+        ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK', 'CLANK'],
+        ['BRAND', 'DRANK', 'FRANK', 'GRAND', 'PRANK', 'CRANK'],
+        ['PALSY', 'SALSA', 'DAISY', 'PANSY'],
+    ]
+    others = [
+        'ABBOT', 'ALLOT', 'BEACH', 'BOXER', 'BRAID', 'BURNT', 'CHUMP', 'CINCH', 'CLICK', 'CLOSE',
+        'DOWDY', 'DOWNY', 'DREAM', 'DRYER', 'FORAY', 'GECKO', 'GRAZE', 'GROPE', 'HONEY', 'HUTCH',
+        'INLET', 'KAYAK', 'KNACK', 'LUMPY', 'MOOSE', 'MUSKY', 'NOBLE', 'ORBIT', 'PAGAN', 'PASTA',
+        'PRESS', 'PROUD', 'RIGID', 'SAUCY', 'SCOUR', 'SHORT', 'SLUMP', 'SNOUT', 'STRAY', 'SUPER',
+        'SURER', 'TAKER', 'THEFT', 'TORSO', 'TRICK', 'UNCLE', 'VICAR', 'WIDEN', 'WOMAN', 'YEAST',
+    ]
+    lookup = build_lookup(flatten(quads) + others)
+
+    def ranking():
+        ranked = sorted((move.expected_plays, move.guess) for move in quordlebot.ALL_MOVES if move.is_exact)
+        return ranked[:quordlebot.RANKED_MOVES]
+
+    TRANSPOSITIONS.clear()
+    serial = find_best_play(lookup, quads)
+    serial_ranking = ranking()
+    assert len(quordlebot.ALL_MOVES) > quordlebot.RANKED_MOVES
+    TRANSPOSITIONS.clear()
+    assert find_best_play(lookup, quads, jobs=2) == serial
+    assert ranking() == serial_ranking
+    # Moves are only pruned once the shared bound holds RANKED_MOVES results.
+    assert any(not move.is_exact for move in quordlebot.ALL_MOVES)
+
+
+def test_root_pool_is_shared(monkeypatch):
+    quads = [
+        ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK'],
+        ['PALSY', 'SALSA'],
+        ['BRAND', 'DRANK', 'FRANK', 'GRAND', 'PRANK'],
+    ]
+    lookup = build_lookup(flatten(quads) + ['GAPED'])
+    pools = []
+    evaluate = quordlebot.RootPool.evaluate
+
+    def record(self, *args, **kwargs):
+        for result in evaluate(self, *args, **kwargs):
+            pools.append(self._pool)
+            yield result
+
+    monkeypatch.setattr(quordlebot.RootPool, 'evaluate', record)
+    TRANSPOSITIONS.clear()
+    find_best_play(lookup, quads, jobs=2)
+    # Steps 2 and 3 both ran, in the same worker processes.
+    assert len(pools) == len(quordlebot.ALL_MOVES) and all(pool is pools[0] for pool in pools)
+    assert any(move.is_solution for move in quordlebot.ALL_MOVES)
+    assert any(not move.is_solution for move in quordlebot.ALL_MOVES)
+
+
+def test_information_gains():
+    words = ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK', 'PALSY', 'SALSA', 'GAPED']
+    lookup = build_lookup(words)
+    quads = [[0, 1, 2, 3, 4], [5, 6], [0, 1, 2, 3, 4]]
+    gains = lookup.information_gains(quads)
+    for guess in range(len(words)):
+        expected = sum(lookup.information_gain_for_play(quad, guess) for quad in quads)
+        assert abs(gains[guess] - expected) < 1e-9
+    assert abs(lookup.information_gains(quads, [7])[0] - gains[7]) < 1e-9
+
+
+def test_apply_guess():
+    lookup = build_lookup(['TREAD', 'STEAD', 'TRADE', 'DEALT'])
+    words = [[0, 1, 2, 3], [0, 1, 2, 3], None]
+    assert apply_guess(lookup, words, 'DEALT', ['yyy.y', 'ggggg', '-----']) == [[0, 1], None, None]
+
+
+def test_step3_guesses():
+    words = ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK', 'PALSY', 'SALSA', 'GAPED', 'CHIME']
+    lookup = build_lookup(words)
+    quads = [[0, 1, 2, 3, 4], [0, 1, 2, 3, 4]]
+    candidates = quordlebot.step3_guesses(lookup, quads, {0, 1, 2, 3, 4}, None, gap=math.inf)
+    guesses = [guess for _, guess, _ in candidates]
+    assert sorted(guesses) == [5, 7]  # SALSA and CHIME (no letters in common) split nothing
+    for gain, guess, bound in candidates:
+        assert abs(gain - 2 * lookup.information_gain_for_play(quads[0], guess)) < 1e-9
+        plays = 1 + quordlebot._expected_plays_after_guess(lookup, quads, guess, depth=1, is_restricted=False, track_progress=False)
+        assert bound <= plays + 1e-9
+
+    # A tight enough cutoff prunes everything.
+    assert quordlebot.step3_guesses(lookup, quads, {0, 1, 2, 3, 4}, 0.5) == []
+
+    # Only the guesses within gap bits of the best gain are kept: GAPED splits the words
+    # into more groups than SALSA does.
+    gains = {guess: gain for gain, guess, _ in candidates}
+    assert gains[7] - gains[5] > 1
+    assert [guess for _, guess, _ in quordlebot.step3_guesses(lookup, quads, {0, 1, 2, 3, 4}, None)] == [7]
+
+    # However wide the gap, at most max_guesses are kept, best first.
+    assert quordlebot.step3_guesses(lookup, quads, {0, 1, 2, 3, 4}, None, gap=math.inf, max_guesses=1) == candidates[:1]
+
+
+def test_result_for_guess_matches_table():
+    words = ['APPLE', 'POPES', 'ROPES', 'PLUMP', 'EERIE', 'LEVEE', 'EMCEE', 'ERROR', 'SASSY', 'ABBEY']
+    lookup = build_lookup(words)
+    for word in words:
+        for guess in words:
+            assert lookup.result(word, guess) == result_for_guess(word, guess)
+
+
+def test_search_profile():
+    quads = [
+        ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK'],
+        ['BRAND', 'DRANK', 'FRANK', 'GRAND', 'PRANK'],
+    ]
+    lookup = build_lookup(flatten(quads) + ['GAPED'])
+    TRANSPOSITIONS.clear()
+    quordlebot.PROFILE = profile = quordlebot.SearchProfile()
+    try:
+        expected = find_best_play(lookup, quads)
+    finally:
+        quordlebot.PROFILE = None
+    assert profile.nodes[0] == 1
+    assert sum(profile.nodes.values()) - 1 == TRANSPOSITIONS.misses
+    assert sum(profile.cache_hits.values()) == TRANSPOSITIONS.hits
+    assert len(profile.root_guesses) == profile.guesses[0]
+    assert min(plays for _, plays, _ in profile.root_guesses) == expected[0]
+    assert profile.to_json()['depths'][0]['nodes'] == 1
+
+    # Without a profile, the search gives the same answer.
+    TRANSPOSITIONS.clear()
+    assert find_best_play(lookup, quads) == expected
+
+
+def test_find_best_play_anytime():
+    quads = [
+        ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK'],
+        ['BRAND', 'DRANK', 'FRANK', 'GRAND', 'PRANK'],
+    ]
+    lookup = build_lookup(flatten(quads) + ['GAPED'])
+    indices = quads_to_indices(lookup, quads)
+    expected = find_best_play(lookup, quads)
+
+    result = quordlebot.find_best_play_anytime(lookup, indices, time_budget=60)
+    assert result.is_exact and result.partial_depth is None
+    assert (result.moves[0].expected_plays, result.moves[0].guess) == expected
+    assert all(move.depth is None for move in result.moves)
+
+    # Out of time: the shallowest search still finishes, but it's only an estimate.
+    result = quordlebot.find_best_play_anytime(lookup, indices, time_budget=0)
+    assert result.depth == 2 and not result.is_exact
+    assert result.partial_depth == 4
+    assert all(move.depth == 2 for move in result.moves)
+    assert result.moves[0].expected_plays <= expected[0]
+    assert quordlebot.LIMITS.deadline is None
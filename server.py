@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""Long-lived solver with a local HTTP/JSON API.
+
+    ./quordlebot.py serve --port 8000 --jobs 4
+    curl -d '{"answers": "CHAFF,LOWLY,SWORE,PAPER", "guesses": ["TRAIN", "CLOSE"]}' localhost:8000/solve
+
+The result table is loaded once. Requests are handled by a pool of worker processes, so
+a long search doesn't block other requests, and each worker keeps its transposition table
+warm from one request to the next.
+
+A game state is a JSON object with "guesses" and either:
+
+- "answers" (a list or comma-separated string) or "date" (YYYY/MM/DD), with guesses as plain words; or
+- guesses as {"word": "ROAST", "results": [".y...", "...y.", "y.y..", "....."]}, one result per board.
+
+With "time_budget" (seconds), the search deepens iteratively and returns the best ranking
+it has when time runs out (see find_best_play_anytime); "search" in the response says how
+deep it got and whether the result is exact.
+
+The response has the candidate counts for each board and either the ranked moves (the
+same PossibleMove list the CLI prints) or, with lots of possibilities, the best guesses
+by information gain. It also includes timing, transposition table and (if they're being
+used) persistent solver cache and endgame tablebase stats.
+"""
+
+import argparse
+from dataclasses import asdict
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import multiprocessing
+import time
+from typing import Any, Dict, List, Optional
+
+import twister
+import quordlebot
+from quordlebot import ArrayWordle, apply_guess, quads_to_words
+
+
+def answers_for_state(state: Dict[str, Any]) -> Optional[List[str]]:
+    answers = state.get('answers')
+    if isinstance(answers, str):
+        answers = answers.split(',')
+    if answers is None and 'date' in state:
+        if not isinstance(state['date'], str):
+            raise TypeError(f'Expected "date" to be a YYYY/MM/DD string, got {state["date"]!r}')
+        year, month, day = [int(x) for x in state['date'].split('/')]
+        answers = twister.words_for_date(datetime.date(year, month, day))
+    if answers is not None and len(answers) != 4:
+        raise ValueError(f'Expected four answers, got {answers}')
+    return answers
+
+
+def solve(lookup: ArrayWordle, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Find the best next plays for a game state (see module docstring)."""
+    start = time.perf_counter()
+    answers = answers_for_state(state)
+    everything = lookup.all_wordbank_words()
+    words: List[Optional[List[int]]] = [everything, everything, everything, everything]
+    for guess in state.get('guesses', []):
+        if isinstance(guess, str):
+            if answers is None:
+                raise ValueError('Guesses without results need "answers" or "date"')
+            word = guess
+            results = [
+                lookup.result(answer, word) if words[i] is not None else "-----"
+                for i, answer in enumerate(answers)
+            ]
+        else:
+            word, results = guess['word'], guess['results']
+            if len(results) != 4:
+                raise ValueError(f'Expected four results for {word}, got {results}')
+        words = apply_guess(lookup, words, word, results)
+
+    quads = [w for w in words if w is not None]
+    response: Dict[str, Any] = {
+        'counts': [len(w) if w is not None else 0 for w in words],
+        'candidates': quads_to_words(lookup, quads) if state.get('spoilers', True) else None,
+    }
+    filtered = time.perf_counter()
+
+    if not quads:
+        response['moves'] = []
+    elif math.prod(len(q) for q in quads) < quordlebot.SEARCH_THRESHOLD:
+        if state.get('time_budget') is not None:
+            anytime = quordlebot.find_best_play_anytime(lookup, quads, time_budget=float(state['time_budget']))
+            moves = anytime.moves
+            response['search'] = {
+                'depth': anytime.depth,
+                'is_exact': anytime.is_exact,
+                'partial_depth': anytime.partial_depth,
+                'partial_moves': len(anytime.partial_moves),
+            }
+        else:
+            quordlebot._find_best_play(lookup, quads)
+            moves = sorted(quordlebot.ALL_MOVES, key=lambda move: move.expected_plays)
+        response['moves'] = [asdict(move) for move in moves[:quordlebot.RANKED_MOVES]]
+    else:
+        gains = sorted(zip(lookup.information_gains(quads).tolist(), lookup.guessable), reverse=True)
+        response['gains'] = [{'guess': guess, 'information_gain': gain} for gain, guess in gains[:10]]
+
+    done = time.perf_counter()
+    table = quordlebot.TRANSPOSITIONS
+    response['transpositions'] = {'hits': table.hits, 'misses': table.misses, 'size': len(table)}
+    if quordlebot.SOLVER_CACHE is not None:
+        response['solver_cache'] = quordlebot.SOLVER_CACHE.summary()
+    if quordlebot.ENDGAMES is not None:
+        response['endgames'] = quordlebot.ENDGAMES.summary()
+    response['timing'] = {'filter_secs': filtered - start, 'search_secs': done - filtered}
+    return response
+
+
+# The worker processes are forked after the table is loaded, so they share it.
+_lookup: Optional[ArrayWordle] = None
+
+
+def _pool_solve(state: Dict[str, Any]) -> Dict[str, Any]:
+    return solve(_lookup, state)
+
+
+class SolverHandler(BaseHTTPRequestHandler):
+    def send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'ok': True})
+        else:
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/solve':
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+            return
+        start = time.perf_counter()
+        try:
+            state = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if not isinstance(state, dict):
+                raise TypeError(f'Expected a JSON object, got {type(state).__name__}')
+            # This only blocks this request's thread; the work happens in the pool.
+            response = self.server.pool.apply(_pool_solve, (state,))
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': f'{type(e).__name__}: {e}'})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        response['timing']['total_secs'] = time.perf_counter() - start
+        self.send_json(200, response)
+
+
+def serve(lookup: ArrayWordle, *, host='127.0.0.1', port=8000, jobs=1, cache=None, endgames=None):
+    """cache is a solver_cache.SolverCache and endgames a tablebase.Tablebase for the
+    workers to share, if any."""
+    global _lookup
+    _lookup = lookup
+    quordlebot.SOLVER_CACHE = cache
+    quordlebot.ENDGAMES = endgames
+    jobs = max(jobs, 1)
+    with multiprocessing.get_context('fork').Pool(jobs) as pool:
+        httpd = ThreadingHTTPServer((host, port), SolverHandler)
+        httpd.pool = pool
+        print(f'Serving on http://{host}:{port} with {jobs} worker(s)')
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+
+
+if __name__ == '__main__':
+    import lookup_table
+    import solver_cache
+    import tablebase
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--cache', default=solver_cache.CACHE_PATH, help='Persistent cache of search results.')
+    parser.add_argument('--no-cache', action='store_true', help="Don't use the persistent cache.")
+    parser.add_argument('--tablebase', default=tablebase.TABLEBASE_PATH, help='Precomputed endgame results.')
+    parser.add_argument('--no-tablebase', action='store_true', help="Don't use the endgame tablebase.")
+    args = parser.parse_args()
+    lookup = lookup_table.load()
+    cache = None if args.no_cache else solver_cache.SolverCache(args.cache)
+    endgames = None if args.no_tablebase else tablebase.load(lookup, args.tablebase)
+    serve(lookup, port=args.port, jobs=args.jobs, cache=cache, endgames=endgames)
@@ -0,0 +1,70 @@
+import contextlib
+from http.server import ThreadingHTTPServer
+import json
+import multiprocessing
+import threading
+import urllib.error
+import urllib.request
+
+from priors import flatten
+from quordlebot import ArrayWordle
+import server
+
+
+QUADS = [
+    ['BLAND', 'BLANK', 'FLANK', 'GLAND'],
+    ['BRAND', 'DRANK', 'FRANK', 'GRAND'],
+    ['PALSY', 'SALSA'],
+    ['FORGE', 'GORGE'],
+]
+
+
+def post(port: int, body: bytes):
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/solve', data=body)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+@contextlib.contextmanager
+def running_server():
+    words = flatten(QUADS)
+    server._lookup = ArrayWordle.from_words(words, words)
+    with multiprocessing.get_context('fork').Pool(1) as pool:
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0), server.SolverHandler)
+        httpd.pool = pool
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield httpd.server_address[1]
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+def test_solver_handler():
+    with running_server() as port:
+        status, body = post(port, json.dumps({'answers': 'BLAND,FRANK,SALSA,GORGE', 'guesses': ['FLANK']}).encode())
+        assert status == 200 and len(body['counts']) == 4 and body['moves']
+
+        status, body = post(port, b'[1, 2]')
+        assert status == 400 and 'JSON object' in body['error']
+        status, body = post(port, b'{"answers": "BLAND"}')
+        assert status == 400
+        status, body = post(port, b'{"date": 5}')
+        assert status == 400 and 'YYYY/MM/DD' in body['error']
+        status, body = post(port, b'{"date": "2022/13/01"}')
+        assert status == 400
+
+
+def test_server_error(monkeypatch):
+    def broken_solve(lookup, state):
+        raise RuntimeError('broken')
+
+    # The worker is forked after this, so it sees it too.
+    monkeypatch.setattr(server, 'solve', broken_solve)
+    with running_server() as port:
+        status, body = post(port, b'{}')
+        assert status == 500 and body['error'] == 'RuntimeError: broken'
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+"""Play a strategy over many Quordle games and report how many guesses it takes.
+
+Usage:
+
+    ./simulate.py --openers ROAST,CLINE --then greedy --games 100000 --jobs 8
+    ./simulate.py --openers ROAST,CLINE --then search --dates 2022/01/24-2022/12/31
+
+Games are either the real daily answers (see answer_calendar) for a range of dates
+or random sets of four distinct, non-blacklisted wordbank words. A strategy looks at
+the remaining candidates for each board and picks the next guess; see Strategy.
+"""
+
+from abc import ABC, abstractmethod
+import argparse
+from collections import Counter
+import contextlib
+from dataclasses import dataclass
+import datetime
+import io
+import math
+import multiprocessing
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from quordlebot import ALL_GREEN, ArrayWordle, SEARCH_THRESHOLD, Quads, _find_best_play, state_key
+from progress import FakeProgressBar, ProgressBar
+import answer_calendar
+
+NUM_BOARDS = 4
+MAX_GUESSES = 9
+"""Quordle gives you nine guesses."""
+GIVE_UP = 30
+"""Stop a game that's gone on this long; something is wrong with the strategy."""
+FIRST_DATE = datetime.date(2022, 1, 24)
+GAMES_PER_CHUNK = 1000
+"""random_games draws this many games' worth of random keys at a time."""
+
+Boards = List[Optional[List[int]]]
+"""Remaining candidates (wordbank indices) for each board, or None once it's solved."""
+
+
+class Strategy(ABC):
+    """Picks the next guess (a guessable index) given the state of the game."""
+
+    name = 'strategy'
+
+    @abstractmethod
+    def play(self, lookup: ArrayWordle, boards: Boards, num_guesses: int) -> int:
+        ...
+
+
+class Greedy(Strategy):
+    """Play a fully-determined word if there is one, otherwise maximize information gain.
+
+    Ties go to a word that could be an answer. Moves for positions that come up again
+    (e.g. the start of every game) are cached.
+    """
+
+    name = 'greedy'
+
+    def __init__(self, wordbank_only=False, max_cache=100_000):
+        self.wordbank_only = wordbank_only
+        self.max_cache = max_cache
+        self.cache: Dict[tuple, int] = {}
+
+    def play(self, lookup: ArrayWordle, boards: Boards, num_guesses: int) -> int:
+        quads = [b for b in boards if b is not None]
+        for quad in quads:
+            if len(quad) == 1:
+                return int(lookup.wordbank_to_guessable[quad[0]])
+        key = state_key(quads, 0, self.wordbank_only)
+        guess = self.cache.get(key)
+        if guess is None:
+            guess = self.best_guess(lookup, quads)
+            if len(self.cache) < self.max_cache:
+                self.cache[key] = guess
+        return guess
+
+    def best_guess(self, lookup: ArrayWordle, quads: Quads) -> int:
+        guesses = lookup.wordbank_to_guessable if self.wordbank_only else None
+        gains = lookup.information_gains(quads, guesses)
+        if guesses is None:
+            guesses = np.arange(len(lookup.guessable))
+        # Gains are floats; anything within rounding error of the best is a tie.
+        is_answer = np.zeros(len(lookup.guessable), dtype=bool)
+        is_answer[lookup.wordbank_to_guessable[[w for q in quads for w in q]]] = True
+        best = gains >= gains.max() - 1e-9
+        tied = np.flatnonzero(best & is_answer[guesses])
+        return int(guesses[tied[0] if len(tied) else np.flatnonzero(best)[0]])
+
+
+class Search(Greedy):
+    """Minimize the expected number of guesses (find_best_play) once the game tree is
+    small enough to search, and play greedily until then."""
+
+    name = 'search'
+
+    def best_guess(self, lookup: ArrayWordle, quads: Quads) -> int:
+        if math.prod(len(q) for q in quads) >= SEARCH_THRESHOLD:
+            return super().best_guess(lookup, quads)
+        # The search reports its progress on stdout, which would drown out ours.
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, guess = _find_best_play(lookup, quads)
+        return guess
+
+
+class FixedOpeners(Strategy):
+    """Play a fixed sequence of opening words, then hand off to another strategy.
+
+    An opener is skipped if it would be pointless, i.e. every board is already solved
+    or fully determined.
+    """
+
+    def __init__(self, openers: Sequence[int], then: Strategy, names: Sequence[str] = ()):
+        self.openers = [*openers]
+        self.then = then
+        self.name = f'{",".join(names)} then {then.name}' if names else f'openers then {then.name}'
+
+    def play(self, lookup: ArrayWordle, boards: Boards, num_guesses: int) -> int:
+        if num_guesses < len(self.openers) and any(b is not None and len(b) > 1 for b in boards):
+            return self.openers[num_guesses]
+        return self.then.play(lookup, boards, num_guesses)
+
+
+def play_game(lookup: ArrayWordle, strategy: Strategy, answers: Sequence[int]) -> int:
+    """Number of guesses it takes strategy to solve all four boards."""
+    everything = lookup.all_wordbank_words()
+    boards: Boards = [everything for _ in answers]
+    num_guesses = 0
+    while any(b is not None for b in boards) and num_guesses < GIVE_UP:
+        guess = strategy.play(lookup, boards, num_guesses)
+        num_guesses += 1
+        for i, (answer, board) in enumerate(zip(answers, boards)):
+            if board is None:
+                continue
+            result = lookup.results[answer, guess]
+            boards[i] = None if result == ALL_GREEN else lookup.filter_by_result(board, guess, result)
+    return num_guesses
+
+
+def random_games(lookup: ArrayWordle, num_games: int, *, seed=0, blacklist: Sequence[str] = ()) -> np.ndarray:
+    """(num_games, 4) array of random answers, like Quordle's: distinct and not blacklisted.
+
+    Each game takes the words with the four smallest of a row of random keys. The rows
+    are drawn GAMES_PER_CHUNK at a time, which gives the same games as drawing them all
+    at once without needing num_games * len(wordbank) floats in memory.
+    """
+    allowed = np.array([i for i, w in enumerate(lookup.wordbank) if w not in set(blacklist)])
+    rng = np.random.default_rng(seed)
+    games = np.empty((num_games, NUM_BOARDS), dtype=allowed.dtype)
+    for start in range(0, num_games, GAMES_PER_CHUNK):
+        keys = rng.random((min(GAMES_PER_CHUNK, num_games - start), len(allowed)))
+        games[start:start + len(keys)] = allowed[np.argpartition(keys, NUM_BOARDS, axis=1)[:, :NUM_BOARDS]]
+    return games
+
+
+def daily_games(lookup: ArrayWordle, start: datetime.date, end: datetime.date) -> np.ndarray:
+    """The answers for every date from start to end (inclusive)."""
+    days = (end - start).days + 1
+    calendar = answer_calendar.load(until=end)
+    return np.array([
+        [lookup.wordbank_to_idx[w] for w in words] for words in calendar.words_between(start, end)
+    ]).reshape((days, NUM_BOARDS))
+
+
+def read_blacklist(path='words/blacklist.txt') -> List[str]:
+    return [word.strip() for word in open(path) if word.strip()]
+
+
+_pool_lookup: Optional[ArrayWordle] = None
+_pool_strategy: Optional[Strategy] = None
+
+
+def _pool_play(games: np.ndarray) -> List[int]:
+    return [play_game(_pool_lookup, _pool_strategy, answers) for answers in games.tolist()]
+
+
+def simulate(
+    lookup: ArrayWordle, strategy: Strategy, games: np.ndarray, *, jobs=1, batch_size=100, track_progress=False
+) -> np.ndarray:
+    """Number of guesses for each game (rows of answers), in order."""
+    global _pool_lookup, _pool_strategy
+    _pool_lookup, _pool_strategy = lookup, strategy
+    batches = [games[i:i + batch_size] for i in range(0, len(games), batch_size)]
+    ctx = multiprocessing.get_context('fork')
+    pool = ctx.Pool(jobs) if jobs > 1 and len(batches) > 1 else None
+    out: List[int] = []
+    start = time.time()
+    try:
+        results = pool.imap(_pool_play, batches) if pool else map(_pool_play, batches)
+        with (ProgressBar() if track_progress else FakeProgressBar()) as progress:
+            for counts in results:
+                out += counts
+                rate = len(out) / (time.time() - start)
+                progress.print(len(out), len(games), f'{len(out)} games ({rate:.1f}/s)')
+    finally:
+        if pool:
+            pool.terminate()
+    return np.array(out, dtype=np.int32)
+
+
+def wilson_interval(successes: int, n: int, z=1.96) -> Tuple[float, float]:
+    """95% confidence interval for a rate (Wilson score interval)."""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+@dataclass
+class Report:
+    name: str
+    num_guesses: np.ndarray
+
+    @property
+    def n(self) -> int:
+        return len(self.num_guesses)
+
+    @property
+    def mean(self) -> float:
+        return float(self.num_guesses.mean())
+
+    @property
+    def mean_interval(self) -> float:
+        """Half-width of the 95% confidence interval for the mean."""
+        return 1.96 * float(self.num_guesses.std(ddof=1)) / math.sqrt(self.n) if self.n > 1 else math.inf
+
+    def rate(self, max_guesses: int) -> Tuple[float, Tuple[float, float]]:
+        """Fraction of games solved in at most max_guesses, with a 95% confidence interval."""
+        k = int((self.num_guesses <= max_guesses).sum())
+        return k / self.n, wilson_interval(k, self.n)
+
+    def histogram(self) -> Dict[int, int]:
+        return dict(sorted(Counter(self.num_guesses.tolist()).items()))
+
+    def print(self):
+        print(f'{self.name}: {self.n} games')
+        print(f'  mean: {self.mean:.3f} ± {self.mean_interval:.3f} guesses')
+        for k, label in ((5, 'five'), (6, 'six'), (MAX_GUESSES, 'win')):
+            rate, (lo, hi) = self.rate(k)
+            print(f'  {label} rate (<= {k}): {100 * rate:.2f}% (95% CI {100 * lo:.2f}–{100 * hi:.2f}%)')
+        for guesses, count in self.histogram().items():
+            print(f'  {guesses:2d}: {count:7d} {100 * count / self.n:6.2f}%')
+
+
+def parse_date(s: str) -> datetime.date:
+    year, month, day = [int(x) for x in s.split('/')]
+    return datetime.date(year, month, day)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate a strategy over many Quordle games.')
+    parser.add_argument('--openers', default='', help='Comma-separated fixed opening guesses, e.g. ROAST,CLINE.')
+    parser.add_argument('--then', choices=['greedy', 'search'], default='greedy', help='Strategy after the openers.')
+    parser.add_argument('--wordbank-only', action='store_true', help='Only consider wordbank words as greedy guesses.')
+    parser.add_argument('--games', type=int, default=1000, help='Number of random games to play.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for --games.')
+    parser.add_argument('--dates', help='Play the daily games from START-END (YYYY/MM/DD-YYYY/MM/DD) instead.')
+    parser.add_argument('--all-dates', action='store_true', help='Play every daily game so far.')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='Number of processes to use.')
+    args = parser.parse_args()
+
+    import lookup_table
+    lookup = lookup_table.load()
+
+    then = (Search if args.then == 'search' else Greedy)(wordbank_only=args.wordbank_only)
+    openers = [w for w in args.openers.split(',') if w]
+    strategy = FixedOpeners([lookup.guessable_to_idx[w] for w in openers], then, openers) if openers else then
+
+    if args.all_dates:
+        games = daily_games(lookup, FIRST_DATE, datetime.date.today())
+    elif args.dates:
+        start, end = args.dates.split('-')
+        games = daily_games(lookup, parse_date(start), parse_date(end))
+    else:
+        games = random_games(lookup, args.games, seed=args.seed, blacklist=read_blacklist())
+
+    start = time.time()
+    num_guesses = simulate(lookup, strategy, games, jobs=args.jobs, track_progress=True)
+    print(f'Played {len(games)} games in {time.time() - start:.1f}s')
+    Report(strategy.name, num_guesses).print()
@@ -0,0 +1,62 @@
+import pytest
+
+from quordlebot import ArrayWordle
+import simulate as simulate_module
+from simulate import FixedOpeners, Greedy, Report, Search, Strategy, play_game, random_games, simulate, wilson_interval
+
+
+def small_lookup() -> ArrayWordle:
+    words = [word.strip() for word in open('words/wordbank.txt')][:100]
+    return ArrayWordle.from_words(words, words)
+
+
+def test_play_game():
+    lookup = small_lookup()
+    answers = [0, 10, 20, 30]
+    strategy = Greedy()
+    num_guesses = play_game(lookup, strategy, answers)
+    assert 4 <= num_guesses <= 9
+
+    # Playing the answers in order solves the game in four.
+    openers = [int(lookup.wordbank_to_guessable[a]) for a in answers]
+    assert play_game(lookup, FixedOpeners(openers, strategy), answers) == 4
+
+
+def test_simulate():
+    lookup = small_lookup()
+    games = random_games(lookup, 20, seed=1, blacklist=[lookup.wordbank[0]])
+    assert games.shape == (20, 4)
+    assert all(len(set(g)) == 4 and 0 not in g for g in games.tolist())
+
+    serial = simulate(lookup, Greedy(), games)
+    assert simulate(lookup, Greedy(), games, jobs=2, batch_size=5).tolist() == serial.tolist()
+    report = Report('greedy', serial)
+    assert sum(report.histogram().values()) == 20
+    rate, (lo, hi) = report.rate(9)
+    assert lo <= rate <= hi
+
+
+def test_wilson_interval():
+    lo, hi = wilson_interval(50, 100)
+    assert 0.40 < lo < 0.41 and 0.59 < hi < 0.60
+    assert wilson_interval(0, 100)[0] == 0.0
+
+
+def test_random_games_chunks(monkeypatch):
+    lookup = small_lookup()
+    games = random_games(lookup, 25, seed=3)
+    monkeypatch.setattr(simulate_module, 'GAMES_PER_CHUNK', 10)
+    assert random_games(lookup, 25, seed=3).tolist() == games.tolist()
+
+
+def test_search_is_quiet(capsys):
+    lookup = small_lookup()
+    answers = [0, 10, 20, 30]
+    openers = [int(lookup.wordbank_to_guessable[a]) for a in answers[:2]]
+    assert 4 <= play_game(lookup, FixedOpeners(openers, Search()), answers) <= 9
+    assert capsys.readouterr().out == ''
+
+
+def test_strategy_is_abstract():
+    with pytest.raises(TypeError):
+        Strategy()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""Search results that persist across runs and are shared between processes.
+
+Usage:
+
+    ./solver_cache.py stats
+    ./solver_cache.py trim --max-mb 64
+    ./solver_cache.py clear
+
+The transposition table only lasts as long as the process, but the same endgames (two
+or three boards with a handful of candidates each) come up in game after game. This
+keeps find_best_play's results in an SQLite database, keyed by state_key and a digest of
+the result table (and of anything else the results depend on). Set quordlebot.SOLVER_CACHE
+to use it; the CLI and the server do by default.
+
+Only states that took at least MIN_SECONDS to search are stored; anything quicker is
+cheaper to search again than to look up. States with fewer than MIN_PRODUCT combinations
+of candidates (the product of the boards' sizes) are almost always that quick, so they're
+neither stored nor looked up, which saves a query for most of the states a search visits.
+New results and hits are buffered in memory and written in one transaction by flush(),
+which find_best_play calls when it's done.
+The database is in WAL mode, so any number of processes can read it while one writes.
+When it's bigger than max_mb, the least recently used entries are evicted.
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from quordlebot import ArrayWordle, StateKey
+import lookup_table
+import quordlebot
+
+CACHE_PATH = 'cache/solver.sqlite'
+MAX_MB = 256
+MIN_SECONDS = 0.005
+MIN_PRODUCT = 8
+"""In the TOUGH,DYING,PLUME,DOUGH ROAST CLINE search, 83% of the states below the root have
+fewer combinations than this, and only 11 of them (out of 448 states that are worth
+storing) took MIN_SECONDS."""
+EVICT_FRACTION = 0.1
+"""When the database is too big, evict this fraction of its entries."""
+SEARCH_VERSION = 1
+"""Bump this when a change to the search changes its results, to invalidate old entries."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    digest BLOB NOT NULL,
+    state TEXT NOT NULL,
+    plays REAL NOT NULL,
+    guess INTEGER,
+    seconds REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, state)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+SearchResult = Tuple[float, Optional[int]]
+
+
+def search_digest(lookup: ArrayWordle) -> bytes:
+    """Identifies everything a search result depends on other than the state.
+
+    That's the words, SEARCH_VERSION and the settings that decide what the search looks at.
+    """
+    h = hashlib.sha256(lookup_table.words_digest(lookup.wordbank, lookup.guessable))
+    settings = (
+        SEARCH_VERSION, quordlebot.MAX_SEARCH_DEPTH,
+        quordlebot.STEP3_ENTROPY_GAP, quordlebot.ROOT_ENTROPY_GAP,
+        quordlebot.STEP3_MAX_GUESSES, quordlebot.ROOT_MAX_GUESSES,
+    )
+    h.update(' '.join(map(str, settings)).encode('ascii'))
+    return h.digest()[:16]
+
+
+def encode_key(key: StateKey) -> str:
+    quads, depth, is_restricted = key
+    return f'{depth}{"r" if is_restricted else ""}:' + ' '.join(','.join(map(str, q)) for q in quads)
+
+
+class SolverCache:
+    def __init__(self, path=CACHE_PATH, *, max_mb=MAX_MB, min_seconds=MIN_SECONDS, min_product=MIN_PRODUCT):
+        self.path = path
+        self.max_mb = max_mb
+        self.min_seconds = min_seconds
+        self.min_product = min_product
+        self.lookup: Optional[ArrayWordle] = None
+        self.digest = b''
+        self.pending: Dict[str, Tuple[float, Optional[int], float]] = {}
+        """New results: state -> (plays, guess, seconds)."""
+        self.used: Dict[str, int] = {}
+        """Number of hits on each state since the last flush."""
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        """Lookups of states too small to be in the cache."""
+        self.writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+
+    def _check_pid(self):
+        # Connections can't be shared with forked children, so each process opens its own
+        # (and writes only its own results).
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = None
+            self.pending.clear()
+            self.used.clear()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        self._check_pid()
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def use(self, lookup: ArrayWordle):
+        """Results are only valid for one result table."""
+        if lookup is not self.lookup:
+            self.flush()
+            self.lookup = lookup
+            self.digest = search_digest(lookup)
+
+    def is_cacheable(self, key: StateKey) -> bool:
+        return math.prod(len(board) for board in key[0]) >= self.min_product
+
+    def get(self, key: StateKey) -> Optional[SearchResult]:
+        if not self.is_cacheable(key):
+            self.skipped += 1
+            return None
+        state = encode_key(key)
+        pending = self.pending.get(state)
+        if pending is not None:
+            return pending[:2]
+        row = self.conn.execute(
+            'SELECT plays, guess FROM entries WHERE digest = ? AND state = ?', (self.digest, state)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used[state] = self.used.get(state, 0) + 1
+        return row
+
+    def put(self, key: StateKey, value: SearchResult, seconds: float):
+        """Remember a result, if it was expensive enough to be worth it."""
+        self._check_pid()
+        if seconds >= self.min_seconds and self.is_cacheable(key):
+            self.pending[encode_key(key)] = (*value, seconds)
+
+    def flush(self):
+        """Write buffered results and hits, and evict old entries if the database is too big."""
+        self._check_pid()
+        if not self.pending and not self.used:
+            return
+        now = time.time()
+        conn = self.conn
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO entries (digest, state, plays, guess, seconds, hits, last_used) VALUES (?, ?, ?, ?, ?, 0, ?)',
+                [(self.digest, state, plays, guess, seconds, now) for state, (plays, guess, seconds) in self.pending.items()],
+            )
+            conn.executemany(
+                'UPDATE entries SET hits = hits + ?, last_used = ? WHERE digest = ? AND state = ?',
+                [(hits, now, self.digest, state) for state, hits in self.used.items()],
+            )
+        self.writes += len(self.pending)
+        self.pending.clear()
+        self.used.clear()
+        if self.size_mb() > self.max_mb:
+            self.evict(EVICT_FRACTION)
+
+    def size_mb(self) -> float:
+        """Space used by entries (not counting free pages)."""
+        page_size, = self.conn.execute('PRAGMA page_size').fetchone()
+        pages, = self.conn.execute('PRAGMA page_count').fetchone()
+        free, = self.conn.execute('PRAGMA freelist_count').fetchone()
+        return (pages - free) * page_size / 2**20
+
+    def evict(self, fraction: float) -> int:
+        """Delete the least recently used fraction of the entries. Returns how many."""
+        with self.conn as conn:
+            count, = conn.execute('SELECT COUNT(*) FROM entries').fetchone()
+            return conn.execute(
+                'DELETE FROM entries WHERE (digest, state) IN (SELECT digest, state FROM entries ORDER BY last_used LIMIT ?)',
+                (max(1, int(count * fraction)),),
+            ).rowcount
+
+    def trim(self, max_mb: float):
+        while self.size_mb() > max_mb and self.evict(EVICT_FRACTION):
+            pass
+        self.conn.execute('VACUUM')
+
+    def clear(self):
+        self.pending.clear()
+        self.used.clear()
+        with self.conn as conn:
+            conn.execute('DELETE FROM entries')
+        self.conn.execute('VACUUM')
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts for this process, for the CLI and the server."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0,
+            'skipped': self.skipped, 'writes': self.writes,
+        }
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """What's in the database, for each result table (digest)."""
+        rows = self.conn.execute(
+            'SELECT digest, COUNT(*), SUM(hits), SUM(hits * seconds), MIN(last_used), MAX(last_used), AVG(seconds)'
+            ' FROM entries GROUP BY digest ORDER BY MAX(last_used) DESC'
+        ).fetchall()
+        return [
+            {
+                'digest': digest.hex(),
+                'entries': count,
+                'hits': hits,
+                'seconds_saved': saved,
+                'mean_seconds': mean_seconds,
+                'oldest': time.strftime('%Y-%m-%d %H:%M', time.localtime(oldest)),
+                'newest': time.strftime('%Y-%m-%d %H:%M', time.localtime(newest)),
+            }
+            for digest, count, hits, saved, oldest, newest, mean_seconds in rows
+        ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or shrink the persistent solver cache.')
+    parser.add_argument('command', choices=['stats', 'trim', 'clear'])
+    parser.add_argument('--path', default=CACHE_PATH, help='The cache database.')
+    parser.add_argument('--max-mb', type=float, default=MAX_MB, help='Size to trim the cache to.')
+    args = parser.parse_args()
+
+    cache = SolverCache(args.path)
+    if args.command == 'clear':
+        cache.clear()
+    elif args.command == 'trim':
+        cache.trim(args.max_mb)
+    size = sum(os.path.getsize(p) for p in (args.path, args.path + '-wal') if os.path.exists(p)) / 2**20
+    print(f'{args.path}: {size:.1f} MB on disk, {cache.size_mb():.1f} MB used (limit {cache.max_mb} MB)')
+    for row in cache.stats():
+        print(f'  table {row["digest"][:12]}: {row["entries"]} entries (avg {1000 * row["mean_seconds"]:.1f} ms to search), '
+              f'{row["hits"]} hits saving {row["seconds_saved"]:.1f}s, used {row["oldest"]} to {row["newest"]}')
@@ -0,0 +1,108 @@
+import multiprocessing
+
+from priors import flatten
+import quordlebot
+from quordlebot import TRANSPOSITIONS, ArrayWordle, find_best_play, state_key
+from solver_cache import SolverCache, search_digest
+
+
+QUADS = [
+    ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK'],
+    ['BRAND', 'DRANK', 'FRANK', 'GRAND', 'PRANK'],
+]
+
+
+def search_with_cache(lookup: ArrayWordle, cache: SolverCache):
+    TRANSPOSITIONS.clear()
+    quordlebot.SOLVER_CACHE = cache
+    try:
+        return find_best_play(lookup, QUADS)
+    finally:
+        quordlebot.SOLVER_CACHE = None
+
+
+def test_solver_cache(tmp_path):
+    words = flatten(QUADS) + ['GAPED']
+    lookup = ArrayWordle.from_words(words, words)
+    TRANSPOSITIONS.clear()
+    expected = find_best_play(lookup, QUADS)
+
+    path = str(tmp_path / 'solver.sqlite')
+    cache = SolverCache(path, min_seconds=0, min_product=1)
+    assert search_with_cache(lookup, cache) == expected
+    assert cache.hits == 0 and cache.writes == TRANSPOSITIONS.misses
+
+    # A new process (or run) starts with an empty transposition table but finds the
+    # results below the root in the cache.
+    cache2 = SolverCache(path, min_seconds=0, min_product=1)
+    assert search_with_cache(lookup, cache2) == expected
+    assert cache2.hits > 0 and cache2.writes == 0
+    assert cache2.stats()[0]['hits'] == cache2.hits
+
+    # A different result table doesn't see them.
+    other = ArrayWordle.from_words(words + ['CRANE'], words + ['CRANE'])
+    cache3 = SolverCache(path, min_seconds=0, min_product=1)
+    cache3.use(other)
+    assert cache3.get(state_key(quordlebot.quads_to_indices(lookup, QUADS[:1]), 2, False)) is None
+
+
+def _put_in_child(cache: SolverCache):
+    cache.put(state_key([[1, 2]], 2, False), (1.5, 3), seconds=1.0)
+    cache.flush()
+
+
+def test_solver_cache_processes_and_eviction(tmp_path):
+    words = flatten(QUADS)
+    lookup = ArrayWordle.from_words(words, words)
+    cache = SolverCache(str(tmp_path / 'solver.sqlite'), max_mb=0.1, min_product=1)
+    cache.use(lookup)
+    cache.put(state_key([[0, 1]], 2, False), (1.5, 0), seconds=1.0)
+    cache.put(state_key([[0, 1]], 4, False), (1.5, 0), seconds=0.0)  # too quick to keep
+    ctx = multiprocessing.get_context('fork')
+    child = ctx.Process(target=_put_in_child, args=(cache,))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    # The child wrote only its own result.
+    assert cache.stats()[0]['entries'] == 1
+    cache.flush()
+    assert cache.stats()[0]['entries'] == 2
+    assert cache.get(state_key([[1, 2]], 2, False)) == (1.5, 3)
+    assert cache.get(state_key([[0, 1]], 4, False)) is None
+
+    # Fill it past max_mb; the oldest entries go first.
+    for i in range(3000):
+        cache.put(state_key([[i, i + 1, i + 2]], 2, True), (2.0, i), seconds=1.0)
+        if i % 100 == 99:
+            cache.flush()
+    cache.flush()
+    assert cache.size_mb() <= 0.1 + 0.05
+    assert cache.get(state_key([[0, 1, 2]], 2, True)) is None
+    assert cache.get(state_key([[2999, 3000, 3001]], 2, True)) == (2.0, 2999)
+
+
+def test_small_states_skip_the_cache(tmp_path):
+    words = flatten(QUADS)
+    lookup = ArrayWordle.from_words(words, words)
+    cache = SolverCache(str(tmp_path / 'solver.sqlite'), min_product=6)
+    cache.use(lookup)
+    small, big = state_key([[0, 1], [2, 3]], 2, False), state_key([[0, 1], [2, 3, 4]], 2, False)
+    cache.put(small, (2.5, 0), seconds=1.0)
+    cache.put(big, (2.75, 0), seconds=1.0)
+    cache.flush()
+    assert cache.stats()[0]['entries'] == 1
+    assert cache.get(small) is None
+    assert cache.get(big) == (2.75, 0)
+    assert cache.summary()['skipped'] == 1 and cache.hits == 1 and cache.misses == 0
+
+
+def test_search_settings_change_the_digest(monkeypatch):
+    words = flatten(QUADS)
+    lookup = ArrayWordle.from_words(words, words)
+    digest = search_digest(lookup)
+    assert search_digest(lookup) == digest
+    monkeypatch.setattr(quordlebot, 'STEP3_ENTROPY_GAP', quordlebot.STEP3_ENTROPY_GAP + 0.5)
+    assert search_digest(lookup) != digest
+    monkeypatch.undo()
+    monkeypatch.setattr(quordlebot, 'ROOT_ENTROPY_GAP', quordlebot.ROOT_ENTROPY_GAP + 0.5)
+    assert search_digest(lookup) != digest
@@ -0,0 +1,194 @@
+"""Resumable sweeps over all guesses (or any other range of items).
+
+A sweep splits its items into fixed-size shards, computes each shard on a process pool
+and appends the results to a single file as soon as each one is done. If the run is
+interrupted, running it again skips the shards that are already in the file.
+
+The file is append-only and columnar within each shard:
+
+    manifest: MAGIC, VERSION, manifest length, then the Sweep as JSON
+    shard record: SHARD_FORMAT header (shard, num rows, payload length, crc32)
+                  followed by each column's values for those rows, in manifest order
+    shard record: ...
+
+Only the parent process writes to the file. A record that was cut off by a crash
+(or fails its checksum) is truncated away before appending more.
+"""
+
+import json
+import multiprocessing
+import os
+import struct
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from progress import FakeProgressBar, ProgressBar
+
+MAGIC = b'QSWP'
+VERSION = 1
+MANIFEST_FORMAT = '<4sII'
+"""magic, version, length of the JSON manifest that follows"""
+SHARD_FORMAT = '<IIQI'
+"""shard index, number of rows, payload length, crc32 of the payload"""
+
+Columns = Dict[str, np.ndarray]
+ShardFn = Callable[[int, int], Columns]
+"""Computes the rows for items [start, stop)."""
+
+
+@dataclass
+class Sweep:
+    name: str
+    num_items: int
+    columns: List[Tuple[str, str]]
+    """(name, numpy dtype) of each output column."""
+    shard_size: int = 64
+    params: Dict[str, Any] = field(default_factory=dict)
+    """Anything else that affects the results, e.g. a word list digest. A file written with
+    different params can't be resumed."""
+
+    @property
+    def num_shards(self) -> int:
+        return (self.num_items + self.shard_size - 1) // self.shard_size
+
+    def shard_range(self, shard: int) -> Tuple[int, int]:
+        start = shard * self.shard_size
+        return start, min(start + self.shard_size, self.num_items)
+
+    def manifest(self) -> Dict[str, Any]:
+        return json.loads(json.dumps({**asdict(self), 'version': VERSION}))
+
+
+def encode_shard(sweep: Sweep, shard: int, columns: Columns) -> bytes:
+    arrays = [np.ascontiguousarray(columns[name], dtype=dtype) for name, dtype in sweep.columns]
+    num_rows = len(arrays[0]) if arrays else 0
+    if any(len(a) != num_rows for a in arrays):
+        raise ValueError(f'Columns for shard {shard} of {sweep.name} have different lengths')
+    payload = b''.join(a.tobytes() for a in arrays)
+    return struct.pack(SHARD_FORMAT, shard, num_rows, len(payload), zlib.crc32(payload)) + payload
+
+
+def read_manifest(f) -> Dict[str, Any]:
+    magic, version, length = struct.unpack(MANIFEST_FORMAT, f.read(struct.calcsize(MANIFEST_FORMAT)))
+    if magic != MAGIC:
+        raise ValueError(f'{f.name} is not a sweep file')
+    if version != VERSION:
+        raise ValueError(f'{f.name} has version {version}, expected {VERSION}')
+    return json.loads(f.read(length))
+
+
+def read_shards(f, sweep: Sweep) -> Iterator[Tuple[int, Columns, int]]:
+    """Yield (shard, columns, end offset) for each intact record after the manifest."""
+    header_size = struct.calcsize(SHARD_FORMAT)
+    dtypes = [(name, np.dtype(dtype)) for name, dtype in sweep.columns]
+    while True:
+        header = f.read(header_size)
+        if len(header) < header_size:
+            return
+        shard, num_rows, length, crc = struct.unpack(SHARD_FORMAT, header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        columns = {}
+        offset = 0
+        for name, dtype in dtypes:
+            columns[name] = np.frombuffer(payload, dtype=dtype, count=num_rows, offset=offset)
+            offset += num_rows * dtype.itemsize
+        yield shard, columns, f.tell()
+
+
+def read_sweep(path: str) -> Tuple[Dict[str, Any], Columns]:
+    """Read a sweep's manifest and all its rows, in shard order."""
+    with open(path, 'rb') as f:
+        manifest = read_manifest(f)
+        sweep = sweep_from_manifest(manifest)
+        shards = {shard: columns for shard, columns, _ in read_shards(f, sweep)}
+    out = {}
+    for name, dtype in sweep.columns:
+        parts = [shards[shard][name] for shard in sorted(shards)]
+        out[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    return manifest, out
+
+
+def sweep_from_manifest(manifest: Dict[str, Any]) -> Sweep:
+    return Sweep(
+        name=manifest['name'],
+        num_items=manifest['num_items'],
+        columns=[tuple(c) for c in manifest['columns']],
+        shard_size=manifest['shard_size'],
+        params=manifest['params'],
+    )
+
+
+def open_sweep(path: str, sweep: Sweep) -> Tuple[Any, set]:
+    """Open a sweep file for appending, creating it if need be.
+
+    Returns the file and the set of shards already in it.
+    """
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        manifest = json.dumps(sweep.manifest()).encode('utf8')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(struct.pack(MANIFEST_FORMAT, MAGIC, VERSION, len(manifest)) + manifest)
+        os.replace(tmp_path, path)
+
+    f = open(path, 'r+b')
+    try:
+        manifest = read_manifest(f)
+        if manifest != sweep.manifest():
+            raise ValueError(f'{path} was written by a different sweep; move it aside to start over')
+        done = set()
+        end = f.tell()
+        for shard, _columns, end in read_shards(f, sweep):
+            done.add(shard)
+        f.truncate(end)  # drop a record that was cut off
+        f.seek(end)
+    except BaseException:
+        f.close()
+        raise
+    return f, done
+
+
+_pool_fn: Optional[ShardFn] = None
+_pool_sweep: Optional[Sweep] = None
+
+
+def _pool_run_shard(shard: int) -> Tuple[int, bytes]:
+    start, stop = _pool_sweep.shard_range(shard)
+    return shard, encode_shard(_pool_sweep, shard, _pool_fn(start, stop))
+
+
+def run_sweep(path: str, sweep: Sweep, fn: ShardFn, *, jobs=1, track_progress=True) -> Columns:
+    """Compute every shard that isn't already in the file at path, then read it all back.
+
+    fn is called in forked worker processes, so it can be a closure over a lookup table.
+    """
+    global _pool_fn, _pool_sweep
+    f, done = open_sweep(path, sweep)
+    pending = [shard for shard in range(sweep.num_shards) if shard not in done]
+    _pool_fn, _pool_sweep = fn, sweep
+    ctx = multiprocessing.get_context('fork')
+    pool = ctx.Pool(jobs) if jobs > 1 and len(pending) > 1 else None
+    start_time = time.time()
+    try:
+        results = pool.imap_unordered(_pool_run_shard, pending) if pool else map(_pool_run_shard, pending)
+        with (ProgressBar() if track_progress and pending else FakeProgressBar()) as progress:
+            for i, (shard, record) in enumerate(results):
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+                rate = (i + 1) * sweep.shard_size / (time.time() - start_time)
+                progress.print(
+                    len(done) + i + 1, sweep.num_shards,
+                    f'{sweep.name}: shard {shard} ({rate:.1f} items/s)',
+                )
+    finally:
+        f.close()
+        if pool:
+            pool.terminate()
+    return read_sweep(path)[1]
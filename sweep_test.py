@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from sweep import Sweep, open_sweep, read_sweep, run_sweep
+
+
+def squares(start: int, stop: int):
+    items = np.arange(start, stop)
+    return {'item': items, 'square': items.astype(np.float64) ** 2}
+
+
+def make_sweep(**kwargs) -> Sweep:
+    return Sweep(name='squares', num_items=10, columns=[('item', 'uint16'), ('square', 'float64')], shard_size=3, **kwargs)
+
+
+def test_sweep(tmp_path):
+    path = str(tmp_path / 'squares.sweep')
+    columns = run_sweep(path, make_sweep(), squares, track_progress=False)
+    assert columns['item'].tolist() == [*range(10)]
+    assert columns['square'].tolist() == [i * i for i in range(10)]
+
+    manifest, columns2 = read_sweep(path)
+    assert manifest['name'] == 'squares'
+    assert columns2['item'].tolist() == columns['item'].tolist()
+
+    with pytest.raises(ValueError):
+        open_sweep(path, make_sweep(params={'version': 2}))
+
+
+def test_resume(tmp_path):
+    path = str(tmp_path / 'squares.sweep')
+    calls = []
+
+    def flaky(start: int, stop: int):
+        calls.append(start)
+        if start == 6:
+            raise RuntimeError('preempted')
+        return squares(start, stop)
+
+    with pytest.raises(RuntimeError):
+        run_sweep(path, make_sweep(), flaky, track_progress=False)
+    assert calls == [0, 3, 6]
+
+    # Simulate a crash in the middle of appending a record.
+    with open(path, 'ab') as f:
+        f.write(b'\x03\x00\x00\x00garbage')
+
+    calls.clear()
+    columns = run_sweep(path, make_sweep(), lambda start, stop: calls.append(start) or squares(start, stop), track_progress=False)
+    assert calls == [6, 9]
+    assert columns['item'].tolist() == [*range(10)]
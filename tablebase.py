@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+"""Precomputed search results for small endgames.
+
+Usage:
+
+    ./tablebase.py --openers ROAST,CLINE --games 20   # writes words/endgames.bin
+
+Most of the states that find_best_play visits are small: one to three boards with a
+handful of candidates each. The tablebase stores the search's result for those (for
+both values of is_restricted), so that a search can look them up instead of recursing.
+
+The states come from practice. Single boards are every set of 3 to MAX_BOARD_SIZE
+candidates that the openers and one more guess can leave. Multi-board states come from
+playing some random games (the openers, then greedily) until they're small enough to
+search, searching them, and keeping the small states that the search visited in at
+least --min-count games (single boards it visits are kept too).
+
+A result only depends on the depth through the search's depth limit, so each entry
+stores the result at depth 2 and the range of depths around it, checked one by one from
+1 to MAX_SEARCH_DEPTH, at which the search gives the same result. Lookups at other
+depths miss and are searched as usual, so a search gives exactly the same answers with
+or without the tablebase.
+
+The file is a fixed-size header followed by:
+
+    slots: num_slots int32 entry for each hash slot (-1 if empty), open addressing
+    offsets: (num_entries + 1) uint32 start of each entry's state in words
+    words: uint16 wordbank indices of each state's boards, each followed by SEPARATOR
+    plays: num_entries * 2 float64 expected plays (is_restricted = False, True)
+    guesses: num_entries * 2 int32 best play (guessable index)
+    depths: num_entries * 2 * 2 uint8 shallowest and deepest depth at which the result holds
+
+It's memory-mapped, and a lookup is a hash of the state and a probe or two.
+"""
+
+import argparse
+from array import array
+from collections import Counter
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import quordlebot
+from quordlebot import MAX_SEARCH_DEPTH, SEARCH_THRESHOLD, ArrayWordle, StateKey, _find_best_play
+from progress import FakeProgressBar, ProgressBar
+from simulate import NUM_BOARDS, FixedOpeners, Greedy, random_games
+from solver_cache import search_digest
+
+TABLEBASE_PATH = 'words/endgames.bin'
+MAX_BOARDS = 3
+MAX_BOARD_SIZE = 6
+MIN_COUNT = 2
+
+MAGIC = b'QRDE'
+VERSION = 1
+HEADER_FORMAT = '<4sI16sIIIIQQQQQQ'
+"""magic, version, search digest, num_entries, num_slots, num_words, max_board_size,
+slots offset, offsets offset, words offset, plays offset, guesses offset, depths offset"""
+HEADER_SIZE = 4096
+SEPARATOR = 0xFFFF
+
+State = Tuple[Tuple[int, ...], ...]
+"""Boards as sorted tuples of wordbank indices, in sorted order (as in state_key)."""
+
+
+def encode_state(state: State) -> bytes:
+    return array('H', [w for board in state for w in (*board, SEPARATOR)]).tobytes()
+
+
+def is_endgame(state: State, max_boards=MAX_BOARDS, max_board_size=MAX_BOARD_SIZE) -> bool:
+    """Small enough for the tablebase, and not one of the cases the search does in O(1)."""
+    if not state or len(state) > max_boards or any(len(board) > max_board_size for board in state):
+        return False
+    if all(len(board) == 1 for board in state):
+        return False
+    return not (len(state) == 1 and len(state[0]) == 2)
+
+
+class Tablebase:
+    def __init__(
+        self, slots: np.ndarray, offsets: np.ndarray, words: np.ndarray,
+        plays: np.ndarray, guesses: np.ndarray, depths: np.ndarray, max_board_size: int,
+    ):
+        self.slots = slots
+        self.mask = len(slots) - 1
+        self.offsets = offsets
+        self.words = words
+        self.plays = plays
+        self.guesses = guesses
+        self.depths = depths
+        """(num_entries, 2, 2): [entry, is_restricted] is the (min, max) depth at which the result holds."""
+        self.max_board_size = max_board_size
+        # Most states that come up aren't in the table, and can be turned away by their
+        # board sizes alone, without encoding and hashing them.
+        ends = np.flatnonzero(words == SEPARATOR)
+        lengths = np.diff(ends, prepend=-1) - 1
+        boards_per_entry = np.diff(np.searchsorted(ends, offsets))
+        self.shapes = frozenset(tuple(a.tolist()) for a in np.split(lengths, np.cumsum(boards_per_entry)[:-1]))
+        """The board sizes (in order) of every state in the table."""
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.plays)
+
+    def find(self, state: State) -> Optional[int]:
+        """The entry for a state, if there is one."""
+        if tuple(map(len, state)) not in self.shapes:
+            return None
+        data = encode_state(state)
+        slot = zlib.crc32(data) & self.mask
+        while True:
+            entry = int(self.slots[slot])
+            if entry < 0:
+                return None
+            if self.words[self.offsets[entry]:self.offsets[entry + 1]].tobytes() == data:
+                return entry
+            slot = (slot + 1) & self.mask
+
+    def get(self, key: StateKey) -> Optional[Tuple[float, int]]:
+        """What _find_best_play would return for a state_key, if it's in the tablebase."""
+        state, depth, is_restricted = key
+        entry = self.find(state)
+        if entry is not None:
+            min_depth, max_depth = self.depths[entry, int(is_restricted)].tolist()
+        if entry is None or not min_depth <= depth <= max_depth:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return float(self.plays[entry, int(is_restricted)]), int(self.guesses[entry, int(is_restricted)])
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts for this process, for the server."""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0, 'entries': len(self)}
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0.0
+        return f'{self.hits} hits / {self.misses} misses ({rate:.1f}%), {len(self)} entries'
+
+
+def reachable_states(
+    lookup: ArrayWordle, games: np.ndarray, openers: Sequence[int], *, track_progress=False
+) -> Counter:
+    """Number of games in which the search visited each endgame state.
+
+    Each game is played (openers, then greedily) until it's small enough to search, and
+    then searched.
+    """
+    strategy = FixedOpeners(openers, Greedy())
+    seen: Counter = Counter()
+    everything = lookup.all_wordbank_words()
+    with (ProgressBar() if track_progress else FakeProgressBar()) as progress:
+        for i, answers in enumerate(games.tolist()):
+            boards: List[Optional[List[int]]] = [everything] * NUM_BOARDS
+            num_guesses = 0
+            while math.prod(len(b) for b in boards if b is not None) >= SEARCH_THRESHOLD:
+                guess = strategy.play(lookup, boards, num_guesses)
+                num_guesses += 1
+                for j, (answer, board) in enumerate(zip(answers, boards)):
+                    if board is not None:
+                        result = lookup.results[answer, guess]
+                        boards[j] = None if result == quordlebot.ALL_GREEN else lookup.filter_by_result(board, guess, result)
+            quordlebot.TRANSPOSITIONS.clear()
+            _find_best_play(lookup, [b for b in boards if b is not None])
+            seen.update({state for state, _, _ in quordlebot.TRANSPOSITIONS.entries if is_endgame(state)})
+            progress.print(i + 1, len(games), f'{len(seen)} states')
+    return seen
+
+
+def single_board_states(
+    lookup: ArrayWordle, openers: Sequence[int], max_board_size=MAX_BOARD_SIZE
+) -> List[State]:
+    """Every board of 3 to max_board_size candidates left by the openers and one more guess."""
+    keys = np.zeros(len(lookup.wordbank), dtype=np.int64)
+    for guess in openers:
+        keys = keys * quordlebot.NUM_RESULTS + lookup.results[:, guess]
+    _, classes = np.unique(keys, return_inverse=True)
+    states = set()
+    for words in np.split(np.argsort(classes, kind='stable'), np.flatnonzero(np.diff(np.sort(classes))) + 1):
+        if len(words) <= max_board_size:
+            if len(words) >= 3:
+                states.add((tuple(words.tolist()),))
+            continue
+        # Split the class by every guess at once: sort each guess's column of results and
+        # cut it wherever the result changes.
+        results = lookup.results[words]
+        order = np.argsort(results, axis=0, kind='stable')
+        ordered = np.take_along_axis(results, order, axis=0)
+        for guess in range(results.shape[1]):
+            for group in np.split(order[:, guess], np.flatnonzero(np.diff(ordered[:, guess])) + 1):
+                if 3 <= len(group) <= max_board_size:
+                    states.add((tuple(sorted(words[group].tolist())),))
+    return sorted(states)
+
+
+def solve_state(lookup: ArrayWordle, state: State) -> Tuple[List[float], List[int], List[Tuple[int, int]]]:
+    """(plays, guess, (min depth, max depth)) for is_restricted = False and True.
+
+    The result at depth 2 holds for the depths next to it at which the search gives the
+    same result. Each depth is checked, odd ones included: nothing guarantees that the
+    result changes only once as the search gets shallower.
+    """
+    quads = [list(board) for board in state]
+    plays, guesses, depths = [], [], []
+    for is_restricted in (False, True):
+        def same(depth: int) -> bool:
+            return _find_best_play(lookup, quads, depth=depth, is_restricted=is_restricted) == first
+        first = _find_best_play(lookup, quads, depth=2, is_restricted=is_restricted)
+        min_depth = 1 if same(1) else 2
+        max_depth = 2
+        while max_depth < MAX_SEARCH_DEPTH and same(max_depth + 1):
+            max_depth += 1
+        plays.append(first[0])
+        guesses.append(first[1])
+        depths.append((min_depth, max_depth))
+    return plays, guesses, depths
+
+
+def build_tablebase(lookup: ArrayWordle, states: Iterable[State], *, track_progress=False) -> Tablebase:
+    states = sorted(set(states), key=lambda s: (len(s), [len(b) for b in s], s))
+    quordlebot.TRANSPOSITIONS.use(lookup)
+    saved = quordlebot.SOLVER_CACHE, quordlebot.ENDGAMES
+    quordlebot.SOLVER_CACHE = quordlebot.ENDGAMES = None
+    plays = np.zeros((len(states), 2))
+    guesses = np.zeros((len(states), 2), dtype=np.int32)
+    depths = np.zeros((len(states), 2, 2), dtype=np.uint8)
+    try:
+        with (ProgressBar() if track_progress else FakeProgressBar()) as progress:
+            for i, state in enumerate(states):
+                plays[i], guesses[i], depths[i] = solve_state(lookup, state)
+                if i % 100 == 99 or i + 1 == len(states):
+                    progress.print(i + 1, len(states), f'{i + 1} / {len(states)} states')
+    finally:
+        quordlebot.SOLVER_CACHE, quordlebot.ENDGAMES = saved
+
+    encoded = [encode_state(state) for state in states]
+    offsets = np.zeros(len(states) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(data) // 2 for data in encoded])
+    words = np.frombuffer(b''.join(encoded), dtype=np.uint16)
+    num_slots = 1 << max(4, (2 * len(states) - 1).bit_length())
+    slots = np.full(num_slots, -1, dtype=np.int32)
+    for i, data in enumerate(encoded):
+        slot = zlib.crc32(data) & (num_slots - 1)
+        while slots[slot] >= 0:
+            slot = (slot + 1) & (num_slots - 1)
+        slots[slot] = i
+    max_board_size = max((len(b) for s in states for b in s), default=0)
+    return Tablebase(slots, offsets, words, plays, guesses, depths, max_board_size)
+
+
+def write_tablebase(path: str, lookup: ArrayWordle, tb: Tablebase):
+    """Write a tablebase, atomically replacing any existing file at path."""
+    arrays = [
+        tb.slots.astype(np.int32), tb.offsets.astype(np.uint32), tb.words.astype(np.uint16),
+        tb.plays.astype(np.float64), tb.guesses.astype(np.int32), tb.depths.astype(np.uint8),
+    ]
+    offsets = []
+    offset = HEADER_SIZE
+    for a in arrays:
+        offsets.append(offset)
+        offset = -(-(offset + a.nbytes) // 8) * 8
+    header = struct.pack(
+        HEADER_FORMAT, MAGIC, VERSION, search_digest(lookup),
+        len(tb), len(tb.slots), len(tb.words), tb.max_board_size, *offsets,
+    )
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(header.ljust(HEADER_SIZE, b'\0'))
+        for a, start in zip(arrays, offsets):
+            out.write(b'\0' * (start - out.tell()))
+            out.write(np.ascontiguousarray(a).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_tablebase(path: str) -> Tuple[Tablebase, bytes]:
+    """Memory-map a tablebase. Returns it and the digest of the search it's for."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, digest, num_entries, num_slots, num_words, max_board_size, *offsets = (
+        struct.unpack_from(HEADER_FORMAT, mm)
+    )
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not an endgame tablebase')
+    if version != VERSION:
+        raise ValueError(f'{path} has version {version}, expected {VERSION}')
+    slots_offset, offsets_offset, words_offset, plays_offset, guesses_offset, depths_offset = offsets
+    tb = Tablebase(
+        np.frombuffer(mm, dtype=np.int32, count=num_slots, offset=slots_offset),
+        np.frombuffer(mm, dtype=np.uint32, count=num_entries + 1, offset=offsets_offset),
+        np.frombuffer(mm, dtype=np.uint16, count=num_words, offset=words_offset),
+        np.frombuffer(mm, dtype=np.float64, count=2 * num_entries, offset=plays_offset).reshape((num_entries, 2)),
+        np.frombuffer(mm, dtype=np.int32, count=2 * num_entries, offset=guesses_offset).reshape((num_entries, 2)),
+        np.frombuffer(mm, dtype=np.uint8, count=4 * num_entries, offset=depths_offset).reshape((num_entries, 2, 2)),
+        max_board_size,
+    )
+    return tb, digest
+
+
+def load(lookup: ArrayWordle, path=TABLEBASE_PATH) -> Optional[Tablebase]:
+    """The tablebase at path, or None if there isn't one for this result table and search."""
+    try:
+        tb, digest = read_tablebase(path)
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+    return tb if digest == search_digest(lookup) else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an endgame tablebase from the states that come up in random games.')
+    parser.add_argument('--openers', default='ROAST,CLINE', help='Comma-separated opening guesses.')
+    parser.add_argument('--games', type=int, default=20, help='Number of random games to search.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the games.')
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT, help='Keep multi-board states seen in at least this many games.')
+    parser.add_argument('--path', default=TABLEBASE_PATH, help='Where to write the tablebase.')
+    args = parser.parse_args()
+
+    import lookup_table
+    from simulate import read_blacklist
+    lookup = lookup_table.load()
+    openers = [lookup.guessable_to_idx[w] for w in args.openers.split(',') if w]
+    games = random_games(lookup, args.games, seed=args.seed, blacklist=read_blacklist())
+
+    start = time.time()
+    singles = single_board_states(lookup, openers)
+    print(f'Found {len(singles)} single-board states in {time.time() - start:.1f}s')
+    seen = reachable_states(lookup, games, openers, track_progress=True)
+    states = singles + [state for state, count in seen.items() if len(state) == 1 or count >= args.min_count]
+    print(f'Found {len(seen)} endgame states in {len(games)} games; keeping {len(set(states))} in all')
+    tb = build_tablebase(lookup, states, track_progress=True)
+    write_tablebase(args.path, lookup, tb)
+    print(f'Wrote {args.path} ({len(tb)} entries, {os.path.getsize(args.path) / 2**20:.1f} MB) in {time.time() - start:.1f}s')
@@ -0,0 +1,66 @@
+from priors import flatten
+import quordlebot
+from quordlebot import MAX_SEARCH_DEPTH, TRANSPOSITIONS, ArrayWordle, find_best_play, quads_to_indices, state_key
+import tablebase
+
+
+QUADS = [
+    ['BLAND', 'BLANK', 'FLANK', 'GLAND', 'PLANK'],
+    ['BRAND', 'DRANK', 'FRANK', 'GRAND', 'PRANK'],
+]
+
+
+def search_with_tablebase(lookup: ArrayWordle, tb):
+    TRANSPOSITIONS.clear()
+    quordlebot.ENDGAMES = tb
+    try:
+        return find_best_play(lookup, QUADS)
+    finally:
+        quordlebot.ENDGAMES = None
+
+
+def test_tablebase(tmp_path):
+    words = flatten(QUADS) + ['GAPED']
+    lookup = ArrayWordle.from_words(words, words)
+    expected = search_with_tablebase(lookup, None)
+    states = [state for state, _, _ in TRANSPOSITIONS.entries if tablebase.is_endgame(state)]
+    assert states
+
+    path = str(tmp_path / 'endgames.bin')
+    tablebase.write_tablebase(path, lookup, tablebase.build_tablebase(lookup, states))
+    tb = tablebase.load(lookup, path)
+    assert tb is not None and len(tb) == len(set(states))
+    assert search_with_tablebase(lookup, tb) == expected
+    assert tb.hits > 0
+
+    # Entries hold what the search finds at every depth in their range, odd ones
+    # included, and miss outside it.
+    state = states[0]
+    entry = tb.find(state)
+    for is_restricted in (False, True):
+        min_depth, max_depth = tb.depths[entry, int(is_restricted)].tolist()
+        assert min_depth <= 3 <= max_depth
+        for depth in range(1, MAX_SEARCH_DEPTH + 2):
+            found = tb.get(state_key(state, depth, is_restricted))
+            if not min_depth <= depth <= max_depth:
+                assert found is None
+                continue
+            TRANSPOSITIONS.clear()
+            result = quordlebot._find_best_play(lookup, [list(b) for b in state], depth=depth, is_restricted=is_restricted)
+            assert found == result
+    assert tb.get(state_key(quads_to_indices(lookup, [['BLAND', 'BLANK', 'GLAND', 'PLANK']]), 2, False)) is None
+
+    # A different result table doesn't use it.
+    other = ArrayWordle.from_words(words + ['CRANE'], words + ['CRANE'])
+    assert tablebase.load(other, path) is None
+
+
+def test_single_board_states():
+    words = flatten(QUADS) + ['GAPED']
+    lookup = ArrayWordle.from_words(words, words)
+    states = tablebase.single_board_states(lookup, [lookup.guessable_to_idx['GAPED']], max_board_size=5)
+    assert states
+    assert all(len(state) == 1 and 3 <= len(state[0]) <= 5 for state in states)
+    assert states == sorted(set(states))
+    for state in states:
+        assert list(state[0]) == sorted(state[0])
@@ -1,7 +1,15 @@
 # See https://github.com/yinengy/Mersenne-Twister-in-Python/blob/master/MT19937.py
+"""Quordle's daily answers, from its Mersenne Twister (see js/generate.js).
+
+MersenneTwister is one generator, like Quordle's. generate_words_batch runs many of
+them side by side as numpy arrays: each column of the state is one seed, seeding is a
+loop over the 624 state words rather than over seeds, and a twist is four slices.
+"""
 
 import datetime
-from typing import List, Set
+from typing import List, Sequence, Set, Tuple
+
+import numpy as np
 
 
 # coefficients for MT19937
@@ -13,60 +21,52 @@ a = 0x9908B0DF
 l = 18
 f = 1812433253
 
-
-# make a arry to store the state of the generator
-MT = [0 for i in range(n)]
-index = n+1
 lower_mask = 0x7FFFFFFF #(1 << r) - 1 // That is, the binary number of r 1's
 upper_mask = 0x80000000 #lowest w bits of (not lower_mask)
 
-
-# initialize the generator from a seed
-def mt_seed(seed):
-    # global index
-    # index = n
-    MT[0] = seed
-    for i in range(1, n):
-        temp = f * (MT[i-1] ^ (MT[i-1] >> (w-2))) + i
-        MT[i] = temp & 0xffffffff
-
-
-# Extract a tempered value based on MT[index]
-# calling twist() every n numbers
-def extract_number():
-    global index
-    if index >= n:
-        twist()
-        index = 0
-
-    y = MT[index]
-    y = y ^ ((y >> u) & d)
-    y = y ^ ((y << s) & b)
-    y = y ^ ((y << t) & c)
-    y = y ^ (y >> l)
-
-    index += 1
-    y = y & 0xffffffff
-    if y > 2 ** 31:
-        y = y - 2 ** 32
-    return y
-
-def rand_int31():
-    y = extract_number()
-    if y < 0:
-        y = y + 2 ** 32
-    y = y >> 1
-    # print(y)
-    return y
-
-# Generate the next n values from the series x_i
-def twist():
-    for i in range(0, n):
-        x = (MT[i] & upper_mask) + (MT[(i+1) % n] & lower_mask)
-        xA = x >> 1
-        if (x % 2) != 0:
-            xA = xA ^ a
-        MT[i] = MT[(i + m) % n] ^ xA
+NUM_WORDS = 4
+WARMUP = 4
+"""Quordle throws away this many numbers before picking words."""
+
+
+class MersenneTwister:
+    def __init__(self, seed: int):
+        # initialize the generator from a seed
+        self.MT = [0] * n
+        self.index = n
+        self.MT[0] = seed & 0xffffffff  # like the JS, seed >>> 0
+        for i in range(1, n):
+            temp = f * (self.MT[i-1] ^ (self.MT[i-1] >> (w-2))) + i
+            self.MT[i] = temp & 0xffffffff
+
+    # Extract a tempered value based on MT[index]
+    # calling twist() every n numbers
+    def extract_number(self) -> int:
+        if self.index >= n:
+            self.twist()
+            self.index = 0
+
+        y = self.MT[self.index]
+        y = y ^ ((y >> u) & d)
+        y = y ^ ((y << s) & b)
+        y = y ^ ((y << t) & c)
+        y = y ^ (y >> l)
+
+        self.index += 1
+        return y & 0xffffffff
+
+    def rand_int31(self) -> int:
+        return self.extract_number() >> 1
+
+    # Generate the next n values from the series x_i
+    def twist(self):
+        MT = self.MT
+        for i in range(0, n):
+            x = (MT[i] & upper_mask) + (MT[(i+1) % n] & lower_mask)
+            xA = x >> 1
+            if (x % 2) != 0:
+                xA = xA ^ a
+            MT[i] = MT[(i + m) % n] ^ xA
 
 
 def get_seed(d: datetime.date):
@@ -76,17 +76,15 @@ def get_seed(d: datetime.date):
 
 def generate_words(seed: int, wordbank: List[str], blacklist: Set[str]) -> List[str]:
     words = []
-    mt_seed(seed)
-    rand_int31()
-    rand_int31()
-    rand_int31()
-    rand_int31()
+    mt = MersenneTwister(seed)
+    for _ in range(WARMUP):
+        mt.rand_int31()
     while True:
         words = [
-            wordbank[rand_int31() % len(wordbank)],
-            wordbank[rand_int31() % len(wordbank)],
-            wordbank[rand_int31() % len(wordbank)],
-            wordbank[rand_int31() % len(wordbank)],
+            wordbank[mt.rand_int31() % len(wordbank)],
+            wordbank[mt.rand_int31() % len(wordbank)],
+            wordbank[mt.rand_int31() % len(wordbank)],
+            wordbank[mt.rand_int31() % len(wordbank)],
         ]
 
         if (
@@ -108,15 +106,85 @@ def generate_words(seed: int, wordbank: List[str], blacklist: Set[str]) -> List[
     return words
 
 
+def seed_batch(seeds: np.ndarray) -> np.ndarray:
+    """(n, len(seeds)) initial states, one column per seed. uint32 arithmetic wraps."""
+    MT = np.empty((n, len(seeds)), dtype=np.uint32)
+    MT[0] = seeds
+    for i in range(1, n):
+        MT[i] = np.uint32(f) * (MT[i-1] ^ (MT[i-1] >> np.uint32(w-2))) + np.uint32(i)
+    return MT
+
+
+def twist_batch(MT: np.ndarray):
+    """twist() every column of MT in place.
+
+    Element i depends on the new value of element i + m - n once i >= n - m, so this
+    goes in slices that only read elements that are already done (or not yet touched).
+    """
+    def step(lo: int, hi: int):
+        x = (MT[lo:hi] & np.uint32(upper_mask)) | (MT[lo+1:hi+1] & np.uint32(lower_mask))
+        xA = (x >> np.uint32(1)) ^ ((x & np.uint32(1)) * np.uint32(a))
+        MT[lo:hi] = MT[lo+m-n:hi+m-n] if lo >= n - m else MT[lo+m:hi+m]
+        MT[lo:hi] ^= xA
+
+    step(0, n - m)
+    for lo in range(n - m, n - 1, n - m):
+        step(lo, min(lo + n - m, n - 1))
+    x = (MT[n-1] & np.uint32(upper_mask)) | (MT[0] & np.uint32(lower_mask))
+    MT[n-1] = MT[m-1] ^ (x >> np.uint32(1)) ^ ((x & np.uint32(1)) * np.uint32(a))
+
+
+def temper_batch(y: np.ndarray) -> np.ndarray:
+    y = y ^ (y >> np.uint32(u))
+    y = y ^ ((y << np.uint32(s)) & np.uint32(b))
+    y = y ^ ((y << np.uint32(t)) & np.uint32(c))
+    return y ^ (y >> np.uint32(l))
+
+
+def generate_words_batch(
+    seeds: Sequence[int], wordbank: List[str], blacklist: Set[str], block_size=4096
+) -> np.ndarray:
+    """(len(seeds), 4) wordbank indices of generate_words for each seed."""
+    seeds = np.asarray(seeds, dtype=np.int64)
+    out = np.empty((len(seeds), NUM_WORDS), dtype=np.int64)
+    is_blacklisted = np.array([word in blacklist for word in wordbank])
+    word_to_idx = {word: i for i, word in enumerate(wordbank)}
+    for start in range(0, len(seeds), block_size):
+        MT = seed_batch(seeds[start:start + block_size])
+        twist_batch(MT)
+        picks = (temper_batch(MT) >> np.uint32(1)).T.astype(np.int64) % len(wordbank)
+        # Every seed tries its first set of words; the ones that get rejected move on to
+        # their next four numbers, and so on.
+        todo = np.arange(picks.shape[0])
+        pos = WARMUP
+        while len(todo) and pos + NUM_WORDS <= n:
+            words = picks[todo, pos:pos + NUM_WORDS]
+            ordered = np.sort(words, axis=1)
+            rejected = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1) | is_blacklisted[words].any(axis=1)
+            out[start + todo[~rejected]] = words[~rejected]
+            todo = todo[rejected]
+            pos += NUM_WORDS
+        # Anything that got through a whole twist's worth of rejections (never, in
+        # practice) is done one at a time.
+        for i in todo.tolist():
+            out[start + i] = [word_to_idx[w] for w in generate_words(int(seeds[start + i]), wordbank, blacklist)]
+    return out
+
+
 _words = None
 _blacklist = None
-def words_for_date(d: datetime.date) -> List[str]:
+def read_words() -> Tuple[List[str], Set[str]]:
+    """The wordbank and blacklist that Quordle picks answers from."""
     global _words, _blacklist
     if not _words:
         _words = [word.strip() for word in open('words/wordbank.txt')]
         _blacklist = {word.strip() for word in open('words/blacklist.txt')}
+    return _words, _blacklist
+
+
+def words_for_date(d: datetime.date) -> List[str]:
     seed = get_seed(d)
-    return generate_words(seed, _words, _blacklist)
+    return generate_words(seed, *read_words())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,28 @@
+import datetime
+
+import numpy as np
+
+import twister
+from twister import generate_words, generate_words_batch
+
+
+def test_words_for_date():
+    # From js/generate.js. Each date gets a fresh generator, so order doesn't matter.
+    assert twister.words_for_date(datetime.date(2022, 5, 2)) == ['VIGIL', 'SERUM', 'VAPID', 'CRANE']
+    assert twister.words_for_date(datetime.date(2022, 5, 1)) == ['GLADE', 'CRANK', 'ROCKY', 'KNEEL']
+    assert twister.words_for_date(datetime.date(2022, 5, 2)) == ['VIGIL', 'SERUM', 'VAPID', 'CRANE']
+    assert generate_words(-50, *twister.read_words()) == ['FANCY', 'TODAY', 'AFIRE', 'COLOR']
+
+
+def test_generate_words_batch():
+    wordbank, blacklist = twister.read_words()
+    seeds = [*range(-20, 500), 2**31 - 1, 2**32 - 5]
+    batch = generate_words_batch(seeds, wordbank, blacklist, block_size=100)
+    assert [[wordbank[i] for i in row] for row in batch.tolist()] == [generate_words(s, wordbank, blacklist) for s in seeds]
+
+    # With five words, one of them blacklisted, most sets of four get rejected, and a few
+    # seeds run through a whole twist (and fall back to generate_words).
+    words = ['ABACK', 'ABASE', 'ABATE', 'ABBEY', 'ABBOT']
+    batch = generate_words_batch(range(1000), words, {'ABBEY'})
+    assert [[words[i] for i in row] for row in batch.tolist()] == [generate_words(s, words, {'ABBEY'}) for s in range(1000)]
+    assert np.isin(batch, [3]).sum() == 0
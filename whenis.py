@@ -1,17 +1,44 @@
 #!/usr/bin/env python
-"""When will a word next be an answer?"""
+"""When will a word next be an answer?
 
-import sys
+Usage:
+
+    ./whenis.py TRAIN CLOSE          # the next date each word is an answer
+    ./whenis.py --all --until 2030/12/31 TRAIN
+"""
+
+import argparse
 import datetime
 
+import answer_calendar
 import twister
 
+
+def parse_date(s: str) -> datetime.date:
+    year, month, day = [int(x) for x in s.split('/')]
+    return datetime.date(year, month, day)
+
+
 if __name__ == '__main__':
-    word = sys.argv[1]
-    d = datetime.date.today()
-    while True:
-        words = twister.words_for_date(d)
-        if word in words:
-            print(d)
-            break
-        d += datetime.timedelta(days=1)
+    parser = argparse.ArgumentParser(description='Find the dates on which words are Quordle answers.')
+    parser.add_argument('words', nargs='+', help='Words to look up.')
+    parser.add_argument('--after', type=parse_date, default=datetime.date.today(), help='Start looking on this date (YYYY/MM/DD, default today).')
+    parser.add_argument('--until', type=parse_date, help='With --all, stop looking after this date (YYYY/MM/DD).')
+    parser.add_argument('--all', action='store_true', help='List every date, not just the next one.')
+    parser.add_argument('--calendar', default=answer_calendar.CALENDAR_PATH, metavar='PATH', help='The answer calendar to use.')
+    args = parser.parse_args()
+
+    # The calendar is extended if it doesn't reach --until.
+    calendar = answer_calendar.load(args.calendar, until=args.until)
+    for word in args.words:
+        word = word.upper()
+        if word not in calendar.word_to_idx:
+            print(f'{word}: not in the wordbank')
+        elif word in twister.read_words()[1]:
+            print(f'{word}: never (blacklisted)')
+        elif args.all:
+            dates = calendar.dates_for_word(word, args.after, args.until)
+            print(f'{word}: {", ".join(str(d) for d in dates) or "never"}')
+        else:
+            d = calendar.next_date(word, args.after)
+            print(f'{word}: {d or f"not before {calendar.last_date}"}')
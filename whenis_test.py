@@ -0,0 +1,23 @@
+import datetime
+import os
+import subprocess
+import sys
+
+import answer_calendar
+import twister
+
+
+def test_until_past_the_default_range(tmp_path):
+    path = str(tmp_path / 'calendar.bin')
+    answer_calendar.load(path)  # the default DEFAULT_YEARS
+    output = subprocess.run(
+        [sys.executable, 'whenis.py', '--calendar', path, '--all', '--after', '2070/01/01', '--until', '2080/12/31', 'TRAIN'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True, capture_output=True, text=True,
+    ).stdout
+    line = output.splitlines()[-1]
+    assert line.startswith('TRAIN: ')
+    dates = [datetime.date.fromisoformat(d) for d in line[len('TRAIN: '):].split(', ')]
+    assert dates and all(datetime.date(2070, 1, 1) <= d <= datetime.date(2080, 12, 31) for d in dates)
+    assert dates[-1].year == 2080
+    for d in dates[-3:]:
+        assert 'TRAIN' in twister.words_for_date(d)